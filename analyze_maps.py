@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""批量地图路径分析
+
+按连续的种子生成大量地图，对每张地图做路径分析（src/map_analysis.py），汇总路径数、
+每条路径上最多的精英/休息处/商店等的分布以及节点类型占比，用于调整地图节点类型的权重
+（src/sampler.py 中的 EARLY_NODE_WEIGHTS / LATE_NODE_WEIGHTS）。
+
+用法:
+    python analyze_maps.py --maps 5000
+    python analyze_maps.py --maps 5000 --late-weights 45,16,15,10,5,9 --json result.json
+"""
+import sys
+import json
+import time
+import argparse
+from collections import Counter
+
+from src.game import build_map
+from src.map_graph import MapGraph
+from src.map_analysis import OBJECTIVES, analyze
+from src import sampler
+
+
+def parse_weights(text):
+    """解析 "45,16,15,10,5,9" 形式的权重（顺序同 sampler.NODE_ROLL_TYPES）"""
+    weights = [float(w) for w in text.split(',')]
+    if len(weights) != len(sampler.NODE_ROLL_TYPES):
+        raise argparse.ArgumentTypeError(
+            f"需要 {len(sampler.NODE_ROLL_TYPES)} 个权重: {','.join(sampler.NODE_ROLL_TYPES)}")
+    return weights
+
+
+def summarize(values):
+    """均值、最小值、中位数、最大值"""
+    values = sorted(values)
+    return {
+        'mean': round(sum(values) / len(values), 3),
+        'min': values[0],
+        'p50': values[len(values) // 2],
+        'max': values[-1]
+    }
+
+
+def run(maps, base_seed=0, node_weights=None):
+    """分析 maps 张地图（种子为 base_seed 起的连续整数），返回汇总结果"""
+    paths = []
+    maxima = {name: [] for name in OBJECTIVES}
+    node_types = Counter()
+    for seed in range(base_seed, base_seed + maps):
+        graph = MapGraph(build_map(seed, node_weights))
+        result = analyze(graph)
+        paths.append(result['paths'])
+        for name, value in result['max'].items():
+            maxima[name].append(value)
+        node_types.update(node.node_type for node in graph.nodes)
+
+    total_nodes = sum(node_types.values())
+    return {
+        'maps': maps,
+        'paths': summarize(paths),
+        'max': {name: summarize(values) for name, values in maxima.items()},
+        # 没有任何路径能经过该类型节点的地图占比
+        'none_reachable': {name: round(values.count(0) / maps, 4) for name, values in maxima.items()},
+        'node_share': {t: round(n / total_nodes, 4) for t, n in node_types.most_common()}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='杀戮尖塔地图路径批量分析')
+    parser.add_argument('--maps', type=int, default=1000, help='分析的地图数量')
+    parser.add_argument('--seed', type=int, default=0, help='起始种子')
+    parser.add_argument('--early-weights', type=parse_weights,
+                        help=f'前 {sampler.EARLY_FLOORS} 层的节点权重（默认 sampler.EARLY_NODE_WEIGHTS）')
+    parser.add_argument('--late-weights', type=parse_weights, help='之后各层的节点权重（默认 sampler.LATE_NODE_WEIGHTS）')
+    parser.add_argument('--json', help='把结果写入JSON文件')
+    args = parser.parse_args()
+
+    node_weights = None
+    if args.early_weights or args.late_weights:
+        node_weights = (args.early_weights or sampler.EARLY_NODE_WEIGHTS,
+                        args.late_weights or sampler.LATE_NODE_WEIGHTS)
+
+    started = time.perf_counter()
+    result = run(args.maps, args.seed, node_weights)
+    elapsed = time.perf_counter() - started
+
+    print(f"分析了 {args.maps} 张地图，用时 {elapsed:.2f} 秒")
+    print(f"路径数: {result['paths']}")
+    for name, stats in result['max'].items():
+        print(f"最多{name}: {stats}  (无法经过的地图占比 {result['none_reachable'][name]:.2%})")
+    print("节点类型占比: " + ", ".join(f"{t} {share:.1%}" for t, share in result['node_share'].items()))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,7 @@ import sys
 import json
 import time
 from flask import Flask, render_template, request, session, jsonify
+from flask.json.provider import DefaultJSONProvider
 from flask_socketio import SocketIO, emit
 from io import StringIO
 import threading
@@ -11,33 +12,106 @@ import logging
 import traceback
 import argparse
 import random
-
-# 配置日志
-logging.basicConfig(level=logging.INFO, 
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-logger = logging.getLogger(__name__)
+import hmac
+import uuid
+import atexit
+from functools import wraps
 
 # 添加src目录到路径
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
+# 配置日志（环境变量，见 src/logging_config.py）
+from src.logging_config import configure_logging, action_sampler, env_flag
+configure_logging()
+logger = logging.getLogger(__name__)
+
 # 导入游戏模块
-from src.game import SlayTheSpireGame, EMOJI
+from src.game import SlayTheSpireGame, EMOJI, build_map
 from src.models import GameState, Character, Enemy, DB_PATH
+from src import tracing
+from src import profiler
+from src.map_pool import MapPool
+from src import json_codec
+from src import compression
+from src import combat_events
+from src import db
+from src.hub_lag import HubLagMonitor
+from src import replica
+from src import runs
+from src import leaderboard
+
+class CodecJSONProvider(DefaultJSONProvider):
+    """让 jsonify 使用 src/json_codec.py 选择的编码后端"""
+
+    def dumps(self, obj, **kwargs):
+        return json_codec.dumps_str(obj)
+
+    def loads(self, s, **kwargs):
+        return json_codec.loads(s)
 
 # 创建Flask应用
 app = Flask(__name__)
+app.json = CodecJSONProvider(app)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'slay-the-spire-secret')
+# 管理接口令牌，未设置时管理接口全部禁用
+app.config['ADMIN_TOKEN'] = os.environ.get('ADMIN_TOKEN')
+# 消息压缩配置（环境变量，见 src/compression.py）
+compression.configure()
 socketio = SocketIO(app, 
                    cors_allowed_origins="*", 
                    ping_timeout=60,
                    ping_interval=25,
                    async_mode='eventlet',
-                   logger=True,
-                   engineio_logger=True)
+                   json=json_codec.SocketIOJSON,
+                   serializer=json_codec.packet_class(),
+                   logger=env_flag('SOCKETIO_LOGGER'),
+                   engineio_logger=env_flag('SOCKETIO_LOGGER'),
+                   **compression.server_options())
+compression.install(socketio.server.eio)
+
+# DuckDB 操作交给线程池执行，不阻塞 eventlet 主循环（环境变量见 src/db.py）
+db.configure()
+
+# 主循环延迟监控，用于确认数据库等阻塞操作没有卡住其他会话（见 src/hub_lag.py）
+HUB_LAG_INTERVAL = float(os.environ.get('HUB_LAG_INTERVAL', '0.1'))
+hub_lag = None
+if HUB_LAG_INTERVAL > 0:
+    hub_lag = HubLagMonitor(HUB_LAG_INTERVAL, float(os.environ.get('HUB_LAG_THRESHOLD', '100')))
+    socketio.start_background_task(hub_lag.run, socketio.sleep)
+
+# 定期刷新只读分析副本，统计查询只读副本，不与游戏争抢主库（见 src/replica.py）
+REPLICA_INTERVAL = float(os.environ.get('REPLICA_INTERVAL', '300'))
+
+def refresh_replica():
+    return db.run(replica.snapshot)
+
+if REPLICA_INTERVAL > 0:
+    socketio.start_background_task(replica.run, socketio.sleep, REPLICA_INTERVAL, refresh_replica)
+
+# 结束的对局先缓冲，定期批量写入 runs 表（见 src/runs.py）；进程退出时写入剩余的对局
+RUNS_FLUSH_INTERVAL = float(os.environ.get('RUNS_FLUSH_INTERVAL', '5'))
+runs.configure(buffered=True)
+socketio.start_background_task(runs.run, socketio.sleep, RUNS_FLUSH_INTERVAL)
+atexit.register(runs.flush)
+
+# 排行榜在内存中更新，定期写入 leaderboard_entries 表（见 src/leaderboard.py）
+LEADERBOARD_PERSIST_INTERVAL = float(os.environ.get('LEADERBOARD_PERSIST_INTERVAL', '30'))
+leaderboard.configure(buffered=True)
+leaderboard.load()
+socketio.start_background_task(leaderboard.run, socketio.sleep, LEADERBOARD_PERSIST_INTERVAL)
+atexit.register(leaderboard.persist)
+# atexit 按注册的相反顺序执行：退出时主循环已经停止，先关闭转交，再直接写入
+atexit.register(db.configure, offload=False)
 
 # 存储用户会话
 game_sessions = {}
 
+# 预生成地图池：后台任务在空闲时生成地图，创建会话时直接取用（见 src/map_pool.py）
+MAP_POOL_SIZE = int(os.environ.get('MAP_POOL_SIZE', '0'))
+if MAP_POOL_SIZE > 0:
+    SlayTheSpireGame.map_pool = MapPool(MAP_POOL_SIZE, build_map)
+    socketio.start_background_task(SlayTheSpireGame.map_pool.run, socketio.sleep)
+
 @app.route('/')
 def index():
     """主页"""
@@ -48,7 +122,7 @@ def index():
 def handle_connect():
     """处理客户端连接"""
     sid = request.sid
-    logger.info(f"客户端连接: {sid} ({request.remote_addr})")
+    logger.info("客户端连接: %s (%s)", sid, request.remote_addr)
     # 可以在这里创建一个新的空游戏对象，或者等待玩家操作
     # 为了简单起见，我们等待'new_game'或'load_game'事件
     socketio.emit('connected', {'sid': sid}, room=sid)
@@ -59,26 +133,28 @@ def handle_disconnect():
     sid = request.sid
     if sid in game_sessions:
         del game_sessions[sid]
-    logger.info(f"客户端断开连接: {sid}")
+    logger.info("客户端断开连接: %s", sid)
 
 @socketio.on_error_default
 def default_error_handler(e):
     """默认错误处理器"""
-    logger.error(f"WebSocket错误: {str(e)}")
+    logger.error("WebSocket错误: %s", e)
     if request.sid and request.sid in game_sessions:
         socketio.emit('game_error', {'error': str(e)}, room=request.sid)
 
-def get_game_state_json(game: SlayTheSpireGame):
-    """将游戏状态序列化为JSON"""
+def get_game_state_json(game: SlayTheSpireGame, map_version=None, piles=True):
+    """将游戏状态序列化为JSON
+
+    map_version 为客户端已有的地图版本，与当前版本相同时不再附带地图节点（客户端沿用上次的）；
+    piles 为 False 时不附带各牌堆的卡牌（战斗中客户端按 combat_events 更新手牌），只附带 pileSizes
+    """
     if not game or not game.game_state:
         return None
 
     state = game.game_state
     player = state.player
-
-    # 序列化卡牌
-    def serialize_card(card):
-        return card.to_dict() if card else None
+    # 牌堆按段缓存，没有变化的牌堆直接复用上次的结果
+    cache = game.state_cache
 
     # 序列化敌人
     def serialize_enemy(enemy):
@@ -98,6 +174,7 @@ def get_game_state_json(game: SlayTheSpireGame):
 
     # 构建JSON对象
     game_state_json = {
+        "stateVersion": game.state_version,
         "playerName": game.player_name,
         "floor": state.floor,
         "gameOver": state.game_over,
@@ -105,9 +182,9 @@ def get_game_state_json(game: SlayTheSpireGame):
         "shopPrices": state.shop_prices,
         "player": {
             "name": player.name,
-            "characterId": player.character_id,
-            "health": player.health,
-            "maxHealth": player.max_health,
+            "characterId": player.id,
+            "health": player.current_hp,
+            "maxHealth": player.max_hp,
             "energy": player.energy,
             "maxEnergy": player.max_energy,
             "block": player.block,
@@ -116,69 +193,93 @@ def get_game_state_json(game: SlayTheSpireGame):
             "dexterity": player.dexterity,
             "focus": player.focus,
             "effects": player.effects,
-            "deck": [serialize_card(c) for c in player.deck],
-            "hand": [serialize_card(c) for c in player.hand],
-            "drawPile": [serialize_card(c) for c in player.draw_pile],
-            "discardPile": [serialize_card(c) for c in player.discard_pile],
-            "exhaustPile": [serialize_card(c) for c in player.exhaust_pile],
+            "pileSizes": {
+                "deck": len(player.cards),
+                "hand": len(player.hand),
+                "drawPile": len(player.draw_pile),
+                "discardPile": len(player.discard_pile),
+                "exhaustPile": len(player.exhaust_pile)
+            },
             "relics": [serialize_relic(r) for r in player.relics],
             "potions": [serialize_potion(p) for p in player.potions],
         },
         "currentEnemies": [serialize_enemy(e) for e in state.current_enemies],
         "map": {
-            "nodes": [[serialize_node(node) for node in row] for row in game.map_nodes],
-            "currentNode": serialize_node(game.current_node)
+            "version": game.map_version,
+            "currentNode": serialize_node(game.current_node),
+            "available": [game.map_graph.position(node.index) for node in game.available_nodes()],
+            "visited": game.visited_positions()
         },
         "currentEvent": state.current_event.to_dict() if state.current_event else None,
         "rewards": state.rewards,
         "screen": state.screen # 新增：当前界面（map, combat, rewards, shop, rest, event）
     }
     
+    if piles:
+        player_json = game_state_json["player"]
+        player_json["deck"] = cache.cards('deck', player.cards)
+        player_json["hand"] = cache.cards('hand', player.hand)
+        player_json["drawPile"] = cache.cards('drawPile', player.draw_pile)
+        player_json["discardPile"] = cache.cards('discardPile', player.discard_pile)
+        player_json["exhaustPile"] = cache.cards('exhaustPile', player.exhaust_pile)
+    
+    if map_version != game.map_version:
+        game_state_json["map"]["nodes"] = game.map_nodes_json()
+    
     return game_state_json
 
-def emit_update(sid):
-    """向客户端发送最新的游戏状态"""
+def emit_update(sid, piles=True):
+    """向客户端发送最新的游戏状态（piles 见 get_game_state_json）"""
     game = game_sessions.get(sid)
     if game:
-        state_json = get_game_state_json(game)
-        socketio.emit('update_state', state_json, room=sid)
-        logger.info(f"Sent update_state to {sid}")
+        with tracing.span('json_build'):
+            state_json = get_game_state_json(game, game.sent_map_version, piles)
+        with tracing.span('emit'):
+            socketio.emit('update_state', state_json, room=sid)
+        game.sent_map_version = game.map_version
+        logger.debug("Sent update_state to %s", sid)
     else:
         # 如果没有游戏会话，可以发送一个空状态或错误
         socketio.emit('update_state', None, room=sid)
-        logger.warning(f"No game session found for {sid}, sent null state.")
+        logger.warning("No game session found for %s, sent null state.", sid)
 
 @socketio.on('new_game')
 def handle_new_game(data):
     """开始一个新游戏"""
+    with tracing.trace('new_game'):
+        _handle_new_game(data)
+
+def create_game(player_name, character_id):
+    """创建一局新游戏（Socket.IO 与 REST 接口共用）"""
+    game = SlayTheSpireGame()
+    game.generate_map()  # 同时设置初始节点
+    game.game_state.new_game(character_id, player_name, game.map_seed)
+    game.player_name = player_name
+    return game
+
+def _handle_new_game(data):
     sid = request.sid
     try:
         player_name = data.get('playerName', '无名英雄')
         character_id = int(data.get('characterId', 1))
         
-        logger.info(f"New game started for SID {sid}: player={player_name}, charID={character_id}")
+        logger.info("New game started for SID %s: player=%s, charID=%s", sid, player_name, character_id,
+                    extra={'sid': sid, 'character_id': character_id})
         
-        game = SlayTheSpireGame()
-        game.game_state.new_game(character_id, player_name)
-        game.player_name = player_name
-        game.generate_map()
-        
-        # 设置初始节点
-        if game.map_nodes and game.map_nodes[0]:
-            game.current_node = game.map_nodes[0][0]
-            game.current_node.visited = True
-        
-        game_sessions[sid] = game
+        game_sessions[sid] = create_game(player_name, character_id)
         emit_update(sid)
         
     except Exception as e:
-        logger.error(f"Error starting new game for {sid}: {e}")
-        logger.error(traceback.format_exc())
+        logger.error("Error starting new game for %s: %s", sid, e, exc_info=True)
         socketio.emit('game_error', {'error': f'创建新游戏失败: {e}'}, room=sid)
 
 @socketio.on('load_game')
 def handle_load_game(data):
     """加载游戏"""
+    with tracing.trace('load_game'):
+        _handle_load_game(data)
+
+def _handle_load_game(data):
     sid = request.sid
     save_name = data.get('saveName')
     if not save_name:
@@ -191,7 +292,7 @@ def handle_load_game(data):
             game = SlayTheSpireGame()
             game.game_state = game_state
             game.player_name = save_name
-            game.generate_map() # 地图也需要恢复
+            game.generate_map(game_state.map_seed)  # 按存档中的种子恢复同一张地图
             
             # 恢复当前节点位置
             current_floor = game_state.floor
@@ -213,19 +314,80 @@ def handle_load_game(data):
                 game_state.screen = 'map'
             
             game_sessions[sid] = game
-            logger.info(f"Game loaded for {sid} from save '{save_name}'")
+            logger.info("Game loaded for %s from save '%s'", sid, save_name, extra={'sid': sid})
             emit_update(sid)
         else:
             socketio.emit('game_error', {'error': f"找不到存档 '{save_name}'"}, room=sid)
 
     except Exception as e:
-        logger.error(f"Error loading game for {sid}: {e}")
-        logger.error(traceback.format_exc())
+        logger.error("Error loading game for %s: %s", sid, e, exc_info=True)
         socketio.emit('game_error', {'error': f'加载游戏失败: {e}'}, room=sid)
 
 @socketio.on('player_action')
 def handle_player_action(data):
     """处理玩家的通用操作"""
+    with profiler.profile_action(), tracing.trace('player_action', action=data.get('action')):
+        _handle_player_action(data)
+
+class UnknownActionError(ValueError):
+    """未知的玩家操作"""
+
+class UnsupportedActionError(UnknownActionError):
+    """网页版还没有实现的玩家操作"""
+
+# dispatch_action 交给游戏执行的操作（analyze_map 只读，单独处理）
+PLAYER_ACTIONS = ('play_card', 'end_turn', 'choose_path', 'upgrade_card', 'sync_state')
+
+# 奖励、商店、休息处和事件界面的操作：游戏中还没有对应的方法，不交给游戏，直接拒绝
+UNSUPPORTED_ACTIONS = ('choose_reward', 'shop_purchase', 'rest_site_choice', 'handle_event')
+
+def dispatch_action(game, action, payload):
+    """执行一个玩家操作（Socket.IO 与 REST 接口共用）
+
+    返回 (事件名, 数据)：analyze_map 返回 ('map_analysis', 分析结果)，不改变游戏状态；
+    出牌、结束回合返回 ('combat_events', 事件列表)；其他操作返回 (None, None)。
+    操作无效时抛出异常，未知操作抛出 UnknownActionError，尚未支持的操作抛出 UnsupportedActionError。
+    """
+    if action == 'analyze_map':
+        # payload: {'objective': 'elites'}，不填时返回全部预定义目标
+        return 'map_analysis', game.analyze_map(payload.get('objective'))
+
+    if action in UNSUPPORTED_ACTIONS:
+        raise UnsupportedActionError(f"暂不支持的操作: {action}")
+    if action not in PLAYER_ACTIONS:
+        raise UnknownActionError(f"未知的操作: {action}")
+    try:
+        return _apply_action(game, action, payload)
+    finally:
+        # 操作失败前可能已经改变了游戏状态（如出牌效果执行到一半），只要操作交给了游戏就递增版本号
+        game.state_version += 1
+
+def _apply_action(game, action, payload):
+    """执行 PLAYER_ACTIONS 中的操作，返回值同 dispatch_action"""
+    if action in ('play_card', 'end_turn'):
+        with combat_events.capture() as events:
+            if action == 'play_card':
+                # payload: {'card_index': idx, 'target_index': tidx}，target_index 可以为空
+                game.play_card(payload['card_index'], payload.get('target_index'))
+            else:
+                game.end_turn()
+        return 'combat_events', events
+
+    if action == 'choose_path':
+        # payload: {'row': y, 'col': x}
+        game.choose_path(payload['row'], payload['col'])
+
+    elif action == 'upgrade_card':
+        # payload: {'card_uid': 'uuid_of_card_to_upgrade'}
+        game.upgrade_card_at_rest_site(payload['card_uid'])
+
+    elif action == 'sync_state':
+        # 客户端的手牌与 pileSizes 不一致时请求完整状态
+        game.sent_map_version = None
+
+    return None, None
+
+def _handle_player_action(data):
     sid = request.sid
     game = game_sessions.get(sid)
     if not game:
@@ -236,53 +398,35 @@ def handle_player_action(data):
     payload = data.get('payload', {})
     
     try:
-        logger.info(f"Received action '{action}' from {sid} with payload: {payload}")
-        
-        # 根据action调用对应的游戏逻辑
-        if action == 'choose_path':
-            # 假设 payload 是 {'row': y, 'col': x}
-            row, col = payload['row'], payload['col']
-            game.move_to_node(row, col)
-
-        elif action == 'play_card':
-            # 假设 payload 是 {'card_index': idx, 'target_index': tidx}
-            card_idx = payload['card_index']
-            target_idx = payload.get('target_index') # 可以是None
-            game.play_card(card_idx, target_idx)
-            
-        elif action == 'end_turn':
-            game.end_turn()
-
-        elif action == 'choose_reward':
-            # payload: {'type': 'card'/'relic'/'gold', 'index': 0}
-            game.game_state.choose_reward(payload)
-
-        elif action == 'shop_purchase':
-            # payload: {'type': 'card'/'relic'/'potion', 'index': 0}
-            game.shop_purchase(payload['type'], payload['index'])
+        # 操作日志按采样率记录，payload 仅在 DEBUG 级别输出
+        if action_sampler.should_log() and logger.isEnabledFor(logging.INFO):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Received action '%s' from %s with payload: %s", action, sid, payload,
+                             extra={'sid': sid, 'action': action})
+            else:
+                logger.info("Received action '%s' from %s", action, sid, extra={'sid': sid, 'action': action})
         
-        elif action == 'rest_site_choice':
-            # payload: {'choice': 'rest'/'upgrade'}
-            game.rest_site_action(payload['choice'])
-            
-        elif action == 'upgrade_card':
-            # payload: {'card_uid': 'uuid_of_card_to_upgrade'}
-            game.upgrade_card_at_rest_site(payload['card_uid'])
+        event, result = dispatch_action(game, action, payload)
 
-        elif action == 'handle_event':
-            # payload: {'choice': 0}
-            game.handle_event_choice(payload['choice'])
-            
+        if event == 'map_analysis':
+            # 只回复分析结果，不推送状态
+            socketio.emit('map_analysis', result, room=sid)
+        elif event == 'combat_events':
+            # 战斗操作先发送事件流，再发送不含牌堆的状态（战斗结束时发送完整状态）
+            socketio.emit('combat_events', {'events': result}, room=sid)
+            emit_update(sid, piles=not game.game_state.in_combat)
         else:
-            logger.warning(f"Unknown action '{action}' from {sid}")
-            return
-            
-        # 动作执行后，发送最新的游戏状态
-        emit_update(sid)
+            # 动作执行后，发送最新的游戏状态
+            emit_update(sid)
         
+    except UnsupportedActionError as e:
+        logger.warning("Unsupported action '%s' from %s", action, sid)
+        socketio.emit('game_error', {'error': str(e)}, room=sid)
+    except UnknownActionError:
+        logger.warning("Unknown action '%s' from %s", action, sid)
     except Exception as e:
-        logger.error(f"Error processing action '{action}' for {sid}: {e}")
-        logger.error(traceback.format_exc())
+        logger.error("Error processing action '%s' for %s: %s", action, sid, e, exc_info=True,
+                     extra={'sid': sid, 'action': action})
         socketio.emit('game_error', {'error': f'处理操作失败: {e}'}, room=sid)
 
 @app.route('/simple')
@@ -299,6 +443,263 @@ def test_page():
     logger.info(f"访问测试页面: {request.remote_addr}")
     return render_template('test.html')
 
+def admin_required(view):
+    """要求请求携带正确的管理令牌（X-Admin-Token 请求头或 token 参数）"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        expected = app.config.get('ADMIN_TOKEN')
+        token = request.headers.get('X-Admin-Token') or request.args.get('token') or ''
+        if not expected or not hmac.compare_digest(token, expected):
+            logger.warning(f"拒绝未授权的管理请求: {request.path} ({request.remote_addr})")
+            return jsonify({"status": "error", "message": "需要管理权限"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+@app.route('/debug/profile', methods=['POST'])
+@admin_required
+def start_profile():
+    """开始剖析: ?mode=cprofile|sample&seconds=N&actions=N"""
+    mode = request.args.get('mode', 'cprofile')
+    seconds = request.args.get('seconds', type=float)
+    actions = request.args.get('actions', type=int)
+    if mode not in profiler.MODES:
+        return jsonify({"status": "error", "message": f"未知的剖析模式: {mode}"}), 400
+    capture = profiler.start(mode, seconds=seconds, actions=actions)
+    if capture is None:
+        return jsonify({"status": "error", "message": "已有剖析正在进行"}), 409
+    logger.info(f"开始剖析: mode={mode}, seconds={capture.seconds}, actions={actions}")
+    return jsonify({"status": "started", "profile": capture.status()}), 202
+
+@app.route('/debug/profile', methods=['GET'])
+@admin_required
+def get_profile():
+    """剖析状态；结束后 ?format=text 返回 pstats/折叠栈文本，?format=raw 返回 .prof 数据"""
+    capture = profiler.current()
+    if capture is None:
+        return jsonify({"status": "idle"})
+    fmt = request.args.get('format')
+    if not capture.finished or fmt is None:
+        return jsonify({"status": "finished" if capture.finished else "running", "profile": capture.status()})
+    if fmt == 'raw':
+        data = capture.raw()
+        if data is None:
+            return jsonify({"status": "error", "message": "采样模式没有原始pstats数据"}), 400
+        return app.response_class(data, mimetype='application/octet-stream',
+                                  headers={'Content-Disposition': 'attachment; filename=profile.prof'})
+    sort = request.args.get('sort', 'cumulative')
+    limit = request.args.get('limit', 50, type=int)
+    return app.response_class(capture.text(sort=sort, limit=limit), mimetype='text/plain; charset=utf-8')
+
+@app.route('/debug/profile', methods=['DELETE'])
+@admin_required
+def stop_profile():
+    """立即结束剖析"""
+    capture = profiler.stop()
+    if capture is None:
+        return jsonify({"status": "idle"})
+    return jsonify({"status": "finished", "profile": capture.status()})
+
+@app.route('/debug/compression', methods=['GET', 'DELETE'])
+@admin_required
+def debug_compression():
+    """消息压缩统计（原始字节数 / 实际发送字节数），DELETE 清零"""
+    if request.method == 'DELETE':
+        compression.reset_stats()
+    return jsonify(compression.get_stats())
+
+@app.route('/debug/db', methods=['GET', 'DELETE'])
+@admin_required
+def debug_db():
+    """数据库操作转交统计和主循环延迟，DELETE 清零"""
+    if request.method == 'DELETE':
+        db.reset_stats()
+        if hub_lag:
+            hub_lag.reset()
+    return jsonify({"db": db.get_stats(), "hubLag": hub_lag.stats() if hub_lag else None})
+
+@app.route('/debug/replica', methods=['GET', 'POST'])
+@admin_required
+def debug_replica():
+    """分析副本的快照时间和各表行数，POST 立即刷新"""
+    if request.method == 'POST':
+        refresh_replica()
+    return jsonify(db.run(replica.info))
+
+@app.route('/debug/traces')
+@admin_required
+def debug_traces():
+    """最近的慢追踪（?format=json 返回JSON）"""
+    limit = request.args.get('limit', type=int)
+    traces = tracing.get_slow_traces(limit)
+    if request.args.get('format') == 'json':
+        return jsonify({"stats": tracing.get_stats(), "traces": traces})
+    return render_template('traces.html', traces=traces, stats=tracing.get_stats())
+
+# REST 接口：不使用 WebSocket 的客户端（机器人、测试、轻量客户端）通过 HTTP 进行游戏，
+# 与 Socket.IO 共用 game_sessions 和 dispatch_action，会话键为 run_id
+API_MAX_BATCH = int(os.environ.get('API_MAX_BATCH', '50'))
+# REST 会话没有连接可以断开：超过 API_SESSION_TTL 秒没有访问的会话被回收，同时存在的会话不超过 API_MAX_SESSIONS 个
+API_SESSION_TTL = float(os.environ.get('API_SESSION_TTL', '1800'))
+API_MAX_SESSIONS = int(os.environ.get('API_MAX_SESSIONS', '1000'))
+
+# REST 会话最后一次访问的时间（time.monotonic()），键为 run_id
+api_last_access = {}
+
+def expire_api_sessions(now=None):
+    """回收超时的 REST 会话，返回回收的数量"""
+    now = time.monotonic() if now is None else now
+    expired = [run_id for run_id, last in api_last_access.items() if now - last > API_SESSION_TTL]
+    for run_id in expired:
+        del api_last_access[run_id]
+        game_sessions.pop(run_id, None)
+    if expired:
+        logger.info("回收 %s 个超时的 REST 会话", len(expired))
+    return len(expired)
+
+def _expire_api_sessions_task():
+    while True:
+        socketio.sleep(min(API_SESSION_TTL, 60))
+        expire_api_sessions()
+
+socketio.start_background_task(_expire_api_sessions_task)
+
+def _api_error(message, status):
+    return jsonify({"status": "error", "message": message}), status
+
+def _api_game(run_id):
+    """按 run_id 取 REST 会话并刷新访问时间（只接受 REST 接口创建的、没有超时的会话）"""
+    last = api_last_access.get(run_id)
+    if last is None:
+        return None
+    now = time.monotonic()
+    if now - last > API_SESSION_TTL:
+        # 后台任务还没来得及回收
+        del api_last_access[run_id]
+        game_sessions.pop(run_id, None)
+        return None
+    api_last_access[run_id] = now
+    return game_sessions.get(run_id)
+
+@app.route('/api/runs', methods=['POST'])
+def api_create_run():
+    """创建一局游戏: {"playerName": "...", "characterId": 1}"""
+    if len(api_last_access) >= API_MAX_SESSIONS and not expire_api_sessions():
+        response = _api_error(f'REST 会话已达上限（{API_MAX_SESSIONS}），请稍后再试', 503)
+        response[0].headers['Retry-After'] = str(int(min(API_SESSION_TTL, 60)))
+        return response
+    data = request.get_json(silent=True) or {}
+    player_name = data.get('playerName', '无名英雄')
+    try:
+        character_id = int(data.get('characterId', 1))
+        with tracing.trace('new_game', api=True):
+            game = create_game(player_name, character_id)
+    except Exception as e:
+        logger.error("Error starting REST run: %s", e, exc_info=True)
+        return _api_error(f'创建新游戏失败: {e}', 400)
+
+    run_id = 'run-' + uuid.uuid4().hex
+    game_sessions[run_id] = game
+    api_last_access[run_id] = time.monotonic()
+    logger.info("REST run created: %s (player=%s, charID=%s)", run_id, player_name, character_id)
+    return jsonify({"runId": run_id, "state": get_game_state_json(game)}), 201
+
+@app.route('/api/runs/<run_id>/actions', methods=['POST'])
+def api_run_actions(run_id):
+    """按顺序执行一批操作: {"actions": [{"action": "play_card", "payload": {...}}, ...]}
+
+    遇到第一个失败的操作即停止，后续操作不再执行；返回每个已执行操作的结果和最新状态。
+    ?map_version= 与客户端已有的地图版本相同时状态中不附带地图节点。
+    """
+    game = _api_game(run_id)
+    if game is None:
+        return _api_error('游戏会话不存在', 404)
+    data = request.get_json(silent=True) or {}
+    actions = data.get('actions')
+    if not isinstance(actions, list) or not actions:
+        return _api_error('需要提供 actions 列表', 400)
+    if len(actions) > API_MAX_BATCH:
+        return _api_error(f'一次最多提交 {API_MAX_BATCH} 个操作', 400)
+
+    results = []
+    for item in actions:
+        if not isinstance(item, dict):
+            results.append({"action": None, "ok": False, "error": "操作格式无效"})
+            break
+        action = item.get('action')
+        payload = item.get('payload') or {}
+        try:
+            with profiler.profile_action(), tracing.trace('player_action', action=action, api=True):
+                event, result = dispatch_action(game, action, payload)
+        except Exception as e:
+            if not isinstance(e, UnknownActionError):
+                logger.error("Error processing REST action '%s' for %s: %s", action, run_id, e, exc_info=True,
+                             extra={'sid': run_id, 'action': action})
+            results.append({"action": action, "ok": False, "error": str(e)})
+            break
+        entry = {"action": action, "ok": True}
+        if event is not None:
+            entry[event] = result
+        results.append(entry)
+
+    map_version = request.args.get('map_version', type=int)
+    return jsonify({"results": results, "state": get_game_state_json(game, map_version)})
+
+@app.route('/api/runs/<run_id>/state')
+def api_run_state(run_id):
+    """当前状态；?since= 与当前 stateVersion 相同时返回 304（?map_version= 同上）"""
+    game = _api_game(run_id)
+    if game is None:
+        return _api_error('游戏会话不存在', 404)
+    since = request.args.get('since', type=int)
+    if since is not None and since == game.state_version:
+        return '', 304
+    map_version = request.args.get('map_version', type=int)
+    return jsonify(get_game_state_json(game, map_version))
+
+@app.route('/api/runs/<run_id>', methods=['DELETE'])
+def api_delete_run(run_id):
+    """结束一局 REST 游戏，释放会话"""
+    if _api_game(run_id) is None:
+        return _api_error('游戏会话不存在', 404)
+    del api_last_access[run_id]
+    game_sessions.pop(run_id, None)
+    return jsonify({"status": "deleted"})
+
+@app.route('/api/stats/characters')
+def api_character_stats():
+    """各角色的对局数、胜率、平均楼层（读取分析副本，副本刷新前返回缓存结果）"""
+    if not os.path.exists(replica.REPLICA_PATH):
+        return _api_error('分析副本尚未生成', 503)
+    return jsonify({"characters": db.run(runs.character_stats)})
+
+@app.route('/api/stats/cards')
+def api_card_stats():
+    """卡牌奖励选取率: ?character_id=1&limit=50"""
+    character_id = request.args.get('character_id', type=int)
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    if not os.path.exists(replica.REPLICA_PATH):
+        return _api_error('分析副本尚未生成', 503)
+    return jsonify({"cards": db.run(runs.card_pick_rates, character_id, limit)})
+
+@app.route('/api/leaderboards')
+def api_leaderboards():
+    """所有排行榜的前几名: ?limit=10"""
+    limit = max(0, request.args.get('limit', 10, type=int))
+    return jsonify({"boards": {
+        name: {"title": title, "entries": leaderboard.get_board(name).top(limit)}
+        for name, (title, _) in leaderboard.BOARDS.items()
+    }})
+
+@app.route('/api/leaderboards/<board>')
+def api_leaderboard(board):
+    """单个排行榜: ?limit=100"""
+    try:
+        ranking = leaderboard.get_board(board)
+    except KeyError:
+        return _api_error(f'排行榜不存在: {board}', 404)
+    limit = max(0, request.args.get('limit', ranking.size, type=int))
+    return jsonify({"board": board, "title": ranking.title, "entries": ranking.top(limit)})
+
 @app.route('/api/test')
 def test_api():
     """测试API是否正常工作"""
@@ -316,12 +717,23 @@ if __name__ == '__main__':
     # 解析命令行参数
     parser = argparse.ArgumentParser(description='杀戮尖塔命令行游戏Web服务器')
     parser.add_argument('--port', type=int, default=os.environ.get("PORT", 14514), help='服务器端口号')
+    parser.add_argument('--log-level', help='日志级别（覆盖 LOG_LEVEL）')
+    parser.add_argument('--log-format', choices=['text', 'json'], help='日志格式（覆盖 LOG_FORMAT）')
+    parser.add_argument('--log-module-levels', help='按模块设置日志级别，如 engineio=WARNING,src.models=DEBUG')
+    parser.add_argument('--log-action-sample-rate', type=float, help='玩家操作日志采样率（0~1）')
+    parser.add_argument('--log-sync', action='store_true', help='同步写日志（调试用）')
     args = parser.parse_args()
     
+    # 命令行参数覆盖环境变量中的日志配置
+    configure_logging(level=args.log_level, fmt=args.log_format, module_levels=args.log_module_levels,
+                      use_async=False if args.log_sync else None,
+                      action_sample_rate=args.log_action_sample_rate)
+    
     # 启动服务器
     port = args.port
     logger.info(f"启动服务器: 0.0.0.0:{port}")
     # 使用 gunicorn 时不需要 app.run()
     # 在 Dockerfile 中通过 gunicorn 启动
     # 为了本地开发方便，可以保留这个
-    socketio.run(app, host='0.0.0.0', port=port, debug=True) 
\ No newline at end of file
+    # 重载器在子线程中运行服务器，tpool.execute 在那里不会返回（DB_OFFLOAD 下的数据库操作全部超时），所以关闭重载
+    socketio.run(app, host='0.0.0.0', port=port, debug=True, use_reloader=False)
@@ -0,0 +1,46 @@
+#!/bin/bash
+# 性能基准测试脚本
+#
+# 用法:
+#   ./bench.sh run                 运行全部基准测试（不保存）
+#   ./bench.sh save [名称]         运行并保存为基线（默认名称为当前git提交）
+#   ./bench.sh compare [阈值]      与最近保存的基线比较，平均耗时变慢超过阈值（默认15%）则失败
+#   ./bench.sh list                列出已保存的基线
+#
+# 额外参数会传给 pytest，例如: ./bench.sh compare 10% -k card_play
+
+set -e
+
+cd "$(dirname "$0")"
+
+STORAGE=benchmarks/.baselines
+COMMAND=${1:-run}
+shift || true
+
+case "$COMMAND" in
+    run)
+        python -m pytest benchmarks "$@"
+        ;;
+    save)
+        NAME=${1:-$(git rev-parse --short HEAD 2>/dev/null || echo baseline)}
+        shift || true
+        python -m pytest benchmarks --benchmark-save="$NAME" "$@"
+        echo "基线已保存到 $STORAGE"
+        ;;
+    compare)
+        THRESHOLD=${1:-15%}
+        shift || true
+        if [ ! -d "$STORAGE" ]; then
+            echo "错误: 没有已保存的基线，请先运行 ./bench.sh save"
+            exit 1
+        fi
+        python -m pytest benchmarks --benchmark-compare --benchmark-compare-fail=mean:"$THRESHOLD" "$@"
+        ;;
+    list)
+        find "$STORAGE" -name '*.json' 2>/dev/null | sort
+        ;;
+    *)
+        echo "未知命令: $COMMAND（可用: run, save, compare, list）"
+        exit 1
+        ;;
+esac
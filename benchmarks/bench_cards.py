@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""卡牌与抽牌基准测试"""
+import random
+from array import array
+
+import pytest
+
+from conftest import make_card, make_deck, make_enemies, CHARACTER_IDS
+from src.models import Character, Orb
+from src.piles import IndexPile, PileSet
+
+
+# 所有已实现效果的卡牌（参数化在收集阶段进行，此时数据库尚未初始化）
+CARD_NAMES = [
+    "打击", "防御", "愤怒", "重击", "铁斩波", "顺势斩", "战斗呐喊", "血肉奉献", "狂暴打击",
+    "毒刃", "闪避", "致命毒素", "刀刃之舞", "暗影步伐", "毒雾弹", "伏击",
+    "闪电球", "冰霜球", "双重施法", "自我修复", "火球术", "能量涌动", "核心过载", "数据分析"
+]
+
+
+@pytest.mark.parametrize('card_name', CARD_NAMES)
+def bench_card_play(benchmark, catalog, db_path, card_name):
+    """Card.play：每张卡牌打出一次"""
+    row = next(r for r in catalog if r[1] == card_name)
+    base = Character.load_from_db(row[6] or 1)
+    deck = make_deck(catalog, base.id, 30)
+
+    def setup():
+        player = Character(base.id, base.name, base.max_hp, 100, base.description)
+        player.energy = 10
+        player.draw_pile = list(deck)
+        player.hand = list(deck[:5])
+        enemies = make_enemies()
+        player.current_enemies = enemies
+        return (player, enemies), {}
+
+    card = make_card(row)
+    benchmark.pedantic(card.play, setup=setup, rounds=2000)
+
+
+# 抽牌堆大小（抽牌开销应与牌堆大小无关）
+PILE_SIZES = [10, 50, 200, 1000, 10000]
+
+
+@pytest.mark.parametrize('pile_size', PILE_SIZES)
+def bench_draw_cards(benchmark, catalog, db_path, pile_size):
+    """Character.draw_cards：从不同大小的抽牌堆抽5张"""
+    base = Character.load_from_db(1)
+    deck = make_deck(catalog, 1, pile_size)
+
+    def setup():
+        base.draw_pile = list(deck)
+        base.hand = []
+        base.discard_pile = []
+        return (5,), {}
+
+    benchmark.pedantic(base.draw_cards, setup=setup, rounds=2000)
+
+
+@pytest.mark.parametrize('pile_size', PILE_SIZES)
+def bench_draw_one(benchmark, catalog, db_path, pile_size):
+    """Character.draw_cards：逐张抽牌，每次抽1张"""
+    base = Character.load_from_db(1)
+    deck = make_deck(catalog, 1, pile_size)
+    base.draw_pile = list(deck)
+    base.discard_pile = []
+
+    def draw_one():
+        if not base.draw_pile:
+            base.draw_pile = list(deck)
+        base.hand = []
+        return base.draw_cards(1)
+
+    benchmark(draw_one)
+
+
+@pytest.mark.parametrize('character_id', CHARACTER_IDS)
+def bench_draw_with_reshuffle(benchmark, catalog, db_path, character_id):
+    """Character.draw_cards：抽牌堆为空时重洗弃牌堆"""
+    base = Character.load_from_db(character_id)
+    deck = make_deck(catalog, character_id, 30)
+
+    def setup():
+        base.draw_pile = []
+        base.hand = []
+        base.discard_pile = list(deck)
+        return (5,), {}
+
+    benchmark.pedantic(base.draw_cards, setup=setup, rounds=2000)
+
+
+@pytest.mark.parametrize('pile_size', PILE_SIZES)
+def bench_index_pile_draw(benchmark, catalog, db_path, pile_size):
+    """PileSet.draw_cards：下标牌堆从不同大小的抽牌堆抽5张"""
+    base = Character.load_from_db(1)
+    base.draw_pile = make_deck(catalog, 1, pile_size)
+    piles = PileSet.from_character(base)
+    full = array('H', piles.draw_pile.data)
+
+    def setup():
+        piles.draw_pile.data = array('H', full)
+        piles.hand.clear()
+        piles.discard_pile.clear()
+        return (5,), {}
+
+    benchmark.pedantic(piles.draw_cards, setup=setup, rounds=2000)
+
+
+@pytest.mark.parametrize('pile_size', [30, 200, 1000])
+def bench_index_pile_shuffle(benchmark, catalog, db_path, pile_size):
+    """IndexPile.shuffle：原地 Fisher-Yates 洗牌"""
+    pile = IndexPile(range(pile_size))
+    rng = random.Random(0)
+    benchmark(pile.shuffle, rng)
+
+
+def bench_orb_channel_evoke(benchmark, db_path):
+    """Character.add_orb：充能球槽已满时生成新球（激发最早的球）"""
+    player = Character.load_from_db(3)
+    player.current_enemies = make_enemies()
+    for _ in range(player.orb_slots):
+        player.add_orb(Orb("Frost"))
+    benchmark(player.add_orb, Orb("Frost"))
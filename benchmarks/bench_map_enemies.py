@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""地图生成与敌人生成基准测试"""
+import pytest
+
+from src.game import SlayTheSpireGame, build_map
+from src.map_pool import MapPool
+from src.map_graph import MapGraph
+from src.map_analysis import analyze
+from src.models import GameState
+from src.enemies import get_registry
+from src.intents import roll_intents
+
+
+def bench_generate_map(benchmark):
+    """SlayTheSpireGame.generate_map"""
+    game = SlayTheSpireGame()
+    benchmark(game.generate_map)
+
+
+def bench_generate_map_pooled(benchmark):
+    """SlayTheSpireGame.generate_map：从预生成地图池取地图（池由后台任务补充，不计入）"""
+    game = SlayTheSpireGame()
+    pool = MapPool(64, build_map)
+    game.map_pool = pool
+
+    def setup():
+        pool.fill()
+
+    benchmark.pedantic(game.generate_map, setup=setup, rounds=500)
+
+
+def bench_build_map_seeded(benchmark):
+    """build_map：按固定种子生成地图（读档时的路径）"""
+    benchmark(build_map, 12345)
+
+
+def bench_map_graph_build(benchmark):
+    """MapGraph：从地图节点构建邻接结构和子节点掩码"""
+    layers = build_map(12345)
+    benchmark(MapGraph, layers)
+
+
+def bench_analyze_map(benchmark):
+    """map_analysis.analyze：路径数和全部预定义目标的最优路径"""
+    graph = MapGraph(build_map(12345))
+    benchmark(analyze, graph)
+
+
+def bench_choose_path(benchmark):
+    """SlayTheSpireGame.advance_to_node：O(1) 校验并前往下一层节点"""
+    game = SlayTheSpireGame()
+
+    def setup():
+        game.generate_map(12345)
+        return (game.current_node.connections[0].index,), {}
+
+    benchmark.pedantic(game.advance_to_node, setup=setup, rounds=500)
+
+
+@pytest.mark.parametrize('act', [1, 2, 3])
+@pytest.mark.parametrize('kind', ['normal', 'elite', 'boss'])
+def bench_get_random_enemy(benchmark, act, kind):
+    """GameState.get_random_enemy：各章节的普通/精英/Boss遭遇"""
+    state = GameState()
+    benchmark(state.get_random_enemy, is_elite=(kind == 'elite'), is_boss=(kind == 'boss'), act=act)
+
+
+@pytest.mark.parametrize('encounter', ['Gremlin Gang', 'Jaw Worm Horde', 'Hexaghost', 'Time Eater'])
+def bench_roll_intents(benchmark, encounter):
+    """intents.roll_intents：一个回合内为遭遇中所有敌人选择意图"""
+    enemies = get_registry().encounters[encounter].spawn()
+    benchmark(roll_intents, enemies)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""内存基准测试：每个空闲会话（新开局、地图已生成、尚未行动）占用的字节数
+
+也可以直接运行: python benchmarks/bench_memory.py [会话数量]
+"""
+import gc
+import os
+import sys
+import tracemalloc
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import conftest
+from src.game import SlayTheSpireGame
+
+SESSION_COUNT = 200
+
+
+def create_idle_session(index):
+    """创建一个空闲会话，与 app.handle_new_game 的流程一致"""
+    game = SlayTheSpireGame()
+    game.generate_map()
+    game.game_state.new_game(1 + index % 3, f"mem_{index}", game.map_seed)
+    game.player_name = f"mem_{index}"
+    return game
+
+
+def measure_session_bytes(count=SESSION_COUNT):
+    """返回每个空闲会话保留的平均字节数（tracemalloc统计的Python对象内存）"""
+    # 预热：加载模块级缓存，避免计入第一个会话
+    create_idle_session(0)
+    gc.collect()
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    sessions = {f"sid{i}": create_idle_session(i) for i in range(count)}
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    retained = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    assert len(sessions) == count
+    return retained / count
+
+
+def bench_idle_session_bytes(benchmark, db_path):
+    """每个空闲会话的内存占用（结果记录在 extra_info 中）"""
+    bytes_per_session = benchmark.pedantic(measure_session_bytes, args=(SESSION_COUNT,), rounds=1, iterations=1)
+    benchmark.extra_info['bytes_per_session'] = round(bytes_per_session)
+    print(f"\n每个空闲会话约 {bytes_per_session / 1024:.1f} KiB")
+
+
+if __name__ == "__main__":
+    from src.db_init import init_database, DB_PATH
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    init_database()
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else SESSION_COUNT
+    print(f"每个空闲会话约 {measure_session_bytes(count) / 1024:.1f} KiB（{count} 个会话取平均）")
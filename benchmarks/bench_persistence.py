@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""存档读写基准测试（不同牌组大小 × 不同存档表规模）"""
+import pytest
+
+from conftest import new_game_state, populate_saves
+from src.models import GameState
+
+DB_SIZES = [0, 1000, 10000]
+DECK_SIZES = [10, 30, 60]
+
+
+@pytest.fixture(scope='module', params=DB_SIZES, ids=lambda n: f"saves{n}")
+def db_size(request, db_path):
+    populate_saves(db_path, request.param)
+    return request.param
+
+
+@pytest.mark.parametrize('deck_size', DECK_SIZES)
+def bench_save_game(benchmark, db_path, catalog, db_size, deck_size):
+    """GameState.save_game"""
+    state = new_game_state(db_path, player_name='bench_save', deck_size=deck_size, catalog=catalog)
+    benchmark.pedantic(state.save_game, args=('bench_save',), rounds=20, warmup_rounds=1)
+
+
+@pytest.mark.parametrize('deck_size', DECK_SIZES)
+def bench_load_game(benchmark, db_path, catalog, db_size, deck_size):
+    """GameState.load_game"""
+    state = new_game_state(db_path, player_name=f'bench_load_{deck_size}', deck_size=deck_size, catalog=catalog)
+    state.save_game(f'bench_load_{deck_size}')
+    result = benchmark.pedantic(GameState.load_game, args=(f'bench_load_{deck_size}',), rounds=20, warmup_rounds=1)
+    assert result is not None
+    assert len(result.player.cards) == deck_size
+
+
+@pytest.mark.parametrize('offload', [False, True], ids=['direct', 'tpool'])
+def bench_load_game_offload(benchmark, db_path, catalog, offload):
+    """GameState.load_game：直接执行与交给线程池执行（src/db.py）的单次开销"""
+    from src import db
+    state = new_game_state(db_path, player_name='bench_offload', deck_size=30, catalog=catalog)
+    state.save_game('bench_offload')
+    db.configure(offload=offload)
+    try:
+        benchmark.pedantic(GameState.load_game, args=('bench_offload',), rounds=20, warmup_rounds=1)
+    finally:
+        db.configure(offload=False)
+
+
+RUN_HISTORY_SIZE = 10000
+
+
+@pytest.fixture(scope='module')
+def run_history(db_path):
+    """runs 表中的 RUN_HISTORY_SIZE 局历史对局"""
+    import duckdb
+    from src import runs
+    con = duckdb.connect(db_path)
+    runs.create_tables(con)
+    con.execute("DELETE FROM runs")
+    con.execute("SELECT setseed(0.7)")
+    con.execute(
+        """
+        INSERT INTO runs (player_name, character_id, floor_reached, victory, gold, max_hp, deck, upgraded_cards, relics)
+        SELECT 'bench_' || i, 1 + (i % 3), 1 + floor(random() * 50), false, floor(random() * 1000), 80, [], 0, []
+        FROM range(?) t(i)
+        """,
+        [RUN_HISTORY_SIZE]
+    )
+    con.close()
+    return RUN_HISTORY_SIZE
+
+
+@pytest.mark.parametrize('source', ['heap', 'sql'])
+def bench_leaderboard_top(benchmark, db_path, run_history, source):
+    """最高楼层排行榜前 100 名：内存中的排行榜（src/leaderboard.py）与每次查询 runs 表"""
+    import duckdb
+    from src import leaderboard
+    leaderboard.configure(size=100)
+    leaderboard.load(db_path)
+    board = leaderboard.get_board('floor')
+
+    def query():
+        con = duckdb.connect(db_path)
+        try:
+            return con.execute(
+                "SELECT player_name, floor_reached FROM runs ORDER BY floor_reached DESC, id LIMIT 100"
+            ).fetchall()
+        finally:
+            con.close()
+
+    result = benchmark(board.top if source == 'heap' else query)
+    assert len(result) == 100
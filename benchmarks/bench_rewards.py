@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""奖励生成基准测试"""
+import pytest
+
+from conftest import new_game_state, CHARACTER_IDS
+from src.game import SlayTheSpireGame
+from src import sampler
+
+
+@pytest.fixture
+def game_for(db_path):
+    def make(character_id):
+        game = SlayTheSpireGame()
+        game.game_state = new_game_state(db_path, character_id=character_id, player_name='bench_reward')
+        return game
+    return make
+
+
+@pytest.mark.parametrize('character_id', CHARACTER_IDS)
+def bench_roll_card_rewards(benchmark, game_for, character_id):
+    """SlayTheSpireGame.roll_card_rewards：战斗后的卡牌奖励"""
+    game = game_for(character_id)
+    benchmark(game.roll_card_rewards)
+
+
+@pytest.mark.parametrize('character_id', CHARACTER_IDS)
+def bench_get_random_relic(benchmark, game_for, character_id):
+    """SlayTheSpireGame.get_random_relic：宝箱遗物"""
+    game = game_for(character_id)
+    benchmark(game.get_random_relic)
+
+
+@pytest.mark.parametrize('y', [2, 10])
+def bench_roll_node_type(benchmark, y):
+    """sampler.roll_node_type：地图普通节点的类型"""
+    benchmark(sampler.roll_node_type, y)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""游戏状态序列化基准测试"""
+import json
+
+import pytest
+
+from conftest import new_game_state, make_enemies
+from src.game import SlayTheSpireGame
+from src import json_codec
+
+
+@pytest.fixture(scope='module')
+def app_module():
+    import app
+    return app
+
+
+def _make_game(db_path, catalog, deck_size):
+    game = SlayTheSpireGame()
+    game.generate_map(12345)
+    game.player_name = 'bench'
+    game.game_state = new_game_state(db_path, deck_size=deck_size, catalog=catalog)
+    player = game.game_state.player
+    # 模拟战斗中：手牌5张，其余分布在抽牌堆和弃牌堆
+    player.hand = player.draw_pile[:5]
+    player.discard_pile = player.draw_pile[5:5 + deck_size // 3]
+    player.draw_pile = player.draw_pile[5 + deck_size // 3:]
+    game.game_state.current_enemies = make_enemies()
+    game.game_state.in_combat = True
+    game.game_state.screen = 'combat'
+    return game
+
+
+@pytest.mark.parametrize('deck_size', [10, 30, 50, 100])
+def bench_get_game_state_json(benchmark, app_module, db_path, catalog, deck_size):
+    """get_game_state_json：构建完整状态字典"""
+    game = _make_game(db_path, catalog, deck_size)
+    benchmark(app_module.get_game_state_json, game)
+
+
+@pytest.mark.parametrize('deck_size', [10, 50])
+def bench_state_json_dumps(benchmark, app_module, db_path, catalog, deck_size):
+    """get_game_state_json + json.dumps：完整的一次状态编码"""
+    game = _make_game(db_path, catalog, deck_size)
+    benchmark(lambda: json.dumps(app_module.get_game_state_json(game), ensure_ascii=False))
+
+
+@pytest.mark.parametrize('map_sent', [False, True], ids=['with_map', 'map_unchanged'])
+def bench_state_json_map(benchmark, app_module, db_path, catalog, map_sent):
+    """get_game_state_json + json.dumps：客户端已有当前地图时不再附带地图节点"""
+    game = _make_game(db_path, catalog, 30)
+    map_version = game.map_version if map_sent else None
+    benchmark(lambda: json.dumps(app_module.get_game_state_json(game, map_version), ensure_ascii=False))
+
+
+def _late_game(db_path, catalog):
+    """50张牌的后期状态：手牌、抽牌堆、弃牌堆都有牌，地图已发送"""
+    game = _make_game(db_path, catalog, 50)
+    game.sent_map_version = game.map_version
+    return game
+
+
+def bench_state_json_cold(benchmark, app_module, db_path, catalog):
+    """50张牌：所有缓存失效时的完整序列化（相当于不做分段缓存）"""
+    game = _late_game(db_path, catalog)
+    player = game.game_state.player
+
+    def setup():
+        game.state_cache.clear()
+        for card in player.cards:
+            card._dict = None
+
+    benchmark.pedantic(app_module.get_game_state_json, args=(game, game.map_version), setup=setup, rounds=2000)
+
+
+def bench_state_json_hp_change(benchmark, app_module, db_path, catalog):
+    """50张牌：只有生命值变化，所有牌堆复用缓存"""
+    game = _late_game(db_path, catalog)
+    player = game.game_state.player
+
+    def run():
+        player.current_hp = 1 + player.current_hp % 50
+        return app_module.get_game_state_json(game, game.map_version)
+
+    benchmark(run)
+
+
+def bench_state_json_card_played(benchmark, app_module, db_path, catalog):
+    """50张牌：打出一张牌（手牌和弃牌堆变化），其余牌堆复用缓存"""
+    game = _late_game(db_path, catalog)
+    player = game.game_state.player
+
+    def run():
+        if player.hand:
+            player.discard_pile.append(player.hand.pop())
+        else:
+            player.hand.extend(player.discard_pile[-5:])
+            del player.discard_pile[-5:]
+        return app_module.get_game_state_json(game, game.map_version)
+
+    benchmark(run)
+
+
+@pytest.fixture(params=json_codec.available())
+def codec_backend(request):
+    """依次使用每个已安装的JSON后端，结束后恢复自动选择"""
+    json_codec.use(request.param)
+    yield request.param
+    json_codec.use()
+
+
+def bench_codec_dumps(benchmark, app_module, db_path, catalog, codec_backend):
+    """json_codec.dumps：50张牌后期状态（含地图）编码为字节串"""
+    game = _late_game(db_path, catalog)
+    state = app_module.get_game_state_json(game)
+    benchmark(json_codec.dumps, state)
+
+
+@pytest.mark.parametrize('packet_class', ['default', 'codec'])
+def bench_codec_socketio_packet(benchmark, app_module, db_path, catalog, codec_backend, packet_class):
+    """Socket.IO 数据包构建 + 编码：emit_update 发送一次状态时的实际编码路径"""
+    from socketio import packet
+    cls = json_codec.CodecPacket if packet_class == 'codec' else packet.Packet
+    game = _late_game(db_path, catalog)
+    state = app_module.get_game_state_json(game, game.map_version)
+    benchmark(lambda: cls(packet.EVENT, data=['update_state', state]).encode())
+
+
+@pytest.mark.parametrize('level', [1, 6, 9])
+def bench_compress_state(benchmark, app_module, db_path, catalog, level):
+    """permessage-deflate：按压缩级别压缩一次50张牌的完整状态（含地图）"""
+    import zlib
+    game = _late_game(db_path, catalog)
+    data = json_codec.dumps(['update_state', app_module.get_game_state_json(game)])
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+
+    def run():
+        return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    compressed = run()
+    benchmark.extra_info['raw_bytes'] = len(data)
+    benchmark.extra_info['compressed_bytes'] = len(compressed)
+    benchmark(run)
+
+
+@pytest.mark.parametrize('protocol', ['full_state', 'events'])
+def bench_card_played_protocol(benchmark, app_module, db_path, catalog, protocol):
+    """50张牌：打出一张牌后发送的数据——完整状态，或事件流 + 不含牌堆的状态"""
+    from src import combat_events
+    from src.combat_events import PILE_HAND, PILE_DISCARD
+    game = _late_game(db_path, catalog)
+    player = game.game_state.player
+    piles = protocol == 'full_state'
+
+    def run():
+        with combat_events.capture() as events:
+            if player.hand:
+                card = player.hand.pop()
+                player.discard_pile.append(card)
+                combat_events.card_moved(card, PILE_HAND, PILE_DISCARD)
+            else:
+                player.hand.extend(player.discard_pile[-5:])
+                del player.discard_pile[-5:]
+        sent = json_codec.dumps(['update_state', app_module.get_game_state_json(game, game.map_version, piles)])
+        if not piles:
+            sent += json_codec.dumps(['combat_events', {'events': events}])
+        return sent
+
+    benchmark.extra_info['bytes'] = len(run())
+    benchmark(run)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""基准测试公共夹具
+
+基准测试使用临时目录中的独立数据库（通过 STS_DB_PATH），不会影响 data/ 下的游戏存档。
+"""
+import os
+import sys
+import tempfile
+
+# 必须在导入 src 模块之前设置数据库路径
+_TMP_DIR = tempfile.mkdtemp(prefix='sts-bench-')
+os.environ.setdefault('STS_DB_PATH', os.path.join(_TMP_DIR, 'bench.db'))
+# 基准测试中不需要追踪采样和异步日志
+os.environ.setdefault('TRACE_SAMPLE_RATE', '0')
+os.environ.setdefault('LOG_ASYNC', '0')
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import duckdb
+import pytest
+
+from src.db_init import init_database, DB_PATH
+from src.models import GameState, Card, Enemy
+
+CHARACTER_IDS = [1, 2, 3]
+
+
+@pytest.fixture(scope='session')
+def db_path():
+    """初始化基准测试数据库"""
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    init_database()
+    return DB_PATH
+
+
+@pytest.fixture(scope='session')
+def catalog(db_path):
+    """卡牌目录：(id, name, card_type, rarity, energy_cost, description, character_id)"""
+    con = duckdb.connect(db_path)
+    rows = con.execute(
+        "SELECT id, name, card_type, rarity, energy_cost, description, character_id FROM cards ORDER BY id"
+    ).fetchall()
+    con.close()
+    return rows
+
+
+def make_card(row):
+    """根据目录行创建卡牌"""
+    return Card.from_row(row)
+
+
+def make_deck(catalog, character_id, size):
+    """构造指定大小的牌组（循环使用该角色的卡牌）"""
+    rows = [r for r in catalog if r[6] == character_id]
+    return [make_card(rows[i % len(rows)]) for i in range(size)]
+
+
+def make_enemies(count=3, hp=500):
+    """构造一组血量足够的敌人"""
+    return [Enemy(i + 1, f"测试敌人{i + 1}", hp) for i in range(count)]
+
+
+def new_game_state(db_path, character_id=1, player_name='bench', deck_size=None, catalog=None):
+    """创建一局新游戏，可选地扩充牌组到指定大小"""
+    state = GameState().new_game(character_id, player_name)
+    if deck_size is not None:
+        state.player.cards = make_deck(catalog, character_id, deck_size)
+        state.player.draw_pile = list(state.player.cards)
+    return state
+
+
+def populate_saves(db_path, count, deck_size=20):
+    """向数据库批量写入 count 个存档（模拟不同规模的存档表）"""
+    con = duckdb.connect(db_path)
+    con.execute("DELETE FROM player_potions")
+    con.execute("DELETE FROM player_relics")
+    con.execute("DELETE FROM player_cards")
+    con.execute("DELETE FROM saves")
+    if count:
+        con.execute(
+            """
+            INSERT INTO saves (player_name, character_id, current_hp, max_hp, gold, floor, created_at, updated_at)
+            SELECT 'filler_' || i, (i % 3) + 1, 50, 80, 100, (i % 50) + 1, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+            FROM range(?) t(i)
+            """,
+            [count]
+        )
+        con.execute(
+            """
+            INSERT INTO player_cards (save_id, card_id, upgraded)
+            SELECT s.id, ((s.id + j) % 28) + 1, FALSE
+            FROM saves s, range(?) t(j)
+            """,
+            [deck_size]
+        )
+    con.close()
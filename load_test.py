@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""Socket.IO 压力测试
+
+启动 N 个无界面的 Socket.IO 客户端，每个客户端反复进行完整的游戏流程
+（new_game → 一系列 player_action，直到游戏结束或达到操作上限后重新开局），
+并定期报告吞吐量、各事件的 p50/p95/p99 延迟、错误率以及服务器进程的内存占用。
+
+用法:
+    python app.py --port 14514 &
+    python load_test.py --clients 50 --duration 60
+    python load_test.py --clients 200 --policy scripted --server-pid 12345 --json result.json
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from collections import defaultdict
+
+import socketio
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# 单次请求等待服务器响应的超时时间（秒）
+RESPONSE_TIMEOUT = 10
+# 战斗事件中的卡牌移动事件和手牌编号（见 src/combat_events.py）
+MOVE_EVENT = 2
+HAND_PILE = 1
+
+
+class LatencyStats:
+    """线程安全的延迟与错误统计"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.timeouts = defaultdict(int)
+        self.runs_started = 0
+        self.runs_finished = 0
+
+    def record(self, event, latency, ok=True, timeout=False):
+        with self.lock:
+            self.samples[event].append(latency)
+            if timeout:
+                self.timeouts[event] += 1
+            elif not ok:
+                self.errors[event] += 1
+
+    def snapshot(self):
+        """返回当前统计的副本"""
+        with self.lock:
+            return (
+                {k: list(v) for k, v in self.samples.items()},
+                dict(self.errors),
+                dict(self.timeouts),
+                self.runs_started,
+                self.runs_finished
+            )
+
+
+def percentile(sorted_values, p):
+    """计算已排序数组的百分位数"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(samples, errors, timeouts):
+    """按事件汇总延迟（毫秒）和错误率"""
+    summary = {}
+    for event, values in samples.items():
+        values = sorted(values)
+        count = len(values)
+        failed = errors.get(event, 0) + timeouts.get(event, 0)
+        summary[event] = {
+            'count': count,
+            'p50': round(percentile(values, 50) * 1000, 2),
+            'p95': round(percentile(values, 95) * 1000, 2),
+            'p99': round(percentile(values, 99) * 1000, 2),
+            'max': round(values[-1] * 1000, 2) if values else 0.0,
+            'errors': errors.get(event, 0),
+            'timeouts': timeouts.get(event, 0),
+            'errorRate': round(failed / count, 4) if count else 0.0
+        }
+    return summary
+
+
+# --- 策略 ---
+# 网页版目前只有地图和战斗两个界面（非战斗节点选择后仍停留在地图上），策略只发送服务器会处理的操作:
+# play_card / end_turn / choose_path，没有可选的路时发送 sync_state
+
+def _next_map_nodes(state):
+    """当前节点可前往的下一层节点 (row, col)
+
+    服务器只在地图版本变化时附带 map.nodes，map.available 每次都有
+    """
+    return [tuple(position) for position in (state.get('map') or {}).get('available') or []]
+
+
+def _alive_targets(state):
+    """存活敌人的位置（指定已死亡的敌人为目标时服务器拒绝出牌）"""
+    return [i for i, enemy in enumerate(state.get('currentEnemies') or []) if enemy and enemy.get('health', 0) > 0]
+
+
+def random_policy(state, rng):
+    """随机策略：战斗中随机出牌或结束回合，地图上随机选择下一个节点"""
+    player = state.get('player') or {}
+    if state.get('screen') == 'combat' or state.get('inCombat'):
+        playable = [i for i, c in enumerate(player.get('hand') or []) if c and c.get('cost', 0) <= player.get('energy', 0)]
+        if playable and rng.random() < 0.8:
+            targets = _alive_targets(state)
+            target = rng.choice(targets) if targets else None
+            return 'play_card', {'card_index': rng.choice(playable), 'target_index': target}
+        return 'end_turn', {}
+    nodes = _next_map_nodes(state)
+    if nodes:
+        row, col = rng.choice(nodes)
+        return 'choose_path', {'row': row, 'col': col}
+    return 'sync_state', {}
+
+
+def scripted_policy(state, rng):
+    """固定策略：总是打出第一张能打出的牌，地图总是走第一条路"""
+    player = state.get('player') or {}
+    if state.get('screen') == 'combat' or state.get('inCombat'):
+        for i, card in enumerate(player.get('hand') or []):
+            if card and card.get('cost', 0) <= player.get('energy', 0):
+                return 'play_card', {'card_index': i, 'target_index': (_alive_targets(state) or [None])[0]}
+        return 'end_turn', {}
+    nodes = _next_map_nodes(state)
+    if nodes:
+        row, col = nodes[0]
+        return 'choose_path', {'row': row, 'col': col}
+    return 'sync_state', {}
+
+
+POLICIES = {
+    'random': random_policy,
+    'scripted': scripted_policy
+}
+
+
+# --- 机器人客户端 ---
+
+class Bot:
+    """一个无界面的玩家"""
+
+    def __init__(self, index, url, stats, policy, stop_event, max_actions, seed=None):
+        self.index = index
+        self.url = url
+        self.stats = stats
+        self.policy = policy
+        self.stop_event = stop_event
+        self.max_actions = max_actions
+        self.rng = random.Random(seed)
+        self.sio = socketio.Client(reconnection=False)
+        self.response = threading.Event()
+        self.state = None
+        self.hand = []  # 战斗中服务器不发送牌堆，手牌按 combat_events 维护
+        self.last_error = None
+        self.sio.on('update_state', self._on_update)
+        self.sio.on('combat_events', self._on_combat_events)
+        self.sio.on('game_error', self._on_error)
+
+    def _on_combat_events(self, data):
+        for event in data['events']:
+            if event[0] != MOVE_EVENT:
+                continue
+            if event[2] == HAND_PILE:
+                self.hand = [card for card in self.hand if card['uid'] != event[1]]
+            if event[3] == HAND_PILE:
+                self.hand.append(event[4])
+
+    def _on_update(self, state):
+        if state:
+            player = state['player']
+            if 'hand' in player:
+                self.hand = list(player['hand'])
+            else:
+                player['hand'] = self.hand
+        self.state = state
+        self.last_error = None
+        self.response.set()
+
+    def _on_error(self, data):
+        self.last_error = (data or {}).get('error', 'unknown')
+        self.response.set()
+
+    def request(self, event, data, label=None):
+        """发送一个事件并等待 update_state 或 game_error"""
+        label = label or event
+        self.response.clear()
+        start = time.perf_counter()
+        self.sio.emit(event, data)
+        got = self.response.wait(RESPONSE_TIMEOUT)
+        latency = time.perf_counter() - start
+        if not got:
+            self.stats.record(label, latency, ok=False, timeout=True)
+            return False
+        ok = self.last_error is None
+        self.stats.record(label, latency, ok=ok)
+        return ok
+
+    def play_run(self):
+        """进行一局游戏"""
+        with self.stats.lock:
+            self.stats.runs_started += 1
+        ok = self.request('new_game', {
+            'playerName': f"bot_{self.index}_{self.rng.randrange(1 << 30)}",
+            'characterId': self.rng.choice([1, 2, 3])
+        })
+        if not ok or not self.state:
+            return
+        consecutive_errors = 0
+        for _ in range(self.max_actions):
+            if self.stop_event.is_set():
+                return
+            if self.state.get('gameOver'):
+                break
+            action, payload = self.policy(self.state, self.rng)
+            ok = self.request('player_action', {'action': action, 'payload': payload}, label=action)
+            consecutive_errors = 0 if ok else consecutive_errors + 1
+            # 服务器不接受当前操作时放弃本局，避免在同一个错误上空转
+            if consecutive_errors >= 5:
+                return
+        with self.stats.lock:
+            self.stats.runs_finished += 1
+
+    def run(self):
+        start = time.perf_counter()
+        try:
+            self.sio.connect(self.url, transports=['websocket'])
+        except Exception:
+            self.stats.record('connect', time.perf_counter() - start, ok=False)
+            return
+        self.stats.record('connect', time.perf_counter() - start)
+        try:
+            while not self.stop_event.is_set():
+                self.play_run()
+        finally:
+            self.sio.disconnect()
+
+
+# --- 服务器内存 ---
+
+def find_server_process(port):
+    """查找监听指定端口的进程"""
+    if psutil is None:
+        return None
+    try:
+        for conn in psutil.net_connections(kind='tcp'):
+            if conn.laddr and conn.laddr.port == port and conn.status == psutil.CONN_LISTEN and conn.pid:
+                return psutil.Process(conn.pid)
+    except (psutil.AccessDenied, PermissionError):
+        return None
+    return None
+
+
+def server_rss_mb(process):
+    """服务器进程（含子进程）的常驻内存，单位MB"""
+    if process is None:
+        return None
+    try:
+        rss = process.memory_info().rss
+        for child in process.children(recursive=True):
+            rss += child.memory_info().rss
+        return round(rss / 1024 / 1024, 1)
+    except psutil.Error:
+        return None
+
+
+# --- 主程序 ---
+
+def print_report(title, summary, elapsed, total, rss):
+    print(f"\n=== {title} (t={elapsed:.0f}s, 吞吐量 {total / max(elapsed, 1e-9):.1f} 事件/秒"
+          + (f", 服务器RSS {rss} MB" if rss is not None else "") + ") ===")
+    print(f"{'事件':<18}{'次数':>8}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}{'错误率':>8}")
+    for event, s in sorted(summary.items()):
+        print(f"{event:<18}{s['count']:>8}{s['p50']:>10}{s['p95']:>10}{s['p99']:>10}{s['max']:>10}{s['errorRate']:>8.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='杀戮尖塔Socket.IO压力测试')
+    parser.add_argument('--url', default='http://127.0.0.1:14514', help='服务器地址')
+    parser.add_argument('--clients', type=int, default=10, help='并发客户端数量')
+    parser.add_argument('--duration', type=float, default=60, help='测试时长（秒）')
+    parser.add_argument('--ramp', type=float, default=5, help='在多少秒内逐步启动全部客户端')
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='random', help='出牌策略')
+    parser.add_argument('--max-actions', type=int, default=500, help='每局最多操作次数')
+    parser.add_argument('--interval', type=float, default=10, help='中间报告间隔（秒）')
+    parser.add_argument('--server-pid', type=int, help='服务器进程PID（默认按端口查找）')
+    parser.add_argument('--seed', type=int, help='随机种子（每个客户端使用 seed+序号）')
+    parser.add_argument('--json', help='将结果写入JSON文件')
+    args = parser.parse_args()
+
+    if psutil is not None and args.server_pid:
+        server = psutil.Process(args.server_pid)
+    else:
+        from urllib.parse import urlparse
+        server = find_server_process(urlparse(args.url).port or 80)
+    if server is None:
+        print("提示: 未找到服务器进程（或未安装psutil），不报告服务器内存")
+
+    stats = LatencyStats()
+    stop_event = threading.Event()
+    policy = POLICIES[args.policy]
+    threads = []
+    timeline = []
+
+    print(f"启动 {args.clients} 个客户端，策略={args.policy}，时长={args.duration}s，目标={args.url}")
+    start = time.time()
+    for i in range(args.clients):
+        seed = args.seed + i if args.seed is not None else None
+        bot = Bot(i, args.url, stats, policy, stop_event, args.max_actions, seed=seed)
+        thread = threading.Thread(target=bot.run, name=f"bot-{i}", daemon=True)
+        thread.start()
+        threads.append(thread)
+        if args.ramp > 0:
+            time.sleep(args.ramp / args.clients)
+
+    next_report = start + args.interval
+    try:
+        while time.time() - start < args.duration:
+            time.sleep(min(1, max(0.1, next_report - time.time())))
+            now = time.time()
+            if now >= next_report:
+                samples, errors, timeouts, _, _ = stats.snapshot()
+                total = sum(len(v) for v in samples.values())
+                rss = server_rss_mb(server)
+                timeline.append({'t': round(now - start, 1), 'events': total, 'rssMb': rss})
+                print_report("中间结果", summarize(samples, errors, timeouts), now - start, total, rss)
+                next_report += args.interval
+    except KeyboardInterrupt:
+        print("\n已中断，正在停止客户端...")
+
+    stop_event.set()
+    for thread in threads:
+        thread.join(timeout=RESPONSE_TIMEOUT + 1)
+
+    elapsed = time.time() - start
+    samples, errors, timeouts, runs_started, runs_finished = stats.snapshot()
+    total = sum(len(v) for v in samples.values())
+    failed = sum(errors.values()) + sum(timeouts.values())
+    summary = summarize(samples, errors, timeouts)
+    rss = server_rss_mb(server)
+    timeline.append({'t': round(elapsed, 1), 'events': total, 'rssMb': rss})
+
+    print_report("最终结果", summary, elapsed, total, rss)
+    print(f"\n开局: {runs_started}，完成: {runs_finished}，总事件: {total}，"
+          f"总错误率: {failed / total if total else 0:.1%}")
+    if any(t['rssMb'] is not None for t in timeline):
+        print("服务器RSS变化: " + ", ".join(f"{t['t']}s={t['rssMb']}MB" for t in timeline))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'config': vars(args),
+                'elapsed': elapsed,
+                'throughput': total / elapsed if elapsed else 0,
+                'runsStarted': runs_started,
+                'runsFinished': runs_finished,
+                'errorRate': failed / total if total else 0,
+                'events': summary,
+                'timeline': timeline
+            }, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.json}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
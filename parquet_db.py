@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""导出存档和对局历史为 Parquet，或导入到新数据库
+
+导出（默认读取分析副本，不打开游戏服务器正在使用的主库）:
+    python parquet_db.py export exports/2026-10-19 [--replica 副本路径] [--refresh]
+
+导出目录的结构:
+    saves/character_id=1/data_0.parquet    存档及其子表、对局历史按角色分区（Hive 分区）
+    player_cards/character_id=1/...
+    runs/character_id=1/...
+    cards.parquet ...                      目录表（卡牌、遗物等），不分区
+    manifest.json                          各表行数、导出时间和来源
+
+导入（只导入到没有存档和对局的数据库，目标不存在时先初始化）:
+    python parquet_db.py import exports/2026-10-19 --dest data/restored.db
+
+读写都由 DuckDB 的 COPY ... TO / read_parquet 流式完成，数据不经过 Python；内存占用由 DuckDB 的缓冲区决定，
+数据量很大时可以用 --memory-limit 限制。
+导入在一个事务中执行，完成后调整 id 序列并重新聚合统计表（见 src/runs.py）。
+目录表只导出供离线分析使用，导入时使用目标数据库初始化时生成的目录。
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+from datetime import datetime
+
+import duckdb
+
+from src import replica
+from src import runs
+from src.db_init import init_database
+from src.models import DB_PATH
+from src.replica import sql_string
+
+# 按角色分区导出的表: (表名, 查询)；子表关联父表取得角色ID。按此顺序导入（父表在前）
+PARTITIONED_TABLES = [
+    ('saves', "SELECT * FROM saves"),
+    ('player_cards', "SELECT t.*, s.character_id FROM player_cards t JOIN saves s ON s.id = t.save_id"),
+    ('player_relics', "SELECT t.*, s.character_id FROM player_relics t JOIN saves s ON s.id = t.save_id"),
+    ('player_potions', "SELECT t.*, s.character_id FROM player_potions t JOIN saves s ON s.id = t.save_id"),
+    ('runs', "SELECT * FROM runs"),
+    ('run_card_offers', "SELECT t.*, r.character_id FROM run_card_offers t JOIN runs r ON r.id = t.run_id")
+]
+PARTITION_COLUMN = 'character_id'
+
+CATALOG_TABLES = ['characters', 'cards', 'relics', 'potions', 'enemies', 'events']
+
+# 导入后需要越过已导入 id 的序列: (序列, 表)
+SEQUENCES = [('saves_id_seq', 'saves'), ('runs_id_seq', 'runs')]
+
+MANIFEST = 'manifest.json'
+
+
+def _existing_tables(con):
+    return {row[0] for row in con.execute(
+        "SELECT table_name FROM information_schema.tables WHERE table_catalog = current_database()"
+    ).fetchall()}
+
+
+def _set_memory_limit(con, memory_limit):
+    """限制 DuckDB 的内存（如 '512MB'），超出时分批写出或溢出到临时文件"""
+    if memory_limit:
+        con.execute(f"SET memory_limit = {sql_string(memory_limit)}")
+
+
+def export_parquet(out_dir, source=replica.REPLICA_PATH, compression='zstd', overwrite=False, memory_limit=None):
+    """把 source 中的存档、对局历史和目录表导出到 out_dir，返回各表行数"""
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"数据库不存在: {source}")
+    if os.path.isdir(out_dir) and os.listdir(out_dir) and not overwrite:
+        raise FileExistsError(f"导出目录不为空: {out_dir}（使用 --overwrite 覆盖）")
+    os.makedirs(out_dir, exist_ok=True)
+
+    started = time.perf_counter()
+    con = duckdb.connect(source, read_only=True)
+    counts = {}
+    try:
+        # 不要求保持行的顺序，COPY 可以边读边写，不需要在内存中缓冲整张表
+        con.execute("SET preserve_insertion_order = false")
+        _set_memory_limit(con, memory_limit)
+        existing = _existing_tables(con)
+        # 所有表在同一个读事务中导出，导出的是同一时刻的数据
+        con.execute("BEGIN TRANSACTION")
+        for table, query in PARTITIONED_TABLES:
+            if table not in existing:
+                continue
+            target = sql_string(os.path.join(out_dir, table))
+            # 行数单独统计：分区导出时 COPY 的返回值不是行数（DuckDB 0.9 返回 0）
+            counts[table] = con.execute(f"SELECT COUNT(*) FROM ({query})").fetchone()[0]
+            con.execute(
+                f"COPY ({query}) TO {target} "
+                f"(FORMAT parquet, COMPRESSION {compression}, PARTITION_BY ({PARTITION_COLUMN}), OVERWRITE_OR_IGNORE)"
+            )
+        for table in CATALOG_TABLES:
+            if table not in existing:
+                continue
+            target = sql_string(os.path.join(out_dir, f"{table}.parquet"))
+            counts[table] = con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            con.execute(f"COPY {table} TO {target} (FORMAT parquet, COMPRESSION {compression})")
+        con.execute("COMMIT")
+    finally:
+        con.close()
+
+    with open(os.path.join(out_dir, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump({
+            'source': os.path.abspath(source),
+            'exportedAt': datetime.now().isoformat(),
+            'seconds': round(time.perf_counter() - started, 3),
+            'tables': counts
+        }, f, ensure_ascii=False, indent=2)
+    return counts
+
+
+def import_parquet(in_dir, dest=DB_PATH, memory_limit=None):
+    """把导出目录中的存档和对局历史导入 dest（目标不存在时先初始化），返回各表行数"""
+    manifest_path = os.path.join(in_dir, MANIFEST)
+    if not os.path.exists(manifest_path):
+        raise FileNotFoundError(f"不是导出目录（缺少 {MANIFEST}）: {in_dir}")
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    if not os.path.exists(dest):
+        init_database(dest)
+
+    con = duckdb.connect(dest)
+    counts = {}
+    try:
+        con.execute("SET preserve_insertion_order = false")
+        _set_memory_limit(con, memory_limit)
+        runs.create_tables(con)  # 兼容在这些表加入之前创建的数据库
+        for table in ('saves', 'runs'):
+            if con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]:
+                raise ValueError(f"目标数据库的 {table} 表不为空，只能导入到新数据库: {dest}")
+
+        con.execute("BEGIN TRANSACTION")
+        try:
+            for table, _ in PARTITIONED_TABLES:
+                # 没有行的表导出时不产生文件；有文件而清单中没有行数说明清单不可信，不能跳过
+                if not manifest['tables'].get(table):
+                    if glob.glob(os.path.join(in_dir, table, '**', '*.parquet'), recursive=True):
+                        raise ValueError(f"{table} 有导出文件，但 {MANIFEST} 中的行数为 0，请重新导出")
+                    continue
+                # 分区列来自目录名，子表中多出的 character_id 按目标表的列名丢弃
+                columns = ", ".join(row[0] for row in con.execute(
+                    "SELECT column_name FROM information_schema.columns WHERE table_name = ? ORDER BY ordinal_position",
+                    [table]
+                ).fetchall())
+                source = sql_string(os.path.join(in_dir, table, '**', '*.parquet'))
+                counts[table] = con.execute(
+                    f"INSERT INTO {table} ({columns}) SELECT {columns} "
+                    f"FROM read_parquet({source}, hive_partitioning = true)"
+                ).fetchone()[0]
+                if counts[table] != manifest['tables'][table]:
+                    raise ValueError(f"{table} 导入 {counts[table]} 行，与导出时的 {manifest['tables'][table]} 行不一致")
+
+            # 新的存档和对局从已导入的最大 id 之后编号
+            for sequence, table in SEQUENCES:
+                max_id = con.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+                if max_id:
+                    con.execute(f"SELECT MAX(nextval('{sequence}')) FROM range(?)", [max_id]).fetchone()
+
+            runs.refresh_stats(con)
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        # 提交失败时（如超出内存上限）DuckDB 已经回滚了整个事务
+        con.execute("COMMIT")
+    finally:
+        con.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='导出存档和对局历史为 Parquet，或从导出目录导入新数据库')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help='导出为按角色分区的 Parquet')
+    export_parser.add_argument('out_dir', help='导出目录')
+    export_parser.add_argument('--replica', default=replica.REPLICA_PATH, help='副本路径')
+    export_parser.add_argument('--refresh', action='store_true', help='先从主库生成副本（服务器运行时不需要）')
+    export_parser.add_argument('--compression', default='zstd', choices=['zstd', 'snappy', 'gzip', 'uncompressed'],
+                               help='Parquet 压缩算法（默认 zstd）')
+    export_parser.add_argument('--overwrite', action='store_true', help='导出目录不为空时覆盖')
+
+    import_parser = subparsers.add_parser('import', help='把导出目录导入到新数据库')
+    import_parser.add_argument('in_dir', help='导出目录')
+    import_parser.add_argument('--dest', default=DB_PATH, help='目标数据库，不存在时先初始化')
+
+    for subparser in (export_parser, import_parser):
+        subparser.add_argument('--memory-limit', help='DuckDB 内存上限，如 512MB（默认为 DuckDB 的默认值）')
+
+    args = parser.parse_args()
+    started = time.perf_counter()
+    try:
+        if args.command == 'export':
+            if args.refresh:
+                replica.snapshot(dest=args.replica)
+            counts = export_parquet(args.out_dir, args.replica, args.compression, args.overwrite,
+                                    args.memory_limit)
+            print(f"已导出到 {args.out_dir}:")
+        else:
+            counts = import_parquet(args.in_dir, args.dest, args.memory_limit)
+            print(f"已导入到 {args.dest}:")
+    except (FileNotFoundError, FileExistsError, ValueError, duckdb.Error) as e:
+        print(f"错误：{e}")
+        sys.exit(1)
+    for table, count in counts.items():
+        print(f"  {table}: {count} 行")
+    print(f"用时 {time.perf_counter() - started:.2f} 秒")
+
+
+if __name__ == "__main__":
+    main()
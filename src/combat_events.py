@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""战斗事件流
+
+网页版每次战斗操作（出牌、结束回合）都会产生一串紧凑的事件记录，客户端按事件播放动画、
+更新手牌，服务器不必为每次出牌重新发送完整的牌堆。每条事件是一个列表，第一项为事件类型:
+
+    [DAMAGE, 目标, 实际伤害, 剩余生命, 剩余格挡]    目标为敌人ID，玩家为 PLAYER
+    [BLOCK, 目标, 获得的格挡, 格挡总量]
+    [MOVE, 卡牌uid, 来源牌堆, 目标牌堆]             移入手牌时追加卡牌字典: [..., card]
+    [SHUFFLE, 张数]                                  弃牌堆洗入抽牌堆
+    [EVOKE, 充能球类型, 效果值]
+    [INTENT, 敌人ID, 意图编码, 意图值]                意图编码见 src/intents.py
+    [DEATH, 敌人ID]
+
+牌堆编号见 PILE_*，新生成的卡牌来源为 PILE_NONE。
+
+用法:
+    with capture() as events:
+        game.play_card(0, 0)
+    # events 为本次操作的事件列表
+
+没有在 capture() 中时，record() 只做一次上下文查找，不记录任何内容（命令行版不受影响）。
+"""
+from contextlib import contextmanager
+
+# eventlet 下每个绿色线程需要独立的事件上下文
+try:
+    from eventlet.corolocal import local as _LocalClass
+except ImportError:
+    from threading import local as _LocalClass
+
+# 事件类型
+DAMAGE = 0
+BLOCK = 1
+MOVE = 2
+SHUFFLE = 3
+EVOKE = 4
+INTENT = 5
+DEATH = 6
+
+EVENT_NAMES = ('damage', 'block', 'move', 'shuffle', 'evoke', 'intent', 'death')
+
+# 牌堆编号
+PILE_NONE = -1
+PILE_DRAW = 0
+PILE_HAND = 1
+PILE_DISCARD = 2
+PILE_EXHAUST = 3
+
+# 目标为玩家
+PLAYER = -1
+
+_local = _LocalClass()
+
+
+@contextmanager
+def capture():
+    """在当前绿色线程中收集事件"""
+    previous = getattr(_local, 'events', None)
+    events = []
+    _local.events = events
+    try:
+        yield events
+    finally:
+        _local.events = previous
+
+
+def record(*event):
+    """记录一条事件（不在 capture() 中时忽略）"""
+    events = getattr(_local, 'events', None)
+    if events is not None:
+        events.append(list(event))
+
+
+def active():
+    """当前是否在收集事件（构造事件开销较大时先判断）"""
+    return getattr(_local, 'events', None) is not None
+
+
+def card_moved(card, source, target):
+    """记录卡牌在牌堆间的移动"""
+    events = getattr(_local, 'events', None)
+    if events is not None:
+        if target == PILE_HAND:
+            events.append([MOVE, card.uid, source, target, card.to_dict()])
+        else:
+            events.append([MOVE, card.uid, source, target])
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""Socket.IO 消息压缩
+
+两种传输方式分别压缩，超过阈值的消息才压缩（小消息压缩收益小，还要额外花 CPU）:
+    websocket  permessage-deflate（浏览器握手时会主动请求，eventlet 负责协商）
+    polling    HTTP 长轮询的响应按 Accept-Encoding 使用 gzip / deflate（engine.io 内置）
+
+压缩级别和阈值对两种传输都生效，并按传输方式统计原始字节数和实际发送的字节数。
+eventlet 的 WebSocket 固定使用 zlib 默认级别、对每条消息都压缩，
+这里替换 RFC6455WebSocket 的两个内部方法来支持级别、阈值和统计（在 eventlet 0.33 ~ 0.41 上验证过）。
+这些内部方法不存在或签名不同时不做替换，只记录警告，WebSocket 使用 eventlet 自己的压缩。
+
+通过环境变量配置:
+    WS_COMPRESSION          是否允许 permessage-deflate，默认 1
+    HTTP_COMPRESSION        是否压缩长轮询响应，默认 1
+    COMPRESSION_LEVEL       zlib 压缩级别（1~9），默认 6
+    COMPRESSION_THRESHOLD   压缩阈值（字节），默认 1024
+"""
+import os
+import gzip
+import zlib
+import inspect
+import logging
+
+from src.logging_config import env_flag
+
+logger = logging.getLogger(__name__)
+
+# 默认配置
+DEFAULT_LEVEL = 6
+DEFAULT_THRESHOLD = 1024
+
+_config = {
+    'websocket': True,
+    'http': True,
+    'level': DEFAULT_LEVEL,
+    'threshold': DEFAULT_THRESHOLD
+}
+
+_stats = {
+    transport: {'messages': 0, 'compressed': 0, 'raw_bytes': 0, 'sent_bytes': 0}
+    for transport in ('websocket', 'polling')
+}
+
+
+def _record(transport, raw_bytes, sent_bytes, compressed):
+    stats = _stats[transport]
+    stats['messages'] += 1
+    stats['raw_bytes'] += raw_bytes
+    stats['sent_bytes'] += sent_bytes
+    if compressed:
+        stats['compressed'] += 1
+
+
+def configure(websocket=None, http=None, level=None, threshold=None):
+    """设置压缩选项，未指定的项从环境变量读取"""
+    _config['websocket'] = env_flag('WS_COMPRESSION', True) if websocket is None else websocket
+    _config['http'] = env_flag('HTTP_COMPRESSION', True) if http is None else http
+    if level is None:
+        level = int(os.environ.get('COMPRESSION_LEVEL', DEFAULT_LEVEL))
+    if threshold is None:
+        threshold = int(os.environ.get('COMPRESSION_THRESHOLD', DEFAULT_THRESHOLD))
+    if not 1 <= level <= 9:
+        raise ValueError(f"压缩级别必须在 1~9 之间: {level}")
+    _config['level'] = level
+    _config['threshold'] = threshold
+    return dict(_config)
+
+
+def server_options():
+    """传给 SocketIO(...) 的 engine.io 压缩参数"""
+    return {
+        'http_compression': _config['http'],
+        'compression_threshold': _config['threshold']
+    }
+
+
+def _gzip(response):
+    """长轮询响应的 gzip 压缩（替换 engine.io 默认的级别 9）"""
+    compressed = gzip.compress(response, compresslevel=_config['level'])
+    _record('polling', len(response), len(compressed), True)
+    return compressed
+
+
+def _deflate(response):
+    compressed = zlib.compress(response, _config['level'])
+    _record('polling', len(response), len(compressed), True)
+    return compressed
+
+
+def install(eio_server):
+    """在 engine.io 服务器和 eventlet WebSocket 上启用压缩设置与统计"""
+    eio_server._gzip = _gzip
+    eio_server._deflate = _deflate
+    _install_websocket()
+
+
+_websocket_installed = False
+
+# 被替换的 eventlet 内部方法及其参数（与替换后的实现一致）
+_WEBSOCKET_METHODS = [
+    ('WebSocketWSGI', '_negotiate_permessage_deflate', ['self', 'extensions']),
+    ('RFC6455WebSocket', '_get_permessage_deflate_enc', ['self']),
+    ('RFC6455WebSocket', '_pack_message', ['self', 'message', 'masked', 'continuation', 'final', 'control_code'])
+]
+
+
+def _websocket_compatible(websocket):
+    """eventlet 的内部方法是否与替换的实现一致，不一致时返回原因"""
+    for class_name, method_name, params in _WEBSOCKET_METHODS:
+        method = getattr(getattr(websocket, class_name, None), method_name, None)
+        if method is None:
+            return f"缺少 {class_name}.{method_name}"
+        try:
+            actual = list(inspect.signature(method).parameters)
+        except (TypeError, ValueError):
+            return f"无法读取 {class_name}.{method_name} 的签名"
+        if actual != params:
+            return f"{class_name}.{method_name} 的参数为 {actual}"
+    return None
+
+
+def _install_websocket():
+    global _websocket_installed
+    try:
+        from eventlet import websocket
+    except ImportError:
+        return
+    if _websocket_installed:
+        return
+    _websocket_installed = True
+
+    reason = _websocket_compatible(websocket)
+    if reason is not None:
+        import eventlet
+        logger.warning("eventlet %s 的 WebSocket 实现与预期不同（%s），不替换压缩方法，"
+                       "WebSocket 消息的压缩级别、阈值和统计不生效", eventlet.__version__, reason)
+        return
+
+    cls = websocket.RFC6455WebSocket
+    negotiate = websocket.WebSocketWSGI._negotiate_permessage_deflate
+    pack_message = cls._pack_message
+
+    def _negotiate_permessage_deflate(self, extensions):
+        if not _config['websocket']:
+            return None
+        return negotiate(self, extensions)
+
+    def _get_permessage_deflate_enc(self):
+        # 与 eventlet 的实现相同，只是使用配置的压缩级别，并跳过阈值以下的消息
+        options = self.extensions.get("permessage-deflate")
+        if options is None or getattr(self, 'skip_deflate', False):
+            return None
+
+        def _make():
+            return zlib.compressobj(_config['level'], zlib.DEFLATED,
+                                    -options.get("client_max_window_bits" if self.client
+                                                 else "server_max_window_bits",
+                                                 zlib.MAX_WBITS))
+
+        if options.get("client_no_context_takeover" if self.client
+                       else "server_no_context_takeover"):
+            return _make()
+        if self._deflate_enc is None:
+            self._deflate_enc = _make()
+        return self._deflate_enc
+
+    def _pack_message(self, message, masked=False, continuation=False, final=True, control_code=None):
+        if control_code:
+            return pack_message(self, message, masked, continuation, final, control_code)
+        if isinstance(message, str) and not message.isascii():
+            raw_bytes = len(message.encode('utf-8'))
+        else:
+            raw_bytes = len(message)
+        # 不压缩的消息不经过压缩器，不影响共享的压缩上下文
+        self.skip_deflate = raw_bytes < _config['threshold']
+        frame = pack_message(self, message, masked, continuation, final, control_code)
+        compressed = not self.skip_deflate and "permessage-deflate" in self.extensions
+        _record('websocket', raw_bytes, len(frame), compressed)
+        return frame
+
+    websocket.WebSocketWSGI._negotiate_permessage_deflate = _negotiate_permessage_deflate
+    cls._get_permessage_deflate_enc = _get_permessage_deflate_enc
+    cls._pack_message = _pack_message
+
+
+def get_stats():
+    """各传输方式的压缩统计（sent_bytes 对 websocket 为含帧头的字节数）"""
+    result = {'config': dict(_config)}
+    for transport, stats in _stats.items():
+        entry = dict(stats)
+        entry['ratio'] = round(stats['sent_bytes'] / stats['raw_bytes'], 4) if stats['raw_bytes'] else None
+        result[transport] = entry
+    return result
+
+
+def reset_stats():
+    for stats in _stats.values():
+        for key in stats:
+            stats[key] = 0
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""DuckDB 访问层
+
+DuckDB 的查询是阻塞的 C 调用，eventlet 的猴子补丁管不到。在 gunicorn 的 eventlet worker 中
+直接执行 load_game / save_game 等操作时，整个进程的所有绿色线程都会停下来等待。
+
+run() 把数据库操作交给 eventlet.tpool 的操作系统线程执行，调用方的绿色线程等待结果，
+其他绿色线程照常运行:
+    - 同时执行的数据库操作不超过 DB_WORKERS 个，超出的在队列中等待
+    - 超过 DB_TIMEOUT 秒（含排队时间）没有完成时抛出 DBTimeoutError；
+      已经开始的 C 调用无法中断，会在后台执行完，期间继续占用一个名额
+    - 在工作线程中再次调用 run()（如 load_game 中加载角色）直接执行
+
+只有 app.py 启用了转交（configure(offload=True)）；命令行版、测试和基准测试中 run() 直接调用。
+
+通过环境变量配置:
+    DB_OFFLOAD   是否把数据库操作交给线程池，默认 1（只对 app.py 生效）
+    DB_WORKERS   同时执行的数据库操作数量上限，默认 4（不能超过 tpool 的线程数，默认 20）
+    DB_TIMEOUT   单个数据库操作的超时时间（秒），默认 10
+"""
+import os
+import time
+from functools import wraps
+
+from src.eventlet_compat import original
+from src.logging_config import env_flag
+
+DEFAULT_WORKERS = 4
+DEFAULT_TIMEOUT = 10.0
+
+_threading = original('threading')
+
+
+class DBTimeoutError(TimeoutError):
+    """数据库操作超时"""
+
+
+_config = {
+    'offload': False,
+    'workers': DEFAULT_WORKERS,
+    'timeout': DEFAULT_TIMEOUT
+}
+
+_stats = {
+    'calls': 0,         # 交给线程池执行的操作数
+    'direct': 0,        # 直接执行的操作数
+    'timeouts': 0,
+    'errors': 0,
+    'in_flight': 0,     # 正在工作线程中执行的操作数
+    'max_in_flight': 0,
+    'queued': 0,        # 正在等待名额的操作数
+    'max_queued': 0,
+    'wait_seconds': 0.0,  # 等待名额的累计时间
+    'run_seconds': 0.0,   # 在工作线程中执行的累计时间
+    'max_run_seconds': 0.0
+}
+
+# 标记当前操作系统线程是否是执行数据库操作的工作线程
+_worker = _threading.local()
+_slots = None
+
+
+def configure(offload=None, workers=None, timeout=None):
+    """设置转交选项，未指定的项从环境变量读取"""
+    global _slots
+    if offload is None:
+        offload = env_flag('DB_OFFLOAD', True)
+    if workers is None:
+        workers = int(os.environ.get('DB_WORKERS', DEFAULT_WORKERS))
+    if timeout is None:
+        timeout = float(os.environ.get('DB_TIMEOUT', DEFAULT_TIMEOUT))
+    if workers < 1:
+        raise ValueError(f"DB_WORKERS 必须大于 0: {workers}")
+    if offload:
+        from eventlet.semaphore import Semaphore
+        _slots = Semaphore(workers)
+    else:
+        _slots = None
+    _config['offload'] = bool(offload)
+    _config['workers'] = workers
+    _config['timeout'] = timeout
+    return dict(_config)
+
+
+def _execute(func, args, kwargs):
+    """在工作线程中执行"""
+    _worker.active = True
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _worker.active = False
+
+
+def _run_in_worker(slots, func, args, kwargs):
+    """占用一个名额，在 tpool 中执行；调用方超时后也要等到执行结束再释放名额
+
+    名额归还给取得它的信号量（执行期间 configure() 可能已经替换了 _slots）
+    """
+    from eventlet import tpool
+    stats = _stats
+    stats['in_flight'] += 1
+    stats['max_in_flight'] = max(stats['max_in_flight'], stats['in_flight'])
+    started = time.perf_counter()
+    try:
+        return tpool.execute(_execute, func, args, kwargs)
+    finally:
+        elapsed = time.perf_counter() - started
+        stats['in_flight'] -= 1
+        stats['run_seconds'] += elapsed
+        stats['max_run_seconds'] = max(stats['max_run_seconds'], elapsed)
+        slots.release()
+
+
+def run(func, *args, **kwargs):
+    """执行一个数据库操作 func(*args, **kwargs)，返回其结果"""
+    if _slots is None or getattr(_worker, 'active', False):
+        _stats['direct'] += 1
+        return func(*args, **kwargs)
+
+    import eventlet
+    stats = _stats
+    stats['calls'] += 1
+    timeout = _config['timeout']
+    deadline = time.perf_counter() + timeout
+
+    slots = _slots
+    stats['queued'] += 1
+    stats['max_queued'] = max(stats['max_queued'], stats['queued'])
+    started = time.perf_counter()
+    try:
+        acquired = slots.acquire(timeout=timeout)
+    finally:
+        stats['queued'] -= 1
+        stats['wait_seconds'] += time.perf_counter() - started
+    if not acquired:
+        stats['timeouts'] += 1
+        raise DBTimeoutError(f"等待数据库名额超时（{timeout} 秒）")
+
+    worker = eventlet.spawn(_run_in_worker, slots, func, args, kwargs)
+    try:
+        with eventlet.Timeout(max(0.0, deadline - time.perf_counter())):
+            return worker.wait()
+    except eventlet.Timeout:
+        stats['timeouts'] += 1
+        raise DBTimeoutError(f"数据库操作超时（{timeout} 秒）") from None
+    except Exception:
+        stats['errors'] += 1
+        raise
+
+
+def offloaded(func):
+    """装饰器：通过 run() 执行被装饰的函数"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return run(func, *args, **kwargs)
+    return wrapper
+
+
+def get_stats():
+    """转交统计"""
+    result = {'config': dict(_config)}
+    result.update(_stats)
+    calls = _stats['calls']
+    result['avg_wait_ms'] = round(_stats['wait_seconds'] / calls * 1000, 3) if calls else None
+    result['avg_run_ms'] = round(_stats['run_seconds'] / calls * 1000, 3) if calls else None
+    return result
+
+
+def reset_stats():
+    for key in ('calls', 'direct', 'timeouts', 'errors', 'max_in_flight', 'max_queued'):
+        _stats[key] = 0
+    for key in ('wait_seconds', 'run_seconds', 'max_run_seconds'):
+        _stats[key] = 0.0
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import os
+import json
 import duckdb
 import logging
 from pathlib import Path
@@ -8,28 +9,62 @@ from pathlib import Path
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# 数据库路径
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'slay_the_spire.db')
+# 数据库路径（可通过 STS_DB_PATH 环境变量覆盖，供基准测试等使用独立数据库）
+DB_PATH = os.environ.get(
+    'STS_DB_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'slay_the_spire.db')
+)
 
-def init_database():
-    """初始化数据库，创建表并插入基础数据"""
+# 遭遇模板文件（见 src/enemies.py）
+ENCOUNTERS_PATH = os.environ.get(
+    'STS_ENCOUNTERS_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'encounters.json')
+)
+
+def _enemy_rows():
+    """根据遭遇模板生成 enemies 表的数据：每个怪物（变体）一行，取首次出现的遭遇类型和章节"""
+    with open(ENCOUNTERS_PATH, encoding='utf-8') as f:
+        data = json.load(f)
+    
+    rows = []
+    seen = set()
+    for encounter in data['encounters'].values():
+        for member in encounter['members']:
+            for key in member.get('pick', [member.get('monster')]):
+                spec = data['monsters'][key]
+                for variant in spec.get('variants', [spec]):
+                    if variant['name'] in seen:
+                        continue
+                    seen.add(variant['name'])
+                    rows.append((
+                        len(rows) + 1,
+                        variant['name'],
+                        variant['hp'][1],
+                        encounter['pool'] == 'elite',
+                        encounter['pool'] == 'boss',
+                        encounter['act']
+                    ))
+    return rows
+
+def init_database(path=DB_PATH):
+    """初始化数据库（默认为 DB_PATH），创建表并插入基础数据"""
     
     # 确保数据目录存在
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
     
     # 如果数据库已存在，先备份
-    if os.path.exists(DB_PATH):
-        backup_path = f"{DB_PATH}.bak"
+    if os.path.exists(path):
+        backup_path = f"{path}.bak"
         logger.info(f"数据库已存在，备份到 {backup_path}")
         try:
-            os.rename(DB_PATH, backup_path)
+            os.rename(path, backup_path)
         except Exception as e:
             logger.error(f"备份数据库失败: {e}")
     
-    logger.info(f"初始化数据库: {DB_PATH}")
+    logger.info(f"初始化数据库: {path}")
     
     # 连接数据库
-    con = duckdb.connect(DB_PATH)
+    con = duckdb.connect(path)
     
     try:
         # 创建角色表
@@ -105,15 +140,18 @@ def init_database():
         )
         """)
         
-        # 创建存档表
+        # 创建存档表（每次保存插入一行新存档，按 updated_at 取最新）
+        con.execute("CREATE SEQUENCE saves_id_seq START 1")
         con.execute("""
         CREATE TABLE saves (
-            player_name VARCHAR PRIMARY KEY,
+            id INTEGER PRIMARY KEY DEFAULT nextval('saves_id_seq'),
+            player_name VARCHAR NOT NULL,
             character_id INTEGER NOT NULL,
             floor INTEGER NOT NULL,
             gold INTEGER NOT NULL,
             max_hp INTEGER NOT NULL,
             current_hp INTEGER NOT NULL,
+            map_seed BIGINT, -- 地图种子，读档时按种子重建同一张地图
             save_data TEXT, -- JSON格式存储完整游戏状态
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -121,6 +159,37 @@ def init_database():
         )
         """)
         
+        # 创建存档卡组表
+        con.execute("""
+        CREATE TABLE player_cards (
+            save_id INTEGER NOT NULL,
+            card_id INTEGER NOT NULL,
+            upgraded BOOLEAN DEFAULT FALSE,
+            FOREIGN KEY (save_id) REFERENCES saves(id),
+            FOREIGN KEY (card_id) REFERENCES cards(id)
+        )
+        """)
+        
+        # 创建存档遗物表
+        con.execute("""
+        CREATE TABLE player_relics (
+            save_id INTEGER NOT NULL,
+            relic_id INTEGER NOT NULL,
+            FOREIGN KEY (save_id) REFERENCES saves(id),
+            FOREIGN KEY (relic_id) REFERENCES relics(id)
+        )
+        """)
+        
+        # 创建存档药水表
+        con.execute("""
+        CREATE TABLE player_potions (
+            save_id INTEGER NOT NULL,
+            potion_id INTEGER NOT NULL,
+            FOREIGN KEY (save_id) REFERENCES saves(id),
+            FOREIGN KEY (potion_id) REFERENCES potions(id)
+        )
+        """)
+        
         # 插入角色数据
         con.execute("""
         INSERT INTO characters (id, name, max_hp, starting_gold, description) VALUES
@@ -172,20 +241,11 @@ def init_database():
         (28, '数据分析', '技能', '稀有', 1, '抽3张牌，丢弃1张牌', 3, FALSE)
         """)
         
-        # 插入敌人数据
-        con.execute("""
-        INSERT INTO enemies (id, name, hp, is_elite, is_boss, act) VALUES
-        (1, '小鬼', 10, FALSE, FALSE, 1),
-        (2, '强盗', 15, FALSE, FALSE, 1),
-        (3, '史莱姆', 12, FALSE, FALSE, 1),
-        (4, '精英强盗', 40, TRUE, FALSE, 1),
-        (5, '精英史莱姆', 35, TRUE, FALSE, 1),
-        (6, '守卫', 45, TRUE, FALSE, 1),
-        (7, '六边形幽灵', 250, FALSE, TRUE, 1),
-        (8, '收藏家', 300, FALSE, TRUE, 2),
-        (9, '时间吞噬者', 350, FALSE, TRUE, 3),
-        (10, '腐化之心', 800, FALSE, TRUE, 4)
-        """)
+        # 插入敌人数据（来自 data/encounters.json 中的怪物模板，与实际生成的敌人一致）
+        con.executemany(
+            "INSERT INTO enemies (id, name, hp, is_elite, is_boss, act) VALUES (?, ?, ?, ?, ?, ?)",
+            _enemy_rows()
+        )
         
         # 插入遗物数据
         con.execute("""
@@ -228,6 +288,11 @@ def init_database():
         (6, '灵魂商人', '一个没有实体的商人漂浮在你面前。', '["出售灵魂 (获得金币，最大生命永久-5)", "购买服务 (移除一张牌，失去所有金币)", "离开"]', 3)
         """)
         
+        # 创建对局历史、统计表和排行榜表（见 src/runs.py、src/leaderboard.py）
+        from src import runs, leaderboard
+        runs.create_tables(con)
+        leaderboard.create_tables(con)
+        
         logger.info("数据库初始化成功！")
         
     except Exception as e:
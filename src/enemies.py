@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""敌人模板注册表
+
+遭遇定义（血量范围、敌人组合、招式表、力量）保存在 data/encounters.json，
+首次使用时加载一次。生成遭遇只需查表加上随机数，网页版、命令行版和模拟器共用同一份模板。
+
+数据格式:
+    monsters    怪物模板: name、hp [最小, 最大]，可选 strength 和招式表（moves、opening、pattern，
+                见 src/intents.py），或 variants（若干变体，生成时随机选一个，例如不同大小的史莱姆）
+    encounters  遭遇: pool（normal / elite / boss）、act、id（第一个敌人的ID，其余依次加1）、
+                members（成员列表，每项为 {"monster": 键, "count": 数量或 [最小, 最大]}
+                或 {"pick": [键...], "count": 数量}，后者表示不重复地随机选出若干种）
+"""
+import os
+import json
+import random
+
+from src import models
+from src.intents import MoveTable, assign_move_table
+
+ENCOUNTERS_PATH = os.environ.get(
+    'STS_ENCOUNTERS_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'encounters.json')
+)
+
+POOLS = ('normal', 'elite', 'boss')
+
+
+class MonsterTemplate:
+    """一种怪物的模板"""
+    __slots__ = ('key', 'name', 'hp_min', 'hp_max', 'strength', 'move_table')
+
+    def __init__(self, key, name, hp, strength=0, move_table=None):
+        self.key = key
+        self.name = name
+        self.hp_min, self.hp_max = hp
+        self.strength = strength
+        self.move_table = move_table  # 没有招式表时使用默认表
+
+    def spawn(self, enemy_id, is_elite=False, is_boss=False, rng=random):
+        """生成一个敌人（意图由调用方通过意图引擎设置）"""
+        enemy = models.Enemy(
+            id=enemy_id,
+            name=self.name,
+            hp=rng.randint(self.hp_min, self.hp_max),
+            is_elite=is_elite,
+            is_boss=is_boss
+        )
+        enemy.strength = self.strength
+        if self.move_table is not None:
+            assign_move_table(enemy, self.move_table)
+        return enemy
+
+
+class EncounterTemplate:
+    """一场遭遇的模板"""
+    __slots__ = ('key', 'pool', 'act', 'base_id', 'members')
+
+    def __init__(self, key, pool, act, base_id, members):
+        if pool not in POOLS:
+            raise ValueError(f"遭遇 {key} 的类型无效: {pool}")
+        self.key = key
+        self.pool = pool
+        self.act = act
+        self.base_id = base_id
+        # 成员: (候选怪物模板列表的列表, 数量范围, 是否不重复挑选)
+        self.members = members
+
+    def spawn(self, rng=random):
+        """生成这场遭遇的敌人列表"""
+        is_elite = self.pool == 'elite'
+        is_boss = self.pool == 'boss'
+        enemies = []
+        for choices, (count_min, count_max), pick in self.members:
+            count = count_min if count_min == count_max else rng.randint(count_min, count_max)
+            if pick:
+                variants_list = rng.sample(choices, min(count, len(choices)))
+            else:
+                variants_list = [choices[0]] * count
+            for variants in variants_list:
+                template = variants[0] if len(variants) == 1 else rng.choice(variants)
+                enemies.append(template.spawn(self.base_id + len(enemies), is_elite, is_boss, rng))
+        return enemies
+
+
+def _count_range(count):
+    """把 1、3、[1, 3] 统一为 (最小, 最大)"""
+    if isinstance(count, (list, tuple)):
+        return int(count[0]), int(count[1])
+    return int(count), int(count)
+
+
+def _compile_moves(key, spec):
+    """编译怪物的招式表，没有定义招式时返回 None"""
+    if not spec.get('moves'):
+        return None
+    try:
+        return MoveTable(spec['moves'], spec.get('opening', ()), spec.get('pattern', ()))
+    except KeyError as e:
+        raise ValueError(f"怪物 {key} 的招式表无效: {e}")
+
+
+class EnemyRegistry:
+    """遭遇模板注册表"""
+
+    def __init__(self, data):
+        # 怪物键 -> 变体模板列表（没有变体的怪物只有一个模板）
+        self.monsters = {}
+        for key, spec in data['monsters'].items():
+            variants = spec.get('variants', [spec])
+            self.monsters[key] = [
+                MonsterTemplate(
+                    key,
+                    variant['name'],
+                    variant['hp'],
+                    variant.get('strength', spec.get('strength', 0)),
+                    _compile_moves(key, variant if 'moves' in variant else spec)
+                )
+                for variant in variants
+            ]
+
+        self.encounters = {}
+        # (类型, 章节) -> 遭遇列表
+        self.by_pool = {}
+        for key, spec in data['encounters'].items():
+            members = []
+            for member in spec['members']:
+                if 'pick' in member:
+                    members.append(([self._monster(key, m) for m in member['pick']],
+                                    _count_range(member.get('count', 1)), True))
+                else:
+                    members.append(([self._monster(key, member['monster'])],
+                                    _count_range(member.get('count', 1)), False))
+            encounter = EncounterTemplate(key, spec['pool'], int(spec['act']), int(spec['id']), members)
+            self.encounters[key] = encounter
+            self.by_pool.setdefault((encounter.pool, encounter.act), []).append(encounter)
+
+        # 每种类型已定义的章节（升序），用于章节超出范围时回退
+        self.acts = {}
+        for pool, act in self.by_pool:
+            self.acts.setdefault(pool, []).append(act)
+        for acts in self.acts.values():
+            acts.sort()
+
+    def _monster(self, encounter_key, monster_key):
+        if monster_key not in self.monsters:
+            raise ValueError(f"遭遇 {encounter_key} 引用了不存在的怪物: {monster_key}")
+        return self.monsters[monster_key]
+
+    @classmethod
+    def load(cls, path=ENCOUNTERS_PATH):
+        """从 JSON 文件加载"""
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def encounters_for(self, pool, act):
+        """某类型某章节的全部遭遇；该章节没有定义时使用不超过它的最近章节"""
+        encounters = self.by_pool.get((pool, act))
+        if encounters is None:
+            acts = self.acts.get(pool)
+            if not acts:
+                raise ValueError(f"没有 {pool} 类型的遭遇")
+            fallback = [a for a in acts if a <= act]
+            encounters = self.by_pool[(pool, fallback[-1] if fallback else acts[0])]
+        return encounters
+
+    def spawn(self, pool, act, rng=random):
+        """随机选择一场遭遇并生成敌人"""
+        encounters = self.encounters_for(pool, act)
+        return rng.choice(encounters).spawn(rng)
+
+
+_registry = None
+
+
+def get_registry():
+    """获取全局注册表（首次调用时加载）"""
+    global _registry
+    if _registry is None:
+        _registry = EnemyRegistry.load()
+    return _registry
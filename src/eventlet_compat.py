@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+"""eventlet 兼容工具
+
+gunicorn 的 eventlet worker 会对 threading、time、queue 等模块打猴子补丁，
+后台采样线程、日志线程等需要真正的操作系统线程时，应通过这里获取原始模块。
+"""
+import importlib
+
+
+def original(module_name):
+    """获取未被 eventlet 猴子补丁替换的原始模块（未安装 eventlet 时返回普通模块）"""
+    try:
+        from eventlet import patcher
+    except ImportError:
+        return importlib.import_module(module_name)
+    return patcher.original(module_name)
+
@@ -3,12 +3,26 @@ import os
 import sys
 import random
 import time
+import logging
 from colorama import init, Fore, Back, Style
 from pyfiglet import Figlet
 from termcolor import colored
 
 from src.models import GameState, Character, Enemy
 from src.models import DB_PATH  # 导入数据库路径
+from src.tracing import traced
+from src.intents import INTENT_ATTACK, INTENT_DEFEND, INTENT_BUFF, roll_intents
+from src import sampler
+from src.map_pool import new_map_seed
+from src.map_graph import MapGraph
+from src import map_analysis
+from src.serialization import SectionCache
+from src import combat_events
+from src import runs
+from src import leaderboard
+from src.combat_events import PILE_HAND, PILE_DISCARD, PILE_EXHAUST
+
+logger = logging.getLogger(__name__)
 
 # 初始化colorama
 init()
@@ -51,8 +65,13 @@ EMOJI = {
 NODE_TYPES = ["普通战斗", "精英战斗", "休息处", "商店", "宝箱", "未知事件", "Boss"]
 NODE_WEIGHTS = [60, 10, 15, 10, 5, 0, 0]  # 节点类型的权重
 
+# 战斗节点: (是否精英, 是否Boss)
+COMBAT_NODES = {"普通战斗": (False, False), "精英战斗": (True, False), "Boss": (False, True)}
+
 class MapNode:
     """地图节点类"""
+    __slots__ = ('x', 'y', 'node_type', 'connections', 'visited', 'paths', 'index', 'jitter_x', 'jitter_y')
+    
     def __init__(self, x, y, node_type):
         self.x = x
         self.y = y
@@ -60,6 +79,7 @@ class MapNode:
         self.connections = []  # 连接到的其他节点
         self.visited = False
         self.paths = []  # 记录通过此节点的路径索引
+        self.index = -1  # 在 MapGraph 中的编号
         self.jitter_x = 0  # 节点显示的水平抖动
         self.jitter_y = 0  # 节点显示的垂直抖动
     
@@ -71,8 +91,193 @@ class MapNode:
     def get_emoji(self):
         """获取节点的emoji表示"""
         return EMOJI.get(self.node_type, "❓")
+    
+    def to_dict(self):
+        """将地图节点序列化为字典"""
+        return dict(self.layout_dict(), visited=self.visited)
+
+    def layout_dict(self):
+        """节点在地图结构中的部分（不含访问标记），地图生成后不变"""
+        return {
+            'type': self.node_type,
+            'x': self.x,
+            'y': self.y,
+            'connections': [(node.x, node.y) for node in self.connections]
+        }
+
+
+@traced('generate_map')
+def build_map(seed, node_weights=None):
+    """根据种子生成地图，类似于杀戮尖塔原版的地图布局。相同的种子总是生成相同的地图
+
+    node_weights 为 (前几层权重, 之后的权重)，默认使用 src/sampler.py 中的节点权重
+    """
+    rng = random.Random(seed)
+    map_nodes = []
+    
+    # 创建7x15的网格
+    grid_width = 7
+    grid_height = 15
+    
+    # 初始化空网格
+    grid = [[None for _ in range(grid_width)] for _ in range(grid_height)]
+    
+    # 定义每层的节点数量
+    nodes_per_layer = [3, 4, 3, 4, 3, 3, 2, 3, 1, 3, 2, 3, 1, 2, 1]
+    
+    # 生成路径
+    paths = []
+    
+    # 第一层的起始点（均匀分布）
+    first_layer_positions = [1, 3, 5]  # 在位置1、3、5放置第一层节点
+    
+    # 为每个起始点创建路径
+    for start_x in first_layer_positions:
+        # 创建路径
+        path = [(0, start_x)]
+        current_x = start_x
+        
+        # 向上延伸路径到顶层
+        for y in range(1, grid_height):
+            # 根据当前层决定移动策略
+            if y < 5:  # 前5层路径分散
+                dx_range = [-1, 0, 1]
+            elif y < 10:  # 中间层路径开始收敛
+                dx_range = [-1, 0, 1]
+                # 向中心偏移的概率更高
+                if current_x < grid_width // 2:
+                    dx_range = [0, 1]
+                elif current_x > grid_width // 2:
+                    dx_range = [-1, 0]
+            else:  # 最后几层路径强制收敛
+                if current_x < grid_width // 2:
+                    dx_range = [1]
+                elif current_x > grid_width // 2:
+                    dx_range = [-1]
+                else:
+                    dx_range = [0]
+            
+            # 可能的下一个位置
+            possible_moves = []
+            for dx in dx_range:
+                next_x = current_x + dx
+                if 0 <= next_x < grid_width:
+                    possible_moves.append(next_x)
+            
+            if possible_moves:
+                # 随机选择一个可能的移动
+                next_x = rng.choice(possible_moves)
+                path.append((y, next_x))
+                current_x = next_x
+            else:
+                # 如果没有可能的移动，保持当前位置
+                path.append((y, current_x))
+        
+        paths.append(path)
+    
+    # 添加额外的分支路径
+    for _ in range(3):  # 添加3条额外分支
+        # 选择一条现有路径作为起点
+        source_path = rng.choice(paths)
+        
+        # 选择分叉点（第2-5层之间）
+        fork_index = rng.randint(2, min(5, len(source_path) - 1))
+        fork_y, fork_x = source_path[fork_index]
+        
+        # 创建新路径，从分叉点开始
+        new_path = source_path[:fork_index+1]
+        current_x = fork_x
+        
+        # 向上延伸新分支
+        for y in range(fork_y + 1, grid_height):
+            # 决定移动方向
+            if current_x < grid_width // 2:
+                dx_range = [0, 1]
+            elif current_x > grid_width // 2:
+                dx_range = [-1, 0]
+            else:
+                dx_range = [-1, 1]
+            
+            # 可能的下一个位置
+            possible_moves = []
+            for dx in dx_range:
+                next_x = current_x + dx
+                if 0 <= next_x < grid_width:
+                    possible_moves.append(next_x)
+            
+            if possible_moves:
+                # 随机选择一个可能的移动
+                next_x = rng.choice(possible_moves)
+                new_path.append((y, next_x))
+                current_x = next_x
+            else:
+                # 如果没有可能的移动，保持当前位置
+                new_path.append((y, current_x))
+        
+        paths.append(new_path)
+    
+    # 创建节点并添加到网格
+    for path_index, path in enumerate(paths):
+        for y, x in path:
+            if grid[y][x] is None:
+                # 创建新节点
+                node_type = get_node_type(y, grid_height, rng, node_weights)
+                grid[y][x] = MapNode(x, y, node_type)
+            
+            # 标记此节点属于此路径
+            grid[y][x].paths.append(path_index)
+    
+    # 建立节点之间的连接（路径有重叠，用集合去重，不再逐条扫描连接列表）
+    edges = set()
+    for path in paths:
+        for i in range(len(path) - 1):
+            edge = path[i] + path[i + 1]
+            if edge not in edges:
+                edges.add(edge)
+                y1, x1, y2, x2 = edge
+                grid[y1][x1].connections.append(grid[y2][x2])
+    
+    # 将节点添加到地图中
+    for y in range(grid_height):
+        layer_nodes = []
+        for x in range(grid_width):
+            if grid[y][x]:
+                layer_nodes.append(grid[y][x])
+        map_nodes.append(layer_nodes)
+    
+    # 添加Boss节点
+    boss_node = MapNode(grid_width // 2, grid_height, "Boss")
+    boss_layer = [boss_node]
+    
+    # 连接最后一层的所有节点到Boss
+    for node in map_nodes[-1]:
+        node.connections.append(boss_node)
+    
+    map_nodes.append(boss_layer)
+    
+    return map_nodes
+
+
+def get_node_type(y, grid_height, rng=random, node_weights=None):
+    """根据位置确定节点类型"""
+    if y == 0:
+        # 第一层总是普通战斗
+        return "普通战斗"
+    elif y == grid_height - 1:
+        # 最后一层总是休息处
+        return "休息处"
+    elif y == grid_height // 2:
+        # 中间层有宝箱
+        return "宝箱"
+    else:
+        # 其他层按楼层对应的权重随机选择节点类型（权重见 src/sampler.py）
+        return sampler.roll_node_type(y, rng, node_weights)
+
 
 class SlayTheSpireGame:
+    # 预生成地图池（src/map_pool.py），由 app.py 按配置创建，None 表示每次当场生成
+    map_pool = None
+    
     def __init__(self):
         """初始化游戏"""
         self.game_state = GameState()
@@ -80,6 +285,15 @@ class SlayTheSpireGame:
         self.terminal_width = 80
         self.map_nodes = []  # 地图节点列表
         self.current_node = None  # 当前所在节点
+        self.map_graph = None  # 地图的邻接结构（src/map_graph.py）
+        self.map_version = 0  # 生成新地图时加一（移动不改变），网页版据此决定是否重发地图节点
+        self._map_json = None  # (版本, 序列化后的地图节点)
+        self.sent_map_version = None  # 网页版最近一次发给客户端的地图版本
+        self.state_version = 0  # 网页版每执行一个操作加一，REST 接口据此判断状态是否变化
+        self.state_cache = SectionCache()  # 网页版状态序列化的分段缓存（src/serialization.py）
+        self.map_seed = None  # 当前地图的种子
+        self.relic_sampler = None  # 遗物抽样器，随玩家创建
+        self.relic_sampler_owner = None
         self.map_height = 15  # 地图高度（层数）
         self.map_width = 7   # 每层的节点数
         
@@ -102,9 +316,6 @@ class SlayTheSpireGame:
             "下行路径": "↘️"
         }
         
-        # 初始化地图
-        self.generate_map()
-        
         try:
             self.terminal_width = os.get_terminal_size().columns
             # 限制终端宽度，避免过长的分隔线
@@ -199,16 +410,11 @@ class SlayTheSpireGame:
             else:
                 print(Fore.RED + "无效的选择，请重试" + Style.RESET_ALL)
         
-        # 创建新游戏
-        self.game_state.new_game(character_id, self.player_name)
-        
-        # 重新生成地图
+        # 生成地图，种子随新游戏一起保存
         self.generate_map()
         
-        # 设置初始节点为第一层的第一个节点
-        if self.map_nodes and self.map_nodes[0]:
-            self.current_node = self.map_nodes[0][0]
-            self.current_node.visited = True
+        # 创建新游戏
+        self.game_state.new_game(character_id, self.player_name, self.map_seed)
         
         print(Fore.GREEN + f"欢迎，{self.player_name}！你选择了 {self.game_state.player.name}。" + Style.RESET_ALL)
         self.wait_for_key()
@@ -234,13 +440,8 @@ class SlayTheSpireGame:
                 self.game_state = game_state
                 self.player_name = player_name
                 
-                # 重新生成地图
-                self.generate_map()
-                
-                # 设置当前节点为第一层的第一个节点
-                if self.map_nodes and self.map_nodes[0]:
-                    self.current_node = self.map_nodes[0][0]
-                    self.current_node.visited = True
+                # 按存档中的种子重建地图（旧存档没有种子时生成新地图）
+                self.generate_map(game_state.map_seed)
                 
                 print(Fore.GREEN + f"欢迎回来，{player_name}！你的角色是 {self.game_state.player.name}。" + Style.RESET_ALL)
                 print(Fore.GREEN + f"当前楼层: {self.game_state.floor}" + Style.RESET_ALL)
@@ -274,179 +475,217 @@ class SlayTheSpireGame:
                 if not self.map_screen():
                     break
     
-    def generate_map(self):
-        """生成随机地图，类似于杀戮尖塔原版的地图布局"""
-        self.map_nodes = []
-        
-        # 创建7x15的网格
-        grid_width = 7
-        grid_height = 15
-        
-        # 初始化空网格
-        grid = [[None for _ in range(grid_width)] for _ in range(grid_height)]
-        
-        # 定义每层的节点数量
-        nodes_per_layer = [3, 4, 3, 4, 3, 3, 2, 3, 1, 3, 2, 3, 1, 2, 1]
-        
-        # 生成路径
-        paths = []
-        
-        # 第一层的起始点（均匀分布）
-        first_layer_positions = [1, 3, 5]  # 在位置1、3、5放置第一层节点
-        
-        # 为每个起始点创建路径
-        for start_x in first_layer_positions:
-            # 创建路径
-            path = [(0, start_x)]
-            current_x = start_x
-            
-            # 向上延伸路径到顶层
-            for y in range(1, grid_height):
-                # 根据当前层决定移动策略
-                if y < 5:  # 前5层路径分散
-                    dx_range = [-1, 0, 1]
-                elif y < 10:  # 中间层路径开始收敛
-                    dx_range = [-1, 0, 1]
-                    # 向中心偏移的概率更高
-                    if current_x < grid_width // 2:
-                        dx_range = [0, 1]
-                    elif current_x > grid_width // 2:
-                        dx_range = [-1, 0]
-                else:  # 最后几层路径强制收敛
-                    if current_x < grid_width // 2:
-                        dx_range = [1]
-                    elif current_x > grid_width // 2:
-                        dx_range = [-1]
-                    else:
-                        dx_range = [0]
-                
-                # 可能的下一个位置
-                possible_moves = []
-                for dx in dx_range:
-                    next_x = current_x + dx
-                    if 0 <= next_x < grid_width:
-                        possible_moves.append(next_x)
-                
-                if possible_moves:
-                    # 随机选择一个可能的移动
-                    next_x = random.choice(possible_moves)
-                    path.append((y, next_x))
-                    current_x = next_x
-                else:
-                    # 如果没有可能的移动，保持当前位置
-                    path.append((y, current_x))
-            
-            paths.append(path)
-        
-        # 添加额外的分支路径
-        for _ in range(3):  # 添加3条额外分支
-            # 选择一条现有路径作为起点
-            source_path = random.choice(paths)
-            
-            # 选择分叉点（第2-5层之间）
-            fork_index = random.randint(2, min(5, len(source_path) - 1))
-            fork_y, fork_x = source_path[fork_index]
-            
-            # 创建新路径，从分叉点开始
-            new_path = source_path[:fork_index+1]
-            current_x = fork_x
-            
-            # 向上延伸新分支
-            for y in range(fork_y + 1, grid_height):
-                # 决定移动方向
-                if current_x < grid_width // 2:
-                    dx_range = [0, 1]
-                elif current_x > grid_width // 2:
-                    dx_range = [-1, 0]
-                else:
-                    dx_range = [-1, 1]
-                
-                # 可能的下一个位置
-                possible_moves = []
-                for dx in dx_range:
-                    next_x = current_x + dx
-                    if 0 <= next_x < grid_width:
-                        possible_moves.append(next_x)
-                
-                if possible_moves:
-                    # 随机选择一个可能的移动
-                    next_x = random.choice(possible_moves)
-                    new_path.append((y, next_x))
-                    current_x = next_x
-                else:
-                    # 如果没有可能的移动，保持当前位置
-                    new_path.append((y, current_x))
-            
-            paths.append(new_path)
-        
-        # 创建节点并添加到网格
-        for path_index, path in enumerate(paths):
-            for y, x in path:
-                if grid[y][x] is None:
-                    # 创建新节点
-                    node_type = self.get_node_type(y, grid_height)
-                    grid[y][x] = MapNode(x, y, node_type)
-                
-                # 标记此节点属于此路径
-                if not hasattr(grid[y][x], 'paths'):
-                    grid[y][x].paths = []
-                grid[y][x].paths.append(path_index)
-        
-        # 建立节点之间的连接
-        for path_index, path in enumerate(paths):
-            for i in range(len(path) - 1):
-                y1, x1 = path[i]
-                y2, x2 = path[i + 1]
-                if grid[y1][x1] and grid[y2][x2]:
-                    grid[y1][x1].add_connection(grid[y2][x2])
-        
-        # 将节点添加到地图中
-        for y in range(grid_height):
-            layer_nodes = []
-            for x in range(grid_width):
-                if grid[y][x]:
-                    layer_nodes.append(grid[y][x])
-            self.map_nodes.append(layer_nodes)
-        
-        # 添加Boss节点
-        boss_node = MapNode(grid_width // 2, grid_height, "Boss")
-        boss_layer = [boss_node]
-        
-        # 连接最后一层的所有节点到Boss
-        for node in self.map_nodes[-1]:
-            node.add_connection(boss_node)
-        
-        self.map_nodes.append(boss_layer)
+    def generate_map(self, seed=None):
+        """生成地图：指定种子时按种子生成；否则优先从预生成地图池中取，没有时用新种子生成"""
+        entry = None
+        if seed is None and self.map_pool is not None:
+            entry = self.map_pool.take()
+        if entry is not None:
+            seed, self.map_nodes = entry
+        else:
+            if seed is None:
+                seed = new_map_seed()
+            self.map_nodes = build_map(seed)
+        self.map_seed = seed
+        self.game_state.map_seed = seed
+        self.map_graph = MapGraph(self.map_nodes)
         
         # 设置起始节点
         self.current_node = self.map_nodes[0][0]
         self.current_node.visited = True
+        self.map_version += 1
         
         return self.map_nodes
     
-    def get_node_type(self, y, grid_height):
-        """根据位置确定节点类型"""
-        if y == 0:
-            # 第一层总是普通战斗
-            return "普通战斗"
-        elif y == grid_height - 1:
-            # 最后一层总是休息处
-            return "休息处"
-        elif y == grid_height // 2:
-            # 中间层有宝箱
-            return "宝箱"
+    def available_nodes(self):
+        """当前节点可以前往的下一层节点"""
+        if self.map_graph is None or self.current_node is None:
+            return []
+        nodes = self.map_graph.nodes
+        return [nodes[i] for i in self.map_graph.children(self.current_node.index)]
+    
+    def analyze_map(self, objective=None):
+        """从当前节点出发的路径统计（见 src/map_analysis.py），objective 为空时计算全部预定义目标"""
+        if objective is None:
+            objectives = map_analysis.OBJECTIVES
+        elif objective in map_analysis.OBJECTIVES:
+            objectives = {objective: map_analysis.OBJECTIVES[objective]}
         else:
-            # 其他层随机选择节点类型
-            # 不同楼层有不同的权重
-            if y < 6:
-                # 前6层没有精英和休息处
-                weights = [80, 0, 0, 15, 5, 0]  # 普通战斗、精英战斗、休息处、商店、宝箱、未知事件
+            raise ValueError(f"未知的分析目标: {objective}")
+        start = self.current_node.index if self.current_node else None
+        return map_analysis.analyze(self.map_graph, start, objectives)
+    
+    def map_nodes_json(self):
+        """序列化后的地图结构（不含访问标记），按地图版本缓存"""
+        if self._map_json is None or self._map_json[0] != self.map_version:
+            self._map_json = (self.map_version, [[node.layout_dict() for node in row] for row in self.map_nodes])
+        return self._map_json[1]
+    
+    def visited_positions(self):
+        """已访问节点的 [层, 层内位置]"""
+        if self.map_graph is None:
+            return []
+        return [self.map_graph.position(node.index) for node in self.map_graph.nodes if node.visited]
+    
+    def advance_to_node(self, index):
+        """前往编号为 index 的节点；不是当前节点的直接子节点时抛出 ValueError"""
+        if not self.map_graph.is_next(self.current_node.index, index):
+            raise ValueError("无法前往该节点")
+        node = self.map_graph.nodes[index]
+        self.current_node = node
+        node.visited = True
+        
+        # 移动到新节点时增加楼层数
+        self.game_state.floor += 1
+        return node
+    
+    def choose_path(self, row, col):
+        """网页版选择路径：row 为层号，col 为该层中的位置"""
+        index = self.map_graph.index_at(row, col)
+        if index < 0:
+            raise ValueError(f"无效的地图位置: ({row}, {col})")
+        node = self.advance_to_node(index)
+
+        # 战斗节点直接进入战斗（出牌、结束回合见 play_card / end_turn）
+        if node.node_type in COMBAT_NODES:
+            is_elite, is_boss = COMBAT_NODES[node.node_type]
+            self.game_state.start_combat(1, is_elite, is_boss)
+            self.game_state.screen = 'combat'
+        return node
+
+    def play_card(self, card_index, target_index=None):
+        """网页版出牌：打出第 card_index 张手牌，target_index 为目标敌人的位置（为空时选择第一个存活的敌人）
+
+        牌堆、伤害、格挡等变化通过 src/combat_events.py 记录；打不出时抛出 ValueError
+        """
+        state = self.game_state
+        player = state.player
+        if not state.in_combat:
+            raise ValueError("当前不在战斗中")
+        if not 0 <= card_index < len(player.hand):
+            raise ValueError(f"无效的手牌位置: {card_index}")
+
+        enemies = state.current_enemies
+        if target_index is not None:
+            if not 0 <= target_index < len(enemies) or enemies[target_index].current_hp <= 0:
+                raise ValueError(f"无效的目标: {target_index}")
+            targets = [enemies[target_index]]
+        else:
+            targets = [enemy for enemy in enemies if enemy.current_hp > 0][:1]
+
+        # 出牌期间这张牌不在手牌中，避免效果（如丢弃手牌）作用到它自己
+        card = player.hand.pop(card_index)
+        success, result = card.play(player, targets)
+        if not success:
+            player.hand.insert(card_index, card)
+            raise ValueError(result)
+
+        if card.exhausted:
+            player.exhaust_pile.append(card)
+            combat_events.card_moved(card, PILE_HAND, PILE_EXHAUST)
+        else:
+            player.discard_pile.append(card)
+            combat_events.card_moved(card, PILE_HAND, PILE_DISCARD)
+
+        if all(enemy.current_hp <= 0 for enemy in enemies):
+            self._finish_combat()
+        return result
+
+    def end_turn(self):
+        """网页版结束回合：弃掉手牌，敌人按意图行动，然后开始新的回合"""
+        state = self.game_state
+        player = state.player
+        if not state.in_combat:
+            raise ValueError("当前不在战斗中")
+
+        # 弃掉手牌（保留的牌留在手中，虚无的牌被消耗）
+        kept = []
+        for card in player.hand:
+            if card.retain:
+                kept.append(card)
+            elif card.ethereal:
+                player.exhaust_pile.append(card)
+                combat_events.card_moved(card, PILE_HAND, PILE_EXHAUST)
             else:
-                # 6层以后可以有精英和休息处
-                weights = [45, 16, 15, 10, 5, 9]  # 普通战斗、精英战斗、休息处、商店、宝箱、未知事件
-            
-            node_types = ["普通战斗", "精英战斗", "休息处", "商店", "宝箱", "未知事件"]
-            return random.choices(node_types, weights=weights)[0]
+                player.discard_pile.append(card)
+                combat_events.card_moved(card, PILE_HAND, PILE_DISCARD)
+        player.hand = kept
+
+        # 敌人行动（与命令行版相同，增益意图暂无效果）
+        enemies = state.current_enemies
+        for enemy in enemies:
+            if enemy.current_hp <= 0:
+                continue
+            if enemy.intent_code == INTENT_ATTACK:
+                player.take_damage(enemy.intent_value)
+                state.update_stats("damage_taken", enemy.intent_value)
+                if player.current_hp <= 0:
+                    self.end_run(False, enemy.name)
+                    return
+            elif enemy.intent_code == INTENT_DEFEND:
+                enemy.gain_block(enemy.intent_value)
+
+        # 按招式表重新设置敌人意图
+        roll_intents(enemies)
+
+        # 新的回合：格挡清零，能量重置，抽5张牌
+        state.combat_turn += 1
+        player.block = 0
+        player.energy = player.max_energy
+        player.draw_cards(5)
+
+    def _finish_combat(self):
+        """网页版战斗胜利：获得金币，牌堆恢复为整副牌组，回到地图"""
+        state = self.game_state
+        player = state.player
+        state.in_combat = False
+
+        gold_reward = random.randint(10, 30)
+        player.gold += gold_reward
+        state.rewards = {'gold': gold_reward}
+        self._record_combat_won(gold_reward)
+
+        player.draw_pile = player.cards.copy()
+        random.shuffle(player.draw_pile)
+        player.hand = []
+        player.discard_pile = []
+        player.exhaust_pile = []
+        player.block = 0
+        state.screen = 'map'
+
+        # 击败Boss即通关
+        if self.current_node is not None and self.current_node.node_type == "Boss":
+            self.end_run(True)
+
+    def _record_combat_won(self, gold_reward):
+        """战斗胜利时更新本局统计"""
+        state = self.game_state
+        state.update_stats("battles_won")
+        state.update_stats("gold_collected", gold_reward)
+        node_type = self.current_node.node_type if self.current_node is not None else None
+        if node_type == "精英战斗":
+            state.update_stats("elites_killed")
+        elif node_type == "Boss":
+            state.update_stats("bosses_killed")
+
+    def end_run(self, victory, cause_of_death=None):
+        """本局结束（死亡或通关）：记录到对局历史（见 src/runs.py）并更新排行榜（见 src/leaderboard.py）"""
+        state = self.game_state
+        state.game_over = True
+        state.in_combat = False
+        # 写入失败只记录日志，不能让数据库错误结束正在进行的游戏
+        try:
+            runs.record(state, self.player_name, victory, cause_of_death)
+        except Exception as e:
+            logger.error("记录对局历史失败: %s", e, exc_info=True)
+        try:
+            leaderboard.submit(state, self.player_name, victory)
+        except Exception as e:
+            logger.error("更新排行榜失败: %s", e, exc_info=True)
+
+    def get_node_type(self, y, grid_height):
+        """根据位置确定节点类型"""
+        return get_node_type(y, grid_height)
     
     def display_map(self):
         """显示地图"""
@@ -589,7 +828,7 @@ class SlayTheSpireGame:
         """地图/事件选择界面"""
         # 确保地图已初始化
         if not self.map_nodes or not self.current_node:
-            self.generate_map()
+            self.generate_map(self.game_state.map_seed)
             
         while True:
             self.clear_screen()
@@ -710,11 +949,7 @@ class SlayTheSpireGame:
     
     def move_to_node(self, node):
         """移动到指定节点"""
-        self.current_node = node
-        self.current_node.visited = True
-        
-        # 移动到新节点时增加楼层数
-        self.game_state.floor += 1
+        self.advance_to_node(node.index)
         
         # 如果是Boss节点，进入Boss战斗
         if node.node_type == "Boss":
@@ -781,69 +1016,28 @@ class SlayTheSpireGame:
         
         self.wait_for_key()
     
+    def _get_relic_sampler(self):
+        """当前玩家的遗物抽样器（换了玩家或读档后重新创建）"""
+        player = self.game_state.player
+        if self.relic_sampler is None or self.relic_sampler_owner is not player:
+            self.relic_sampler = sampler.relic_sampler(player.id, [relic.id for relic in player.relics])
+            self.relic_sampler_owner = player
+        return self.relic_sampler
+    
+    @traced('catalog_lookup')
     def get_random_relic(self):
         """获取随机遗物"""
-        import duckdb
-        
-        # 已拥有的遗物ID
-        owned_relic_ids = [relic.id for relic in self.game_state.player.relics]
-        
-        # 连接数据库
-        con = duckdb.connect(DB_PATH)
-        
-        # 构建查询
-        query = """
-        SELECT * FROM relics 
-        WHERE id NOT IN (""" + ",".join(["?" for _ in owned_relic_ids]) + """) 
-        AND (character_id IS NULL OR character_id = ?)
-        """
-        
-        params = owned_relic_ids + [self.game_state.player.id]
-        
-        # 执行查询
-        relics = con.execute(query, params).fetchall()
-        con.close()
-        
-        if not relics:
-            return None
-        
-        # 按稀有度分组
-        relics_by_rarity = {
-            "Common": [],
-            "Uncommon": [],
-            "Rare": [],
-            "Boss": []
-        }
-        
-        for relic in relics:
-            if relic[2] in relics_by_rarity:
-                relics_by_rarity[relic[2]].append(relic)
-        
-        # 根据稀有度确定概率
-        rarity_weights = {
-            "Common": 60,
-            "Uncommon": 30,
-            "Rare": 9,
-            "Boss": 1
-        }
-        
-        # 选择稀有度
-        rarities = []
-        weights = []
-        
-        for rarity, relic_list in relics_by_rarity.items():
-            if relic_list:  # 只添加有遗物的稀有度
-                rarities.append(rarity)
-                weights.append(rarity_weights[rarity])
-        
-        if not rarities:
-            return None
-        
-        # 根据权重随机选择稀有度
-        selected_rarity = random.choices(rarities, weights=weights)[0]
+        player = self.game_state.player
+        relic_sampler = self._get_relic_sampler()
         
-        # 从选定稀有度中随机选择遗物
-        selected_relic = random.choice(relics_by_rarity[selected_rarity])
+        # 按稀有度权重抽取；不经过 add_relic_to_player 获得的遗物在这里补记
+        while True:
+            selected_relic = relic_sampler.roll()
+            if selected_relic is None:
+                return None
+            if not any(relic.id == selected_relic[0] for relic in player.relics):
+                break
+            relic_sampler.mark_owned(selected_relic[0])
         
         # 创建遗物对象
         from src.models import Relic
@@ -886,6 +1080,7 @@ class SlayTheSpireGame:
         
         # 添加遗物
         self.game_state.player.relics.append(relic)
+        self._get_relic_sampler().mark_owned(relic.id)
         
         # 更新统计信息
         try:
@@ -907,83 +1102,27 @@ class SlayTheSpireGame:
         
         return True
     
+    @traced('card_reward')
+    def roll_card_rewards(self):
+        """随机生成3张卡牌奖励"""
+        from src.models import Card
+        card_defs = sampler.card_reward_sampler(self.game_state.player.id).roll()
+        return [Card(card_def) for card_def in card_defs]
+    
     def offer_card_reward(self):
         """提供卡牌奖励选择"""
-        import duckdb
-        
         self.clear_screen()
         print(Fore.GREEN + "选择一张卡牌添加到你的牌组:" + Style.RESET_ALL)
         
-        # 连接数据库
-        con = duckdb.connect(DB_PATH)
+        cards = self.roll_card_rewards()
         
-        # 获取可用的卡牌
-        query = """
-        SELECT * FROM cards 
-        WHERE (character_id IS NULL OR character_id = ?) 
-        AND rarity != 'Basic'
-        """
-        
-        result = con.execute(query, [self.game_state.player.id]).fetchall()
-        con.close()
-        
-        if not result:
+        if not cards:
             print(Fore.RED + "没有可用的卡牌!" + Style.RESET_ALL)
             self.wait_for_key()
             return
         
-        # 按稀有度分类
-        common_cards = [c for c in result if c[3] == 'Common']
-        uncommon_cards = [c for c in result if c[3] == 'Uncommon']
-        rare_cards = [c for c in result if c[3] == 'Rare']
-        
-        # 随机选择3张卡牌
-        card_choices = []
-        
-        # 确定稀有度分布
-        rarity_roll = random.random()
-        if rarity_roll < 0.70:  # 70% 概率获得普通卡牌
-            if common_cards:
-                card_choices.extend(random.sample(common_cards, min(3, len(common_cards))))
-        elif rarity_roll < 0.95:  # 25% 概率获得不常见卡牌
-            if uncommon_cards:
-                card_choices.extend(random.sample(uncommon_cards, min(3, len(uncommon_cards))))
-        else:  # 5% 概率获得稀有卡牌
-            if rare_cards:
-                card_choices.extend(random.sample(rare_cards, min(3, len(rare_cards))))
-        
-        # 如果没有足够的卡牌，从其他稀有度补充
-        if len(card_choices) < 3:
-            remaining_cards = []
-            if common_cards:
-                remaining_cards.extend(common_cards)
-            if uncommon_cards:
-                remaining_cards.extend(uncommon_cards)
-            if rare_cards:
-                remaining_cards.extend(rare_cards)
-            
-            # 从剩余卡牌中移除已选择的卡牌
-            remaining_cards = [c for c in remaining_cards if c not in card_choices]
-            
-            if remaining_cards:
-                additional_cards = random.sample(remaining_cards, min(3 - len(card_choices), len(remaining_cards)))
-                card_choices.extend(additional_cards)
-        
         # 显示卡牌选择
-        from src.models import Card
-        cards = []
-        for i, card_data in enumerate(card_choices):
-            card = Card(
-                id=card_data[0],
-                name=card_data[1],
-                card_type=card_data[2],
-                rarity=card_data[3],
-                energy_cost=card_data[4],
-                description=card_data[5],
-                character_id=card_data[6],
-                upgraded=False
-            )
-            cards.append(card)
+        for i, card in enumerate(cards):
             self.print_card_simple(card, i+1)
         
         print("\n[s] 跳过")
@@ -995,12 +1134,16 @@ class SlayTheSpireGame:
             
             if choice.lower() == 's':
                 print(Fore.YELLOW + "你选择跳过了卡牌奖励。" + Style.RESET_ALL)
+                self.game_state.card_offers.extend((card.id, False) for card in cards)
                 break
             
             try:
                 index = int(choice) - 1  # 转换为0-based索引
                 if 0 <= index < len(cards):
                     selected_card = cards[index]
+                    # 记录卡牌奖励的选取情况（统计选取率）
+                    self.game_state.card_offers.extend((card.id, card is selected_card) for card in cards)
+                    self.game_state.update_stats("cards_obtained")
                     # 添加到玩家牌组
                     self.game_state.player.cards.append(selected_card)
                     print(Fore.GREEN + f"你将 {selected_card.name} 添加到了你的牌组!" + Style.RESET_ALL)
@@ -1997,11 +2140,11 @@ class SlayTheSpireGame:
                 
                 # 显示敌人意图
                 intent = ""
-                if enemy.intent == "Attack":
+                if enemy.intent_code == INTENT_ATTACK:
                     intent = f"{Fore.RED}攻击 {enemy.intent_value}{Style.RESET_ALL}"
-                elif enemy.intent == "Defend":
+                elif enemy.intent_code == INTENT_DEFEND:
                     intent = f"{Fore.BLUE}防御 {enemy.intent_value}{Style.RESET_ALL}"
-                elif enemy.intent == "Buff":
+                elif enemy.intent_code == INTENT_BUFF:
                     intent = f"{Fore.YELLOW}增益 {enemy.intent_value}{Style.RESET_ALL}"
                 
                 # 根据敌人类型设置颜色
@@ -2120,7 +2263,7 @@ class SlayTheSpireGame:
                 
                 for enemy in enemies:
                     # 敌人行动
-                    if enemy.intent == "Attack":
+                    if enemy.intent_code == INTENT_ATTACK:
                         # 计算实际伤害
                         damage = max(0, enemy.intent_value - player.block)
                         block_absorbed = min(player.block, enemy.intent_value)
@@ -2137,22 +2280,21 @@ class SlayTheSpireGame:
                         # 检查玩家是否死亡
                         if player.current_hp <= 0:
                             print(Fore.RED + "你被击败了!" + Style.RESET_ALL)
-                            self.game_state.game_over = True
+                            self.end_run(False, enemy.name)
                             self.wait_for_key()
                             return False
                     
-                    elif enemy.intent == "Defend":
+                    elif enemy.intent_code == INTENT_DEFEND:
                         # 敌人获得格挡
                         enemy.block += enemy.intent_value
                         print(f"{enemy.name} 获得了 {enemy.intent_value} 点格挡.")
                     
-                    elif enemy.intent == "Buff":
+                    elif enemy.intent_code == INTENT_BUFF:
                         # 敌人获得增益
                         print(f"{enemy.name} 获得了增益效果.")
                 
-                # 重新设置敌人意图
-                for enemy in enemies:
-                    self.game_state._set_enemy_intent(enemy)
+                # 按招式表重新设置敌人意图
+                roll_intents(enemies)
                 
                 # 回合结束时，玩家格挡清零，能量重置
                 player.block = 0
@@ -2164,6 +2306,7 @@ class SlayTheSpireGame:
                 
                 self.wait_for_key()
                 turn += 1
+                self.game_state.combat_turn = turn
             
             elif choice == "V":
                 # 查看弃牌堆
@@ -2183,7 +2326,8 @@ class SlayTheSpireGame:
                 if not player.draw_pile:
                     print("抽牌堆为空")
                 else:
-                    for i, card in enumerate(player.draw_pile, 1):
+                    # 牌堆顶在列表末尾
+                    for i, card in enumerate(reversed(player.draw_pile), 1):
                         self.print_card_simple(card, i)
                 self.wait_for_key()
             
@@ -2199,6 +2343,7 @@ class SlayTheSpireGame:
         self.game_state.player.gold += gold_reward
         
         print(Fore.GREEN + f"战斗胜利！获得 {gold_reward} 金币" + Style.RESET_ALL)
+        self._record_combat_won(gold_reward)
         self.wait_for_key()
         
         # 提供卡牌奖励
@@ -2212,6 +2357,10 @@ class SlayTheSpireGame:
                 print(Fore.CYAN + f"你获得了药水: {potion.name} - {potion.description}" + Style.RESET_ALL)
                 self.wait_for_key()
         
+        # 击败Boss即通关
+        if self.current_node is not None and self.current_node.node_type == "Boss":
+            self.end_run(True)
+        
         return True
     
     def rest(self):
@@ -2283,6 +2432,15 @@ class SlayTheSpireGame:
             print(Fore.RED + "无效的选择，请重试" + Style.RESET_ALL)
             self.wait_for_key()
             self.upgrade_card()
+
+    def upgrade_card_at_rest_site(self, card_uid):
+        """在休息处按 uid 升级一张卡牌（网页版使用）"""
+        card = self.game_state.player.find_card(card_uid)
+        if card is None:
+            raise ValueError(f"牌组中没有 uid 为 {card_uid} 的卡牌")
+        if not card.upgrade():
+            raise ValueError(f"{card.name} 已经升级过了")
+        return card
     
     def shop(self):
         """商店"""
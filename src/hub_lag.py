@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""eventlet 主循环延迟监控
+
+后台绿色线程每隔 interval 秒醒来一次，实际醒来的时间比预定晚多少就是主循环的延迟：
+某个绿色线程执行阻塞调用（例如直接在主循环中执行 DuckDB 查询）时，所有绿色线程都会被推迟，
+延迟随之升高。统计最近 window 次测量的分位数、历史最大值和超过阈值的次数。
+
+通过环境变量配置（见 app.py）:
+    HUB_LAG_INTERVAL    测量间隔（秒），0 表示不监控，默认 0.1
+    HUB_LAG_THRESHOLD   计为卡顿的延迟（毫秒），默认 100
+"""
+import time
+from collections import deque
+
+
+class HubLagMonitor:
+    """主循环延迟监控"""
+
+    def __init__(self, interval=0.1, threshold_ms=100.0, window=600):
+        self.interval = interval
+        self.threshold = threshold_ms / 1000
+        self.samples = deque(maxlen=window)  # 最近的延迟（秒）
+        self.count = 0
+        self.stalls = 0  # 超过阈值的次数
+        self.max_lag = 0.0
+        self.running = False
+
+    def record(self, lag):
+        self.samples.append(lag)
+        self.count += 1
+        if lag > self.max_lag:
+            self.max_lag = lag
+        if lag >= self.threshold:
+            self.stalls += 1
+
+    def run(self, sleep):
+        """后台任务主循环，sleep 为 socketio.sleep"""
+        self.running = True
+        while self.running:
+            expected = time.perf_counter() + self.interval
+            sleep(self.interval)
+            self.record(max(0.0, time.perf_counter() - expected))
+
+    def stop(self):
+        self.running = False
+
+    def stats(self):
+        samples = sorted(self.samples)
+
+        def percentile(p):
+            if not samples:
+                return None
+            return round(samples[min(len(samples) - 1, int(len(samples) * p))] * 1000, 3)
+
+        return {
+            'interval_ms': self.interval * 1000,
+            'threshold_ms': self.threshold * 1000,
+            'samples': self.count,
+            'stalls': self.stalls,
+            'p50_ms': percentile(0.5),
+            'p99_ms': percentile(0.99),
+            'recent_max_ms': round(samples[-1] * 1000, 3) if samples else None,
+            'max_ms': round(self.max_lag * 1000, 3)
+        }
+
+    def reset(self):
+        self.samples.clear()
+        self.count = 0
+        self.stalls = 0
+        self.max_lag = 0.0
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""敌人意图引擎
+
+每种怪物有一张招式表（在 data/encounters.json 的 moves / opening / pattern 中定义），
+加载时编译为整数编码的数组：
+    - opening   开场固定的若干招式
+    - pattern   循环招式序列（有 pattern 时不再按权重随机）
+    - 其余情况按 weight 加权随机，max_repeat 限制同一招式连续使用的次数，
+      cooldown 表示使用后需间隔的回合数
+
+被规则禁用的招式组合用位掩码表示，每个掩码对应的别名表只建一次并缓存，
+因此每次选择意图的开销与招式数量无关。没有招式表的敌人使用按普通/精英/Boss区分的默认表。
+"""
+import random
+
+from src.sampler import AliasTable
+from src import combat_events
+
+# 意图编码
+INTENT_ATTACK = 0
+INTENT_DEFEND = 1
+INTENT_BUFF = 2
+
+INTENT_NAMES = ("Attack", "Defend", "Buff")
+INTENT_CODES = {name: code for code, name in enumerate(INTENT_NAMES)}
+
+
+def _value_range(value):
+    """把 6、[5, 12] 统一为 (最小, 最大)"""
+    if isinstance(value, (list, tuple)):
+        return int(value[0]), int(value[1])
+    return int(value), int(value)
+
+
+class MoveTable:
+    """编译后的招式表（只读，同种怪物的所有敌人共享）"""
+    __slots__ = ('names', 'intents', 'value_min', 'value_max', 'weights', 'max_repeat', 'cooldown',
+                 'opening', 'pattern', 'has_cooldown', '_tables')
+
+    def __init__(self, moves, opening=(), pattern=()):
+        if not moves:
+            raise ValueError("招式表至少需要一个招式")
+        self.names = tuple(move['name'] for move in moves)
+        index = {name: i for i, name in enumerate(self.names)}
+        self.intents = tuple(INTENT_CODES[move['intent']] for move in moves)
+        ranges = [_value_range(move.get('value', 0)) for move in moves]
+        self.value_min = tuple(r[0] for r in ranges)
+        self.value_max = tuple(r[1] for r in ranges)
+        self.weights = tuple(move.get('weight', 1) for move in moves)
+        self.max_repeat = tuple(move.get('max_repeat', 0) for move in moves)
+        self.cooldown = tuple(move.get('cooldown', 0) for move in moves)
+        self.opening = tuple(index[name] for name in opening)
+        self.pattern = tuple(index[name] for name in pattern)
+        self.has_cooldown = any(self.cooldown)
+        # 禁用掩码 -> 别名表
+        self._tables = {}
+
+    def _table(self, banned):
+        """禁用掩码对应的别名表（全部被禁用时忽略限制）"""
+        table = self._tables.get(banned)
+        if table is None:
+            allowed = [i for i in range(len(self.names))
+                       if not banned & (1 << i) and self.weights[i] > 0]
+            if not allowed:
+                table = self._table(0)
+            else:
+                table = AliasTable(allowed, [self.weights[i] for i in allowed])
+            self._tables[banned] = table
+        return table
+
+    def choose(self, enemy, rng=random):
+        """为敌人选择下一个招式的下标"""
+        turn = enemy.move_turn
+        opening = self.opening
+        if turn < len(opening):
+            return opening[turn]
+        if self.pattern:
+            return self.pattern[(turn - len(opening)) % len(self.pattern)]
+
+        banned = 0
+        last = enemy.move
+        if last >= 0 and self.max_repeat[last] and enemy.move_streak >= self.max_repeat[last]:
+            banned |= 1 << last
+        if self.has_cooldown:
+            last_used = enemy.move_last_used
+            for i, cooldown in enumerate(self.cooldown):
+                if cooldown and last_used[i] >= 0 and turn - last_used[i] <= cooldown:
+                    banned |= 1 << i
+        return self._table(banned).sample(rng)
+
+
+# 没有招式表的敌人使用的默认表（与原先 70/20/10 的随机意图一致）
+DEFAULT_MOVE_TABLES = {
+    'normal': MoveTable([
+        {'name': 'Attack', 'intent': 'Attack', 'value': [5, 12], 'weight': 70},
+        {'name': 'Defend', 'intent': 'Defend', 'value': [5, 10], 'weight': 20},
+        {'name': 'Buff', 'intent': 'Buff', 'value': [1, 3], 'weight': 10}
+    ]),
+    'elite': MoveTable([
+        {'name': 'Attack', 'intent': 'Attack', 'value': [10, 18], 'weight': 70},
+        {'name': 'Defend', 'intent': 'Defend', 'value': [8, 15], 'weight': 20},
+        {'name': 'Buff', 'intent': 'Buff', 'value': [1, 3], 'weight': 10}
+    ]),
+    'boss': MoveTable([
+        {'name': 'Attack', 'intent': 'Attack', 'value': [15, 25], 'weight': 70},
+        {'name': 'Defend', 'intent': 'Defend', 'value': [12, 20], 'weight': 20},
+        {'name': 'Buff', 'intent': 'Buff', 'value': [1, 3], 'weight': 10}
+    ])
+}
+
+
+def default_move_table(enemy):
+    """按敌人等级选择默认招式表"""
+    if enemy.is_boss:
+        return DEFAULT_MOVE_TABLES['boss']
+    if enemy.is_elite:
+        return DEFAULT_MOVE_TABLES['elite']
+    return DEFAULT_MOVE_TABLES['normal']
+
+
+def assign_move_table(enemy, table):
+    """给敌人指定招式表并重置招式状态"""
+    enemy.move_table = table
+    enemy.move = -1
+    enemy.move_streak = 0
+    enemy.move_turn = 0
+    enemy.move_last_used = [-1] * len(table.names) if table.has_cooldown else None
+
+
+def roll_intent(enemy, rng=random):
+    """为一个敌人选择下一回合的意图"""
+    table = enemy.move_table
+    if table is None:
+        assign_move_table(enemy, default_move_table(enemy))
+        table = enemy.move_table
+
+    move = table.choose(enemy, rng)
+    if move == enemy.move:
+        enemy.move_streak += 1
+    else:
+        enemy.move = move
+        enemy.move_streak = 1
+    if table.has_cooldown:
+        enemy.move_last_used[move] = enemy.move_turn
+    enemy.move_turn += 1
+
+    enemy.intent_code = table.intents[move]
+    low, high = table.value_min[move], table.value_max[move]
+    enemy.intent_value = low if low == high else rng.randint(low, high)
+    combat_events.record(combat_events.INTENT, enemy.id, enemy.intent_code, enemy.intent_value)
+    return move
+
+
+def roll_intents(enemies, rng=random):
+    """一次为遭遇中所有存活的敌人选择意图"""
+    for enemy in enemies:
+        if enemy.current_hp > 0:
+            roll_intent(enemy, rng)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""可替换的JSON编码层
+
+Socket.IO 数据包和 Flask 的 jsonify 都通过这里编码。可用的后端按优先级为
+orjson、ujson、标准库 json，未安装的自动跳过；也可以用环境变量 JSON_ENCODER
+（auto / orjson / ujson / json）指定，指定的后端不可用时回退到自动选择。
+
+所有后端行为一致：输出 UTF-8（不转义中文）、紧凑分隔符、允许非字符串键，
+deque、set、array 编码为数组，带 to_dict() 的模型对象编码为其字典。
+
+CodecPacket 替换 Socket.IO 默认的数据包类：每次 emit 只编码一次负载，
+并省去发送前对整个负载的二进制数据递归检查。它依赖 python-socketio 的 Packet 内部实现
+（按 requirements.txt 固定的 5.10.0 编写，5.17 上同样验证过）；packet_class() 启动时检查，
+不一致时使用默认的数据包类。
+"""
+import os
+import json
+import inspect
+import logging
+from array import array
+from collections import deque
+
+from socketio import packet
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('orjson', 'ujson', 'json')
+
+
+def _default(obj):
+    """各后端共用的扩展类型处理"""
+    if isinstance(obj, (deque, set, frozenset, array)):
+        return list(obj)
+    to_dict = getattr(obj, 'to_dict', None)
+    if to_dict is not None:
+        return to_dict()
+    raise TypeError(f"无法编码为JSON的类型: {type(obj).__name__}")
+
+
+def _stdlib_dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=_default).encode('utf-8')
+
+
+def _load_backend(name):
+    """返回 (编码为 bytes 的函数, 解码函数)，后端不可用时抛出 ImportError"""
+    if name == 'orjson':
+        import orjson
+        option = orjson.OPT_NON_STR_KEYS
+
+        def dumps(obj):
+            return orjson.dumps(obj, default=_default, option=option)
+        return dumps, orjson.loads
+    if name == 'ujson':
+        import ujson
+
+        def dumps(obj):
+            return ujson.dumps(obj, ensure_ascii=False, default=_default).encode('utf-8')
+        return dumps, ujson.loads
+    if name == 'json':
+        return _stdlib_dumps, json.loads
+    raise ValueError(f"未知的JSON后端: {name}")
+
+
+_backend = None
+_dumps = _stdlib_dumps
+_loads = json.loads
+
+
+def use(name='auto'):
+    """切换后端，返回实际使用的后端名称"""
+    global _backend, _dumps, _loads
+    candidates = BACKENDS if name == 'auto' else (name,) + BACKENDS
+    for candidate in candidates:
+        try:
+            _dumps, _loads = _load_backend(candidate)
+        except (ImportError, ValueError):
+            if candidate == name:
+                logger.warning("JSON后端 %s 不可用，改为自动选择", name)
+            continue
+        _backend = candidate
+        return candidate
+    raise ValueError(f"没有可用的JSON后端: {name}")
+
+
+def backend():
+    """当前使用的后端名称"""
+    return _backend
+
+
+def available():
+    """已安装的后端"""
+    names = []
+    for name in BACKENDS:
+        try:
+            _load_backend(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def dumps(obj):
+    """编码为 UTF-8 字节串"""
+    return _dumps(obj)
+
+
+def dumps_str(obj):
+    """编码为字符串"""
+    return _dumps(obj).decode('utf-8')
+
+
+def loads(data):
+    """解码（接受 str 或 bytes）"""
+    return _loads(data)
+
+
+class SocketIOJSON:
+    """传给 SocketIO(json=...) 的 json 模块替身（忽略 separators 等标准库参数）"""
+
+    @staticmethod
+    def dumps(obj, *args, **kwargs):
+        return _dumps(obj).decode('utf-8')
+
+    @staticmethod
+    def loads(data, *args, **kwargs):
+        return _loads(data)
+
+
+
+class CodecPacket(packet.Packet):
+    """Socket.IO 数据包：负载用当前后端编码一次
+
+    默认实现先递归遍历整个负载检查是否含二进制数据，编码时再遍历一次。这里先直接编码：
+    编码成功说明负载不含 bytes（游戏状态中没有二进制数据），结果在 encode() 中直接拼接；
+    编码失败时退回默认的二进制处理流程。
+    """
+    json = SocketIOJSON
+
+    def __init__(self, packet_type=packet.EVENT, data=None, namespace=None, id=None,
+                 binary=None, encoded_packet=None):
+        self.encoded_data = None
+        if binary is None and encoded_packet is None and data is not None:
+            try:
+                self.encoded_data = _dumps(data).decode('utf-8')
+                binary = False
+            except TypeError:
+                pass
+        super().__init__(packet_type, data, namespace, id, binary, encoded_packet)
+
+    def encode(self):
+        if self.encoded_data is None:
+            return super().encode()
+        encoded_packet = str(self.packet_type)
+        if self.namespace is not None and self.namespace != '/':
+            encoded_packet += self.namespace + ','
+        if self.id is not None:
+            encoded_packet += str(self.id)
+        return encoded_packet + self.encoded_data
+
+
+# CodecPacket 假设的 Packet.__init__ 参数
+_PACKET_PARAMS = ['self', 'packet_type', 'data', 'namespace', 'id', 'binary', 'encoded_packet']
+
+
+def packet_class():
+    """传给 SocketIO(serializer=...) 的数据包类
+
+    python-socketio 的 Packet 与 CodecPacket 的假设不一致时（构造参数不同，或编码结果与默认实现不同）
+    记录警告并返回默认的 Packet。
+    """
+    try:
+        params = list(inspect.signature(packet.Packet.__init__).parameters)
+        if params != _PACKET_PARAMS:
+            raise TypeError(f"Packet.__init__ 的参数为 {params}")
+        # 只含 ASCII 的负载，两种实现的编码结果应当完全相同
+        for args in ((packet.EVENT, ['update_state', {'floor': 1, 'hand': [1, 2]}], '/game', 7),
+                     (packet.ACK, [None], None, None)):
+            expected = packet.Packet(*args).encode()
+            actual = CodecPacket(*args).encode()
+            if actual != expected:
+                raise ValueError(f"编码结果不同: {actual!r} != {expected!r}")
+    except Exception as e:
+        from importlib.metadata import version
+        logger.warning("python-socketio %s 的数据包实现与 CodecPacket 不兼容（%s），使用默认的数据包类",
+                       version('python-socketio'), e)
+        return packet.Packet
+    return CodecPacket
+
+
+use(os.environ.get('JSON_ENCODER', 'auto'))
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""排行榜
+
+每个排行榜在内存中保留前 K 名（最小堆，堆顶是榜上最差的一名）。对局结束时 submit() 把成绩
+与堆顶比较，进榜时替换堆顶，O(log K)；读取 top() 直接返回按名次排好的列表（有变化后第一次读取时排序一次），
+不需要扫描 saves 或 runs 表。
+
+排行榜:
+    floor        最高楼层
+    boss_turns   最快击败Boss（Boss战用的回合数，越少越好）
+    gold         对局结束时的金币
+
+排行榜定期整体写入 leaderboard_entries 表（只写有变化的榜），启动时从表中读回；
+表为空时用 runs 表中的历史对局补齐最高楼层和金币榜。
+
+通过环境变量配置（见 app.py）:
+    LEADERBOARD_SIZE               每个排行榜保留的名次数，默认 100
+    LEADERBOARD_PERSIST_INTERVAL   app.py 写入数据库的间隔（秒），默认 30；命令行版对局结束时立即写入
+"""
+import os
+import heapq
+import logging
+import itertools
+from datetime import datetime
+
+import duckdb
+
+from src import db
+from src.models import DB_PATH
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZE = 100
+
+# 排行榜名称 -> (标题, 分数越高越好)
+BOARDS = {
+    'floor': ('最高楼层', True),
+    'boss_turns': ('最快击败Boss（回合数）', False),
+    'gold': ('最多金币', True)
+}
+
+# 表为空时可以从 runs 表补齐的排行榜 -> runs 中的列
+BACKFILL_COLUMNS = {
+    'floor': 'floor_reached',
+    'gold': 'gold'
+}
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS leaderboard_entries (
+        board VARCHAR NOT NULL,
+        rank INTEGER NOT NULL,
+        score INTEGER NOT NULL,
+        player_name VARCHAR NOT NULL,
+        character_id INTEGER NOT NULL,
+        floor INTEGER NOT NULL,
+        achieved_at TIMESTAMP NOT NULL,
+        PRIMARY KEY (board, rank)
+    )
+"""
+
+
+def create_tables(con):
+    """创建排行榜表（已存在时跳过）"""
+    con.execute(SCHEMA)
+
+
+class Leaderboard:
+    """保留前 size 名的排行榜；同分时先达成的排名靠前"""
+
+    def __init__(self, name, title, higher_is_better=True, size=DEFAULT_SIZE):
+        self.name = name
+        self.title = title
+        self.higher_is_better = higher_is_better
+        self.size = size
+        self.heap = []  # (排序键, 序号, 记录)，排序键越大名次越靠前
+        self.dirty = False  # 上次写入数据库之后是否有变化
+        self._ranked = None  # 按名次排好的记录，有变化时清空
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self.heap)
+
+    def offer(self, score, entry):
+        """提交一个成绩，进榜时返回 True；entry 包含 playerName、characterId、floor、achievedAt"""
+        sign = 1 if self.higher_is_better else -1
+        key = (sign * score, -entry['achievedAt'].timestamp())
+        item = (key, -next(self._seq), dict(entry, score=score))
+        if len(self.heap) < self.size:
+            heapq.heappush(self.heap, item)
+        elif item > self.heap[0]:
+            heapq.heapreplace(self.heap, item)
+        else:
+            return False
+        self.dirty = True
+        self._ranked = None
+        return True
+
+    def ranked(self):
+        """按名次排好的记录（名次从 1 开始）"""
+        if self._ranked is None:
+            self._ranked = [
+                dict(entry, rank=rank)
+                for rank, (_, _, entry) in enumerate(sorted(self.heap, reverse=True), 1)
+            ]
+        return self._ranked
+
+    def top(self, limit=None):
+        """前 limit 名（可直接转为 JSON）"""
+        return [dict(entry, achievedAt=entry['achievedAt'].isoformat()) for entry in self.ranked()[:limit]]
+
+    def rows(self):
+        """写入 leaderboard_entries 的行"""
+        return [
+            (self.name, entry['rank'], entry['score'], entry['playerName'], entry['characterId'],
+             entry['floor'], entry['achievedAt'])
+            for entry in self.ranked()
+        ]
+
+
+_config = {'buffered': False, 'size': None}
+_boards = {}
+
+
+def configure(buffered=None, size=None):
+    """buffered 为 True 时对局结束只更新内存中的排行榜，由调用方定期 persist()（app.py）"""
+    if buffered is not None:
+        _config['buffered'] = buffered
+    if size is not None:
+        _config['size'] = size
+
+
+def _board_size():
+    size = _config['size']
+    if size is None:
+        size = int(os.environ.get('LEADERBOARD_SIZE', DEFAULT_SIZE))
+    if size < 1:
+        raise ValueError(f"LEADERBOARD_SIZE 必须大于 0: {size}")
+    return size
+
+
+def _read_rows(path):
+    """读取已保存的排行榜；表为空时从 runs 表补齐，返回 (排行榜, 分数, 玩家, 角色, 楼层, 时间) 列表"""
+    if not os.path.exists(path):
+        return []
+    size = _board_size()
+    con = duckdb.connect(path)
+    try:
+        create_tables(con)
+        rows = con.execute(
+            """
+            SELECT board, score, player_name, character_id, floor, achieved_at
+            FROM leaderboard_entries ORDER BY board, rank
+            """
+        ).fetchall()
+        if rows:
+            return rows
+        has_runs = con.execute(
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = 'runs' AND table_catalog = current_database()"
+        ).fetchone()[0]
+        if not has_runs:
+            return []
+        for board, column in BACKFILL_COLUMNS.items():
+            rows += con.execute(
+                f"""
+                SELECT ? AS board, {column}, player_name, character_id, floor_reached, ended_at
+                FROM runs ORDER BY {column} {'DESC' if BOARDS[board][1] else 'ASC'}, id LIMIT ?
+                """,
+                [board, size]
+            ).fetchall()
+        return rows
+    finally:
+        con.close()
+
+
+def load(path=DB_PATH):
+    """从数据库读回排行榜（替换内存中的排行榜）"""
+    size = _board_size()
+    boards = {name: Leaderboard(name, title, higher, size) for name, (title, higher) in BOARDS.items()}
+    for board, score, player_name, character_id, floor, achieved_at in db.run(_read_rows, path):
+        if board in boards:
+            boards[board].offer(score, {
+                'playerName': player_name,
+                'characterId': character_id,
+                'floor': floor,
+                'achievedAt': achieved_at
+            })
+    for board in boards.values():
+        board.dirty = False
+    _boards.clear()
+    _boards.update(boards)
+    return {name: len(board) for name, board in boards.items()}
+
+
+def _ensure_loaded():
+    if not _boards:
+        load()
+
+
+def scores(game_state, victory):
+    """一局结束时各排行榜的成绩（没有成绩的排行榜不出现）"""
+    result = {
+        'floor': game_state.floor,
+        'gold': game_state.player.gold
+    }
+    if victory:
+        result['boss_turns'] = game_state.combat_turn
+    return result
+
+
+def submit(game_state, player_name, victory):
+    """一局结束时提交成绩，返回进榜的排行榜名称"""
+    _ensure_loaded()
+    entry = {
+        'playerName': player_name,
+        'characterId': game_state.player.id,
+        'floor': game_state.floor,
+        'achievedAt': datetime.now()
+    }
+    placed = [name for name, score in scores(game_state, victory).items() if _boards[name].offer(score, entry)]
+    if placed and not _config['buffered']:
+        persist()
+    return placed
+
+
+def get_board(name):
+    """按名称取排行榜；名称无效时抛出 KeyError"""
+    if name not in BOARDS:
+        raise KeyError(name)
+    _ensure_loaded()
+    return _boards[name]
+
+
+def _write_rows(path, boards):
+    con = duckdb.connect(path)
+    try:
+        con.execute("BEGIN TRANSACTION")
+        create_tables(con)
+        for name, rows in boards.items():
+            # 按名次覆盖已有的行，再删掉超出当前长度的名次；不在同一事务中先删除再插入相同的主键
+            if rows:
+                con.executemany(
+                    """
+                    INSERT INTO leaderboard_entries VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (board, rank) DO UPDATE SET
+                        score = excluded.score,
+                        player_name = excluded.player_name,
+                        character_id = excluded.character_id,
+                        floor = excluded.floor,
+                        achieved_at = excluded.achieved_at
+                    """,
+                    rows
+                )
+            con.execute("DELETE FROM leaderboard_entries WHERE board = ? AND rank > ?", [name, len(rows)])
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    finally:
+        con.close()
+
+
+def persist(path=DB_PATH):
+    """把有变化的排行榜写入数据库，返回写入的排行榜数"""
+    # 在调用方的绿色线程中取出要写入的行，写入交给 db.run
+    dirty = [board for board in _boards.values() if board.dirty]
+    if not dirty:
+        return 0
+    for board in dirty:
+        board.dirty = False
+    try:
+        db.run(_write_rows, path, {board.name: board.rows() for board in dirty})
+    except Exception:
+        for board in dirty:
+            board.dirty = True
+        raise
+    return len(dirty)
+
+
+def run(sleep, interval):
+    """后台任务：每隔 interval 秒写入一次有变化的排行榜，sleep 为 socketio.sleep"""
+    while True:
+        sleep(interval)
+        try:
+            persist()
+        except Exception as e:
+            logger.error("写入排行榜失败: %s", e, exc_info=True)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""日志配置
+
+通过环境变量（或命令行参数，见 app.py）配置:
+    LOG_LEVEL               根日志级别，默认 INFO
+    LOG_FORMAT              text 或 json（每行一个JSON对象），默认 text
+    LOG_MODULE_LEVELS       按模块设置级别，如 "engineio=WARNING,src.models=DEBUG"
+    LOG_ASYNC               1 时日志写入由独立线程完成，不阻塞 eventlet 主循环，默认 1
+    LOG_ACTION_SAMPLE_RATE  玩家操作日志的采样率（0~1），默认 1
+    SOCKETIO_LOGGER         1 时打开 Socket.IO / Engine.IO 自身的日志，默认 0
+"""
+import os
+import sys
+import copy
+import json
+import time
+import atexit
+import random
+import logging
+import logging.handlers
+
+from src.eventlet_compat import original
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# LogRecord 自带的属性，JSON 输出时不作为额外字段
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+
+
+def env_flag(name, default=False):
+    """读取布尔型环境变量"""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+class JsonFormatter(logging.Formatter):
+    """结构化 JSON 日志格式"""
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """在调用方只做消息插值，格式化和写出都留给后台线程"""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class _NativeQueueListener(logging.handlers.QueueListener):
+    """使用真正操作系统线程的 QueueListener（不受 eventlet 猴子补丁影响）"""
+
+    def start(self):
+        threading = original('threading')
+        self._thread = threading.Thread(target=self._monitor, name='log-writer', daemon=True)
+        self._thread.start()
+
+
+class ActionLogSampler:
+    """按采样率决定是否记录某个玩家操作"""
+
+    def __init__(self, rate=1.0):
+        self.rate = rate
+
+    def should_log(self):
+        if self.rate >= 1:
+            return True
+        return self.rate > 0 and random.random() < self.rate
+
+
+action_sampler = ActionLogSampler(float(os.environ.get('LOG_ACTION_SAMPLE_RATE', '1')))
+
+
+def parse_module_levels(spec):
+    """解析 "a=DEBUG,b.c=WARNING" 格式的模块级别设置"""
+    levels = {}
+    if not spec:
+        return levels
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, sep, level = item.partition('=')
+        if not sep:
+            raise ValueError(f"无效的模块日志级别设置: {item}")
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(level=None, fmt=None, module_levels=None, use_async=None, action_sample_rate=None):
+    """配置根日志记录器；未传入的参数使用环境变量中的值。可重复调用"""
+    global _listener
+
+    level = (level or os.environ.get('LOG_LEVEL', 'INFO')).upper()
+    fmt = (fmt or os.environ.get('LOG_FORMAT', 'text')).lower()
+    if module_levels is None:
+        module_levels = os.environ.get('LOG_MODULE_LEVELS', '')
+    if isinstance(module_levels, str):
+        module_levels = parse_module_levels(module_levels)
+    if use_async is None:
+        use_async = env_flag('LOG_ASYNC', True)
+    if action_sample_rate is not None:
+        action_sampler.rate = float(action_sample_rate)
+
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    root = logging.getLogger()
+    _shutdown_listener()
+    for old in list(root.handlers):
+        root.removeHandler(old)
+
+    if use_async:
+        queue = original('queue').SimpleQueue()
+        _listener = _NativeQueueListener(queue, handler, respect_handler_level=True)
+        _listener.start()
+        root.addHandler(_QueueHandler(queue))
+    else:
+        root.addHandler(handler)
+
+    root.setLevel(level)
+    for name, module_level in module_levels.items():
+        logging.getLogger(name).setLevel(module_level)
+
+    return root
+
+
+def _shutdown_listener():
+    """停止后台日志线程并写出剩余日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(_shutdown_listener)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""地图路径分析（动态规划）
+
+在 MapGraph 上自顶向下（按节点编号倒序）做一次动态规划，O(节点数 + 边数) 得到:
+    - 从起点到 Boss 的不同路径数
+    - 任意一条路径上最多能经过多少个精英、休息处、商店等
+    - 按指定目标（节点类型 -> 分数）得分最高的路径
+
+起点为当前节点时只统计之后的节点（当前节点已经访问过）；不指定起点时从第一层任一节点出发。
+批量分析（按种子生成大量地图，用于调整节点类型权重）见根目录的 analyze_maps.py。
+"""
+
+# 预定义的目标：名称 -> {节点类型: 分数}
+OBJECTIVES = {
+    'elites': {"精英战斗": 1},
+    'rests': {"休息处": 1},
+    'shops': {"商店": 1},
+    'events': {"未知事件": 1},
+    'fights': {"普通战斗": 1, "精英战斗": 1},
+}
+
+
+def _sources(graph, start):
+    """路径的第一步可选的节点编号"""
+    if start is None:
+        return range(graph.layer_start[0], graph.layer_start[1])
+    return graph.children(start)
+
+
+def count_paths(graph, start=None):
+    """从起点到 Boss 的不同路径数"""
+    count = [0] * len(graph)
+    child_start = graph.child_start
+    child_list = graph.child_list
+    for index in range(len(graph) - 1, -1, -1):
+        begin, end = child_start[index], child_start[index + 1]
+        if begin == end:
+            count[index] = 1  # Boss（没有子节点）
+        else:
+            total = 0
+            for child in child_list[begin:end]:
+                total += count[child]
+            count[index] = total
+    return sum(count[i] for i in _sources(graph, start))
+
+
+def best_path(graph, objective, start=None):
+    """得分最高的路径，返回 (得分, 节点编号列表)
+
+    objective 为 OBJECTIVES 中的名称，或 {节点类型: 分数} 字典
+    """
+    weights = OBJECTIVES[objective] if isinstance(objective, str) else objective
+    nodes = graph.nodes
+    child_start = graph.child_start
+    child_list = graph.child_list
+    score = [0] * len(graph)
+    best_next = [-1] * len(graph)
+    for index in range(len(graph) - 1, -1, -1):
+        begin, end = child_start[index], child_start[index + 1]
+        best = 0
+        if begin != end:
+            best_child = child_list[begin]
+            best = score[best_child]
+            for child in child_list[begin + 1:end]:
+                if score[child] > best:
+                    best, best_child = score[child], child
+            best_next[index] = best_child
+        score[index] = best + weights.get(nodes[index].node_type, 0)
+
+    sources = _sources(graph, start)
+    if not sources:
+        return 0, []
+    index = max(sources, key=score.__getitem__)
+    total = score[index]
+    path = []
+    while index >= 0:
+        path.append(index)
+        index = best_next[index]
+    return total, path
+
+
+def analyze(graph, start=None, objectives=OBJECTIVES):
+    """路径统计：路径数，以及每个目标的最大值和对应路径（路径为 [层, 层内位置] 列表）"""
+    result = {'paths': count_paths(graph, start), 'max': {}, 'best_paths': {}}
+    for name in objectives:
+        total, path = best_path(graph, objectives[name], start)
+        result['max'][name] = total
+        result['best_paths'][name] = [graph.position(index) for index in path]
+    return result
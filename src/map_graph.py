@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""地图的紧凑邻接结构
+
+地图生成后（MapNode 对象按层组织）构建一次 MapGraph：
+    - 节点按层展平编号，(层, 层内位置) -> 编号通过每层起始偏移 O(1) 计算
+    - 子节点以 CSR 形式保存在两个 array('H') 中（child_start / child_list）
+    - 每个节点预先计算直接子节点的位掩码
+
+于是"下一步可以去哪里"是 O(1) 的位运算，选择路径时不再扫描连接列表。
+地图结构生成后不变，只有当前位置和已访问标记会变化。
+"""
+from array import array
+from bisect import bisect_right
+
+
+class MapGraph:
+    """地图的只读邻接结构（节点编号按层展平）"""
+    __slots__ = ('nodes', 'layer_start', 'child_start', 'child_list', 'child_mask')
+
+    def __init__(self, layers):
+        nodes = [node for layer in layers for node in layer]
+        layer_start = array('H', [0])
+        for layer in layers:
+            layer_start.append(layer_start[-1] + len(layer))
+        for index, node in enumerate(nodes):
+            node.index = index
+
+        child_start = array('H', [0])
+        child_list = array('H')
+        for node in nodes:
+            child_list.extend(child.index for child in node.connections)
+            child_start.append(len(child_list))
+
+        child_mask = [0] * len(nodes)
+        for index in range(len(nodes)):
+            children = 0
+            for child in child_list[child_start[index]:child_start[index + 1]]:
+                children |= 1 << child
+            child_mask[index] = children
+
+        self.nodes = nodes
+        self.layer_start = layer_start
+        self.child_start = child_start
+        self.child_list = child_list
+        self.child_mask = child_mask
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def layer_count(self):
+        return len(self.layer_start) - 1
+
+    def index_at(self, row, col):
+        """(层, 层内位置) 对应的节点编号，位置无效时返回 -1"""
+        if not 0 <= row < len(self.layer_start) - 1:
+            return -1
+        start = self.layer_start[row]
+        if not 0 <= col < self.layer_start[row + 1] - start:
+            return -1
+        return start + col
+
+    def position(self, index):
+        """节点编号对应的 (层, 层内位置)"""
+        row = bisect_right(self.layer_start, index) - 1
+        return row, index - self.layer_start[row]
+
+    def children(self, index):
+        """节点的子节点编号"""
+        return self.child_list[self.child_start[index]:self.child_start[index + 1]]
+
+    def is_next(self, src, dst):
+        """dst 是否是 src 的直接子节点"""
+        return (self.child_mask[src] >> dst) & 1 == 1
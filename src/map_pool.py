@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""预生成地图池
+
+后台任务在空闲时预先生成若干张地图（连同种子），创建会话时直接取用，
+会话创建就不再需要当场生成地图。池为空时调用方自行生成，行为不变。
+
+通过环境变量配置（见 app.py）:
+    MAP_POOL_SIZE      池中保留的地图数量，0 表示不使用地图池，默认 0
+"""
+import random
+from collections import deque
+
+# 地图种子范围
+MAP_SEED_BITS = 31
+
+
+def new_map_seed():
+    """生成一个新的地图种子"""
+    return random.getrandbits(MAP_SEED_BITS)
+
+
+class MapPool:
+    """预生成地图池"""
+
+    def __init__(self, size, build):
+        # build(seed) -> 地图节点（按层的列表）
+        self.size = size
+        self.build = build
+        self.maps = deque()
+        self.hits = 0
+        self.misses = 0
+        self.running = False
+
+    def __len__(self):
+        return len(self.maps)
+
+    def take(self):
+        """取出一张预生成的地图，返回 (种子, 地图)；池为空时返回 None"""
+        try:
+            entry = self.maps.popleft()
+        except IndexError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def fill_one(self):
+        """生成一张地图放入池中；池已满时返回 False"""
+        if len(self.maps) >= self.size:
+            return False
+        seed = new_map_seed()
+        self.maps.append((seed, self.build(seed)))
+        return True
+
+    def fill(self):
+        """把池填满"""
+        while self.fill_one():
+            pass
+
+    def run(self, sleep, interval=0.5):
+        """后台任务：每次只生成一张地图然后让出，池满时等待 interval 秒"""
+        self.running = True
+        while self.running:
+            if self.fill_one():
+                sleep(0)
+            else:
+                sleep(interval)
+
+    def stop(self):
+        self.running = False
+
+    def stats(self):
+        return {
+            'size': self.size,
+            'available': len(self.maps),
+            'hits': self.hits,
+            'misses': self.misses
+        }
@@ -2,14 +2,44 @@
 import os
 import random
 import time
+import itertools
+from collections import deque
 import duckdb
 from colorama import Fore, Style
 
-# 数据库路径
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'slay_the_spire.db')
+from src.tracing import span, traced
+from src import db
+from src.intents import INTENT_ATTACK, INTENT_DEFEND, INTENT_BUFF, INTENT_NAMES, INTENT_CODES, roll_intent
+from src import combat_events
+from src.combat_events import PILE_NONE, PILE_DRAW, PILE_HAND, PILE_DISCARD
+from src.eventlet_compat import original
+
+# 数据库路径（可通过 STS_DB_PATH 环境变量覆盖，供基准测试等使用独立数据库）
+DB_PATH = os.environ.get(
+    'STS_DB_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'slay_the_spire.db')
+)
+
+# 已经补齐 saves 表新列的数据库路径；读写存档可能同时在多个工作线程中执行（见 src/db.py）
+_saves_upgraded = set()
+_saves_upgrade_lock = original('threading').Lock()
+
+
+def upgrade_saves_table(con, path=DB_PATH):
+    """兼容在 map_seed 列加入之前创建的数据库：读写存档前补上缺少的列（每个数据库只执行一次）
+
+    旧存档的 map_seed 为空，读档时按新种子生成地图（见 SlayTheSpireGame.generate_map）
+    """
+    if path in _saves_upgraded:
+        return
+    with _saves_upgrade_lock:
+        if path not in _saves_upgraded:
+            con.execute("ALTER TABLE saves ADD COLUMN IF NOT EXISTS map_seed BIGINT")
+            _saves_upgraded.add(path)
 
 class MapNode:
     """地图节点类"""
+    __slots__ = ('node_type', 'x', 'y', 'visited', 'available')
     
     def __init__(self, node_type, x, y):
         self.node_type = node_type
@@ -30,6 +60,7 @@ class MapNode:
 
 class Event:
     """事件类"""
+    __slots__ = ('id', 'name', 'description', 'choices')
     
     def __init__(self, id, name, description, choices):
         self.id = id
@@ -46,94 +77,229 @@ class Event:
             'choices': self.choices
         }
 
+# 进程内共享的卡牌定义，按卡牌ID索引
+_card_defs = {}
+
+# 卡牌副本的唯一ID生成器
+_card_uids = itertools.count(1)
+
+
+def _upgraded_description(name, description):
+    """根据卡牌名称计算升级后的描述"""
+    if "打击" in name:
+        return description.replace("6", "9")
+    elif "防御" in name:
+        return description.replace("5", "8")
+    elif name == "愤怒":
+        return description.replace("3", "5")
+    elif name == "重击":
+        return description.replace("14", "18")
+    elif name == "铁斩波":
+        return description.replace("8", "12")
+    elif name == "顺势斩":
+        return description.replace("12", "16").replace("16", "20")
+    elif name == "毒刃":
+        return description.replace("5", "7").replace("2", "3")
+    elif name == "闪避":
+        return description.replace("8", "11")
+    elif name == "致命毒素":
+        return description.replace("5", "7")
+    elif name == "刀刃之舞":
+        return description.replace("4", "6")
+    elif name == "闪电球" or name == "冰霜球":
+        return description.replace("1", "2")
+    elif name == "双重施法":
+        return description.replace("下一张", "下两张")
+    elif name == "自我修复":
+        return description.replace("3", "5")
+    elif name == "火球术":
+        return description.replace("10", "14")
+    elif name == "血肉奉献":
+        return description.replace("8", "10")
+    elif name == "狂暴打击":
+        return description.replace("8", "10")
+    elif name == "战斗呐喊":
+        return description.replace("1", "2")
+    elif name == "暗影步伐":
+        return description.replace("6", "8")
+    elif name == "毒雾弹":
+        return description.replace("4", "5").replace("3", "4")
+    elif name == "伏击":
+        return description.replace("4", "6")
+    elif name == "能量涌动":
+        return description.replace("2", "3")
+    elif name == "核心过载":
+        return description.replace("1", "2")
+    elif name == "数据分析":
+        return description.replace("3", "4")
+    return description
+
+
+class CardDef:
+    """卡牌定义（享元）
+
+    名称、类型、稀有度、费用、描述等静态数据每种卡牌在进程内只保存一份，
+    由牌组中所有副本共享，创建后不可修改。每张副本自己的状态见 Card。
+    """
+    __slots__ = ('id', 'name', 'card_type', 'rarity', 'cost', 'description',
+                 'upgraded_description', 'character_id')
+
+    def __init__(self, id, name, card_type, rarity, energy_cost, description, character_id=None):
+        init = object.__setattr__
+        init(self, 'id', id)
+        init(self, 'name', name)
+        init(self, 'card_type', card_type)
+        init(self, 'rarity', rarity)
+        init(self, 'cost', energy_cost)
+        init(self, 'description', description)
+        init(self, 'upgraded_description', _upgraded_description(name, description))
+        init(self, 'character_id', character_id)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"卡牌定义不可修改: {name}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"卡牌定义不可修改: {name}")
+
+    @classmethod
+    def from_row(cls, row):
+        """根据 cards 表的一行（id, name, card_type, rarity, energy_cost, description, character_id, ...）
+        获取共享的卡牌定义"""
+        card_def = _card_defs.get(row[0])
+        if card_def is None:
+            card_def = cls(*row[:7])
+            _card_defs[row[0]] = card_def
+        return card_def
+
+    @staticmethod
+    @db.offloaded
+    def load_catalog():
+        """一次性把整个卡牌目录加载为卡牌定义"""
+        con = duckdb.connect(DB_PATH)
+        rows = con.execute(
+            "SELECT id, name, card_type, rarity, energy_cost, description, character_id FROM cards"
+        ).fetchall()
+        con.close()
+        for row in rows:
+            CardDef.from_row(row)
+        return _card_defs
+
+    @staticmethod
+    def get(card_id):
+        """根据ID获取卡牌定义，首次未命中时加载整个目录"""
+        card_def = _card_defs.get(card_id)
+        if card_def is None:
+            card_def = CardDef.load_catalog().get(card_id)
+        return card_def
+
+
+# 状态牌"晕眩"不在卡牌目录中
+DAZED = CardDef(999, "晕眩", "Status", "Common", 0, "无法打出。回合结束时消耗。")
+
+
 class Card:
-    """卡牌类"""
-    def __init__(self, id, name, card_type, rarity, energy_cost, description, character_id=None, upgraded=False):
-        self.id = id
-        self.name = name
-        self.card_type = card_type
-        self.rarity = rarity
-        self.cost = energy_cost
-        self.description = description
-        self.character_id = character_id
+    """卡牌副本
+
+    牌组中的每一张牌都是一个独立的副本，有自己的 uid、升级状态、费用修改和标记；
+    名称、描述等静态数据通过 definition 引用共享的 CardDef。
+    """
+    # 每个会话持有整副牌组和多个牌堆，用 __slots__ 去掉每个实例的 __dict__
+    __slots__ = ('uid', 'definition', 'upgraded', 'cost_override',
+                 'exhausted', 'ethereal', 'innate', 'retain', '_dict')
+    
+    def __setattr__(self, name, value):
+        # 脏标记：任何字段变化都使缓存的序列化结果失效（读取字段不受影响）
+        object.__setattr__(self, name, value)
+        if name != '_dict':
+            object.__setattr__(self, '_dict', None)
+    
+    def __init__(self, definition, upgraded=False, cost_override=None):
+        self.uid = str(next(_card_uids))
+        self.definition = definition
         self.upgraded = upgraded
+        self.cost_override = cost_override  # 本副本的费用修改，None 表示使用定义中的费用
         self.exhausted = False
         self.ethereal = False  # 虚无属性，打出后消耗
         self.innate = False  # 固有属性，初始手牌必定包含
         self.retain = False  # 保留属性，回合结束不丢弃
+
+    @classmethod
+    def from_row(cls, row, upgraded=False):
+        """根据 cards 表的一行创建卡牌副本"""
+        return cls(CardDef.from_row(row), upgraded=upgraded)
+
+    @property
+    def id(self):
+        return self.definition.id
+
+    @property
+    def name(self):
+        return self.definition.name
+
+    @property
+    def card_type(self):
+        return self.definition.card_type
+
+    @property
+    def rarity(self):
+        return self.definition.rarity
+
+    @property
+    def character_id(self):
+        return self.definition.character_id
+
+    @property
+    def cost(self):
+        if self.cost_override is not None:
+            return self.cost_override
+        return self.definition.cost
+
+    @cost.setter
+    def cost(self, value):
+        self.cost_override = value
+
+    @property
+    def description(self):
+        if self.upgraded:
+            return self.definition.upgraded_description
+        return self.definition.description
+
+    def copy(self):
+        """复制一张新的副本（新的 uid）"""
+        card = Card(self.definition, self.upgraded, self.cost_override)
+        card.ethereal = self.ethereal
+        card.innate = self.innate
+        card.retain = self.retain
+        return card
         
     def to_dict(self):
-        """将卡牌序列化为字典"""
-        return {
-            'id': self.id,
-            'name': self.name,
-            'card_type': self.card_type,
-            'rarity': self.rarity,
-            'cost': self.cost,
-            'description': self.description,
-            'character_id': self.character_id,
-            'upgraded': self.upgraded,
-            'exhausted': self.exhausted,
-            'ethereal': self.ethereal,
-            'innate': self.innate,
-            'retain': self.retain
-        }
+        """将卡牌序列化为字典（缓存到本副本下次被修改为止，调用方不要修改返回的字典）"""
+        data = self._dict
+        if data is None:
+            data = {
+                'uid': self.uid,
+                'id': self.id,
+                'name': self.name,
+                'card_type': self.card_type,
+                'rarity': self.rarity,
+                'cost': self.cost,
+                'description': self.description,
+                'character_id': self.character_id,
+                'upgraded': self.upgraded,
+                'exhausted': self.exhausted,
+                'ethereal': self.ethereal,
+                'innate': self.innate,
+                'retain': self.retain
+            }
+            self._dict = data
+        return data
         
     def upgrade(self):
-        """升级卡牌"""
+        """升级卡牌（只影响这一张副本）"""
         if self.upgraded:
             return False
             
         self.upgraded = True
-        
-        # 根据卡牌名称应用不同的升级效果
-        if "打击" in self.name:
-            self.description = self.description.replace("6", "9")
-        elif "防御" in self.name:
-            self.description = self.description.replace("5", "8")
-        elif self.name == "愤怒":
-            self.description = self.description.replace("3", "5")
-        elif self.name == "重击":
-            self.description = self.description.replace("14", "18")
-        elif self.name == "铁斩波":
-            self.description = self.description.replace("8", "12")
-        elif self.name == "顺势斩":
-            self.description = self.description.replace("12", "16").replace("16", "20")
-        elif self.name == "毒刃":
-            self.description = self.description.replace("5", "7").replace("2", "3")
-        elif self.name == "闪避":
-            self.description = self.description.replace("8", "11")
-        elif self.name == "致命毒素":
-            self.description = self.description.replace("5", "7")
-        elif self.name == "刀刃之舞":
-            self.description = self.description.replace("4", "6")
-        elif self.name == "闪电球" or self.name == "冰霜球":
-            self.description = self.description.replace("1", "2")
-        elif self.name == "双重施法":
-            self.description = self.description.replace("下一张", "下两张")
-        elif self.name == "自我修复":
-            self.description = self.description.replace("3", "5")
-        elif self.name == "火球术":
-            self.description = self.description.replace("10", "14")
-        elif self.name == "血肉奉献":
-            self.description = self.description.replace("8", "10")
-        elif self.name == "狂暴打击":
-            self.description = self.description.replace("8", "10")
-        elif self.name == "战斗呐喊":
-            self.description = self.description.replace("1", "2")
-        elif self.name == "暗影步伐":
-            self.description = self.description.replace("6", "8")
-        elif self.name == "毒雾弹":
-            self.description = self.description.replace("4", "5").replace("3", "4")
-        elif self.name == "伏击":
-            self.description = self.description.replace("4", "6")
-        elif self.name == "能量涌动":
-            self.description = self.description.replace("2", "3")
-        elif self.name == "核心过载":
-            self.description = self.description.replace("1", "2")
-        elif self.name == "数据分析":
-            self.description = self.description.replace("3", "4")
-            
         return True
         
     def play(self, player, targets=None):
@@ -146,14 +312,16 @@ class Card:
         player.energy -= self.cost
         
         # 根据卡牌类型和名称执行不同效果
-        result = self._execute_card_effect(player, targets)
+        with span('card_effect', card=self.name):
+            result = self._execute_card_effect(player, targets)
         
         # 处理双重施法效果
         if player.double_cast and self.card_type == "Skill":
             player.double_cast_count -= 1
             if player.double_cast_count <= 0:
                 player.double_cast = False
-            result = self._execute_card_effect(player, targets)
+            with span('card_effect', card=self.name, double_cast=True):
+                result = self._execute_card_effect(player, targets)
             
         # 处理虚无属性
         if self.ethereal:
@@ -177,7 +345,7 @@ class Card:
         elif self.name == "防御":
             block = 5 if not self.upgraded else 8
             block += player.dexterity
-            player.block += block
+            player.gain_block(block)
             return f"获得 {block} 点格挡!"
             
         # 铁甲战士卡牌
@@ -243,7 +411,7 @@ class Card:
         elif self.name == "闪避":
             block = 8 if not self.upgraded else 11
             block += player.dexterity
-            player.block += block
+            player.gain_block(block)
             
             # 抽一张牌
             player.draw_cards(1)
@@ -322,7 +490,7 @@ class Card:
             # 获得格挡
             block = 8 if not self.upgraded else 10
             block += player.dexterity
-            player.block += block
+            player.gain_block(block)
             
             # 抽一张牌
             player.draw_cards(1)
@@ -354,13 +522,14 @@ class Card:
             # 获得格挡
             block = 6 if not self.upgraded else 8
             block += player.dexterity
-            player.block += block
+            player.gain_block(block)
             
             # 丢弃一张牌
             if player.hand:
                 # 这里简化处理，直接丢弃第一张牌
                 discarded_card = player.hand.pop(0)
                 player.discard_pile.append(discarded_card)
+                combat_events.card_moved(discarded_card, PILE_HAND, PILE_DISCARD)
                 
                 # 如果丢弃的是技能牌，抽两张牌
                 if discarded_card.card_type == "Skill":
@@ -413,18 +582,10 @@ class Card:
             
             # 添加晕眩到弃牌堆
             # 这里简化处理，直接创建一个"晕眩"卡牌
-            dazed_card = Card(
-                id=999,
-                name="晕眩",
-                card_type="Status",
-                rarity="Common",
-                energy_cost=0,
-                description="无法打出。回合结束时消耗。",
-                character_id=None,
-                upgraded=False
-            )
+            dazed_card = Card(DAZED)
             dazed_card.ethereal = True
             player.discard_pile.append(dazed_card)
+            combat_events.card_moved(dazed_card, PILE_NONE, PILE_DISCARD)
             
             return f"获得{energy_gain}点能量，将1张晕眩加入你的弃牌堆!"
             
@@ -442,9 +603,10 @@ class Card:
             if len(player.draw_pile) < view_count:
                 return f"抽牌堆中的牌不足{view_count}张!"
                 
-            # 这里简化处理，直接从抽牌堆顶部抽一张牌
-            card = player.draw_pile.pop(0)
+            # 这里简化处理，直接从抽牌堆顶部抽一张牌（牌堆顶在列表末尾）
+            card = player.draw_pile.pop()
             player.hand.append(card)
+            combat_events.card_moved(card, PILE_DRAW, PILE_HAND)
             
             return f"查看了抽牌堆顶部的{view_count}张牌，选择了{card.name}加入手牌!"
             
@@ -458,32 +620,19 @@ class Card:
         return f"给予所有敌人{poison_amount}层中毒!"
         
     @staticmethod
+    @traced('catalog_lookup')
     def get_card_by_id(card_id):
-        """根据ID获取卡牌"""
-        con = duckdb.connect(DB_PATH)
-        result = con.execute(
-            "SELECT * FROM cards WHERE id = ?",
-            [card_id]
-        ).fetchone()
-        con.close()
-        
-        if not result:
+        """根据ID获取一张新的卡牌副本"""
+        card_def = CardDef.get(card_id)
+        if card_def is None:
             return None
-            
-        return Card(
-            id=result[0],
-            name=result[1],
-            card_type=result[2],
-            rarity=result[3],
-            energy_cost=result[4],
-            description=result[5],
-            character_id=result[6],
-            upgraded=False
-        )
+        return Card(card_def)
 
 
 class Orb:
     """充能球类"""
+    __slots__ = ('orb_type', 'passive_value', 'evoke_value')
+    
     def __init__(self, orb_type, passive_value=None, evoke_value=None):
         self.orb_type = orb_type
         
@@ -521,7 +670,7 @@ class Orb:
                 return f"闪电球对 {target.name} 造成 {damage} 点伤害"
         elif self.orb_type == "Frost":
             block = self.passive_value
-            player.block += block
+            player.gain_block(block)
             return f"冰霜球给予 {block} 点格挡"
         return None
     
@@ -535,13 +684,21 @@ class Orb:
                 return f"闪电球被触发，对 {target.name} 造成 {damage} 点伤害"
         elif self.orb_type == "Frost":
             block = self.evoke_value
-            player.block += block
+            player.gain_block(block)
             return f"冰霜球被触发，给予 {block} 点格挡"
         return None
 
 
 class Character:
     """角色类"""
+    __slots__ = ('id', 'name', 'max_hp', 'current_hp', 'gold', 'description',
+                 'energy', 'max_energy', 'block', 'strength', 'dexterity', 'focus', 'effects',
+                 'cards', 'relics', 'potions', 'max_potions',
+                 'draw_pile', 'hand', 'discard_pile', 'exhaust_pile',
+                 'orb_slots', 'orbs', 'double_cast', 'double_cast_count', 'temporary_strength',
+                 'end_turn_heal', 'strength_per_attack', 'next_turn_effects', 'orbs_per_turn',
+                 'current_enemies')
+    
     def __init__(self, id, name, max_hp, starting_gold, description):
         self.id = id
         self.name = name
@@ -554,6 +711,8 @@ class Character:
         self.block = 0
         self.strength = 0
         self.dexterity = 0
+        self.focus = 0  # 集中，影响充能球
+        self.effects = {}  # 状态效果
         self.cards = []
         self.relics = []
         self.potions = []  # 药水列表
@@ -564,7 +723,7 @@ class Character:
         self.exhaust_pile = []
         # 充能球系统
         self.orb_slots = 3
-        self.orbs = []
+        self.orbs = deque()  # 先进先出，最早生成的充能球先被激发
         # 双重施法效果
         self.double_cast = False
         self.double_cast_count = 0
@@ -582,6 +741,8 @@ class Character:
         self.current_enemies = []
 
     @classmethod
+    @traced('catalog_lookup')
+    @db.offloaded
     def load_from_db(cls, character_id):
         """从数据库加载角色"""
         con = duckdb.connect(DB_PATH)
@@ -609,18 +770,10 @@ class Character:
         ).fetchall()
         
         for card_data in cards:
-            card = Card(
-                id=card_data[0],
-                name=card_data[1],
-                card_type=card_data[2],
-                rarity=card_data[3],
-                energy_cost=card_data[4],
-                description=card_data[5],
-                character_id=card_data[6]
-            )
-            # 每张初始卡牌添加5张到牌组
-            for _ in range(5 if card.name == "打击" or card.name == "防御" else 1):
-                character.cards.append(card)
+            card_def = CardDef.from_row(card_data)
+            # 每张初始卡牌添加5张到牌组，每张都是独立的副本
+            for _ in range(5 if card_def.name == "打击" or card_def.name == "防御" else 1):
+                character.cards.append(Card(card_def))
         
         # 加载初始遗物
         relics = con.execute(
@@ -641,6 +794,14 @@ class Character:
         con.close()
         return character
     
+    def find_card(self, card_uid):
+        """根据 uid 在牌组中查找卡牌副本"""
+        card_uid = str(card_uid)
+        for card in self.cards:
+            if card.uid == card_uid:
+                return card
+        return None
+    
     def heal(self, amount):
         """回复生命值"""
         if amount <= 0:
@@ -659,22 +820,40 @@ class Character:
         if actual_damage > 0:
             self.current_hp = max(0, self.current_hp - actual_damage)
         
+        combat_events.record(combat_events.DAMAGE, combat_events.PLAYER, actual_damage, self.current_hp, self.block)
         return actual_damage
     
+    def gain_block(self, amount):
+        """获得格挡"""
+        self.block += amount
+        combat_events.record(combat_events.BLOCK, combat_events.PLAYER, amount, self.block)
+    
     def draw_cards(self, count):
-        """抽取指定数量的卡牌"""
-        for _ in range(count):
-            if not self.draw_pile and not self.discard_pile:
-                break  # 没有牌可抽了
-            
+        """抽取指定数量的卡牌，返回按抽取顺序排列的卡牌列表
+        
+        抽牌堆以列表末尾为牌堆顶，一次切下需要的张数，每张牌的开销与牌堆大小无关
+        """
+        drawn = []
+        while len(drawn) < count:
             if not self.draw_pile:
-                # 重洗弃牌堆
-                self.draw_pile = self.discard_pile
-                self.discard_pile = []
+                if not self.discard_pile:
+                    break  # 没有牌可抽了
+                # 重洗弃牌堆（直接交换列表，不逐张移动）
+                self.draw_pile, self.discard_pile = self.discard_pile, []
                 random.shuffle(self.draw_pile)
-            
-            if self.draw_pile:
-                self.hand.append(self.draw_pile.pop(0))
+                combat_events.record(combat_events.SHUFFLE, len(self.draw_pile))
+            
+            take = min(count - len(drawn), len(self.draw_pile))
+            top = self.draw_pile[-take:]
+            del self.draw_pile[-take:]
+            top.reverse()
+            drawn.extend(top)
+        
+        self.hand.extend(drawn)
+        if combat_events.active():
+            for card in drawn:
+                combat_events.card_moved(card, PILE_DRAW, PILE_HAND)
+        return drawn
     
     def add_orb(self, orb):
         """添加充能球"""
@@ -687,13 +866,18 @@ class Character:
     def evoke_first_orb(self):
         """触发第一个充能球"""
         if self.orbs:
-            orb = self.orbs.pop(0)
+            orb = self.orbs.popleft()
+            combat_events.record(combat_events.EVOKE, orb.orb_type, orb.evoke_value)
             return orb.evoke(self, self.current_enemies)
         return None
 
 
 class Enemy:
     """敌人类"""
+    __slots__ = ('id', 'name', 'max_hp', 'current_hp', 'is_elite', 'is_boss',
+                 'intent_code', 'intent_value', 'block', 'strength', 'poison',
+                 'move_table', 'move', 'move_streak', 'move_turn', 'move_last_used')
+    
     def __init__(self, id, name, hp, is_elite=False, is_boss=False):
         self.id = id
         self.name = name
@@ -701,11 +885,33 @@ class Enemy:
         self.current_hp = hp
         self.is_elite = is_elite
         self.is_boss = is_boss
-        self.intent = "Attack"  # 意图：Attack, Defend, Buff
+        self.intent_code = INTENT_ATTACK  # 意图编码，见 src/intents.py
         self.intent_value = 0   # 意图值（伤害/格挡/增益）
         self.block = 0
         self.strength = 0
         self.poison = 0
+        # 招式状态（由意图引擎维护）
+        self.move_table = None
+        self.move = -1
+        self.move_streak = 0
+        self.move_turn = 0
+        self.move_last_used = None
+    
+    @property
+    def intent(self):
+        """意图名称：Attack, Defend, Buff"""
+        return INTENT_NAMES[self.intent_code]
+    
+    @intent.setter
+    def intent(self, value):
+        self.intent_code = INTENT_CODES[value]
+    
+    @property
+    def move_name(self):
+        """当前招式名称"""
+        if self.move_table is None or self.move < 0:
+            return None
+        return self.move_table.names[self.move]
     
     def to_dict(self):
         """将敌人序列化为字典"""
@@ -720,6 +926,7 @@ class Enemy:
             'isBoss': self.is_boss,
             'intent': self.intent,
             'intentValue': self.intent_value,
+            'move': self.move_name,
             'poison': self.poison
         }
     
@@ -730,25 +937,36 @@ class Enemy:
         
         actual_damage = max(0, amount - self.block)
         self.block = max(0, self.block - amount)
+        was_alive = self.current_hp > 0
         
         if actual_damage > 0:
             self.current_hp = max(0, self.current_hp - actual_damage)
         
+        combat_events.record(combat_events.DAMAGE, self.id, actual_damage, self.current_hp, self.block)
+        if was_alive and self.current_hp == 0:
+            combat_events.record(combat_events.DEATH, self.id)
         return actual_damage
     
+    def gain_block(self, amount):
+        """获得格挡"""
+        self.block += amount
+        combat_events.record(combat_events.BLOCK, self.id, amount, self.block)
+    
     def get_intent_description(self):
         """获取意图描述"""
-        if self.intent == "Attack":
+        if self.intent_code == INTENT_ATTACK:
             return f"攻击 ({self.intent_value})"
-        elif self.intent == "Defend":
+        elif self.intent_code == INTENT_DEFEND:
             return f"防御 ({self.intent_value})"
-        elif self.intent == "Buff":
+        elif self.intent_code == INTENT_BUFF:
             return f"增益 ({self.intent_value})"
         return "未知"
 
 
 class Relic:
     """遗物类"""
+    __slots__ = ('id', 'name', 'rarity', 'description', 'character_id')
+    
     def __init__(self, id, name, rarity, description, character_id=None):
         self.id = id
         self.name = name
@@ -773,6 +991,8 @@ class Relic:
 
 class Potion:
     """药水类"""
+    __slots__ = ('id', 'name', 'rarity', 'description', 'effect_value')
+    
     def __init__(self, id, name, rarity, description, effect_value=0):
         self.id = id
         self.name = name
@@ -822,7 +1042,7 @@ class Potion:
             return f"给予 {target.name} {poison} 层中毒!"
         elif self.name == "烟雾弹":
             block = self.effect_value
-            player.block += block
+            player.gain_block(block)
             return f"获得 {block} 点格挡!"
         elif self.name == "恐惧药水":
             if not targets or len(targets) == 0:
@@ -855,9 +1075,12 @@ class GameState:
         self.current_event = None  # 当前事件
         self.screen = 'map'  # 当前界面
         self.shop_prices = {}  # 商店价格
+        self.map_seed = None  # 地图种子
+        self.card_offers = []  # 本局出现过的卡牌奖励: (卡牌ID, 是否选中)，对局结束时写入 run_card_offers
+        self.combat_turn = 0  # 当前战斗进行到第几回合
     
-    def new_game(self, character_id, player_name):
-        """创建新游戏"""
+    def new_game(self, character_id, player_name, map_seed=None):
+        """创建新游戏（map_seed 为本局地图的种子，随存档保存）"""
         # 加载角色
         self.player = Character.load_from_db(character_id)
         
@@ -866,6 +1089,8 @@ class GameState:
         self.current_enemies = []
         self.in_combat = False
         self.game_over = False
+        self.map_seed = map_seed
+        self.card_offers = []
         
         # 洗牌
         self.player.cards = self.player.cards.copy()
@@ -888,6 +1113,7 @@ class GameState:
     def start_combat(self, enemy_count=1, is_elite=False, is_boss=False):
         """开始战斗"""
         self.in_combat = True
+        self.combat_turn = 1
         
         # 根据当前楼层确定敌人所在的章节
         act = 1
@@ -912,30 +1138,10 @@ class GameState:
         
         return True
     
+    @traced('enemy_intent')
     def _set_enemy_intent(self, enemy):
-        """设置敌人意图"""
-        intents = ["Attack", "Defend", "Buff"]
-        weights = [70, 20, 10]
-        
-        intent = random.choices(intents, weights=weights)[0]
-        enemy.intent = intent
-        
-        if intent == "Attack":
-            if enemy.is_boss:
-                enemy.intent_value = random.randint(15, 25)
-            elif enemy.is_elite:
-                enemy.intent_value = random.randint(10, 18)
-            else:
-                enemy.intent_value = random.randint(5, 12)
-        elif intent == "Defend":
-            if enemy.is_boss:
-                enemy.intent_value = random.randint(12, 20)
-            elif enemy.is_elite:
-                enemy.intent_value = random.randint(8, 15)
-            else:
-                enemy.intent_value = random.randint(5, 10)
-        elif intent == "Buff":
-            enemy.intent_value = random.randint(1, 3)
+        """设置敌人意图（按敌人的招式表选择，见 src/intents.py）"""
+        roll_intent(enemy)
     
     def update_stats(self, stat_name, value=1):
         """更新游戏统计信息"""
@@ -956,523 +1162,32 @@ class GameState:
         
         return False
     
+    @traced('enemy_spawn')
     def get_random_enemy(self, is_elite=False, is_boss=False, act=1):
-        """获取随机敌人"""
-        # 根据不同章节和类型返回不同的敌人
-        if is_boss:
-            if act == 1:
-                return self._create_boss_hexaghost()
-            elif act == 2:
-                return self._create_boss_collector()
-            elif act == 3:
-                return self._create_boss_time_eater()
-            else:
-                return self._create_boss_heart()
-        elif is_elite:
-            if act == 1:
-                elite_types = ["Gremlin Nob", "Lagavulin", "Sentries"]
-            elif act == 2:
-                elite_types = ["Slavers", "Book of Stabbing", "Gremlin Leader"]
-            else:
-                elite_types = ["Giant Head", "Nemesis", "Reptomancer"]
-                
-            elite_type = random.choice(elite_types)
-            return self._create_elite_enemy(elite_type)
-        else:
-            # 普通敌人
-            if act == 1:
-                enemy_types = [
-                    "Cultist", "Jaw Worm", "Louse", "Acid Slime", "Spike Slime", 
-                    "Fungi Beast", "Gremlin Gang"
-                ]
-            elif act == 2:
-                enemy_types = [
-                    "Spheric Guardian", "Chosen", "Byrd", "Snecko", 
-                    "Snake Plant", "Centurion & Mystic", "Shelled Parasite"
-                ]
-            else:
-                enemy_types = [
-                    "Darkling", "Orb Walker", "Spire Growth", "Transient", 
-                    "Writhing Mass", "Maw", "Jaw Worm Horde"
-                ]
-                
-            enemy_type = random.choice(enemy_types)
-            return self._create_normal_enemy(enemy_type)
-    
-    def _create_normal_enemy(self, enemy_type):
-        """创建普通敌人"""
-        enemies = []
+        """获取随机敌人（遭遇定义见 data/encounters.json）"""
+        from src.enemies import get_registry
         
-        if enemy_type == "Cultist":
-            enemy = Enemy(
-                id=1,
-                name="邪教徒",
-                hp=random.randint(45, 50),
-                is_elite=False,
-                is_boss=False
-            )
-            enemy.intent = "Buff"
-            enemy.intent_value = 3
-            enemies.append(enemy)
-            
-        elif enemy_type == "Jaw Worm":
-            enemy = Enemy(
-                id=2,
-                name="颚虫",
-                hp=random.randint(40, 44),
-                is_elite=False,
-                is_boss=False
-            )
-            enemy.strength = 3
-            enemies.append(enemy)
-            
-        elif enemy_type == "Louse":
-            # 50%几率是红色或绿色虱子
-            louse_type = random.choice(["红色", "绿色"])
-            enemy = Enemy(
-                id=3,
-                name=f"{louse_type}虱子",
-                hp=random.randint(10, 15) if louse_type == "绿色" else random.randint(12, 18),
-                is_elite=False,
-                is_boss=False
-            )
-            enemies.append(enemy)
-            
-        elif enemy_type == "Acid Slime":
-            size = random.choice(["小", "中", "大"])
-            hp_range = {"小": (8, 12), "中": (28, 32), "大": (65, 70)}
-            enemy = Enemy(
-                id=4,
-                name=f"{size}型酸液史莱姆",
-                hp=random.randint(*hp_range[size]),
-                is_elite=False,
-                is_boss=False
-            )
-            enemies.append(enemy)
-            
-        elif enemy_type == "Spike Slime":
-            size = random.choice(["小", "中", "大"])
-            hp_range = {"小": (10, 14), "中": (28, 32), "大": (65, 70)}
-            enemy = Enemy(
-                id=5,
-                name=f"{size}型尖刺史莱姆",
-                hp=random.randint(*hp_range[size]),
-                is_elite=False,
-                is_boss=False
-            )
-            enemies.append(enemy)
-            
-        elif enemy_type == "Fungi Beast":
-            enemy = Enemy(
-                id=6,
-                name="真菌兽",
-                hp=random.randint(22, 28),
-                is_elite=False,
-                is_boss=False
-            )
-            enemies.append(enemy)
-            
-        elif enemy_type == "Gremlin Gang":
-            # 随机选择4个不同的小鬼
-            gremlin_types = ["疯狂", "盗贼", "胖", "巫师", "护盾"]
-            selected_gremlins = random.sample(gremlin_types, min(4, len(gremlin_types)))
-            
-            for i, gremlin_type in enumerate(selected_gremlins):
-                hp_range = {
-                    "疯狂": (20, 24),
-                    "盗贼": (10, 14),
-                    "胖": (14, 18),
-                    "巫师": (10, 14),
-                    "护盾": (12, 15)
-                }
-                enemy = Enemy(
-                    id=7 + i,
-                    name=f"{gremlin_type}小鬼",
-                    hp=random.randint(*hp_range[gremlin_type]),
-                    is_elite=False,
-                    is_boss=False
-                )
-                enemies.append(enemy)
-                
-        elif enemy_type == "Spheric Guardian":
-            enemy = Enemy(
-                id=11,
-                name="球形守卫",
-                hp=random.randint(60, 65),
-                is_elite=False,
-                is_boss=False
-            )
-            enemies.append(enemy)
-            
-        elif enemy_type == "Chosen":
-            enemy = Enemy(
-                id=12,
-                name="天选者",
-                hp=random.randint(95, 103),
-                is_elite=False,
-                is_boss=False
-            )
-            enemies.append(enemy)
-            
-        elif enemy_type == "Byrd":
-            # 随机1-3只飞鸟
-            num_byrds = random.randint(1, 3)
-            for i in range(num_byrds):
-                enemy = Enemy(
-                    id=13 + i,
-                    name="飞鸟",
-                    hp=random.randint(25, 29),
-                    is_elite=False,
-                    is_boss=False
-                )
-                enemies.append(enemy)
-                
-        elif enemy_type == "Snecko":
-            enemy = Enemy(
-                id=16,
-                name="异蛇",
-                hp=random.randint(114, 120),
-                is_elite=False,
-                is_boss=False
-            )
-            enemies.append(enemy)
-            
-        elif enemy_type == "Snake Plant":
-            enemy = Enemy(
-                id=17,
-                name="蛇形草",
-                hp=random.randint(75, 82),
-                is_elite=False,
-                is_boss=False
-            )
-            enemies.append(enemy)
-            
-        elif enemy_type == "Centurion & Mystic":
-            enemy1 = Enemy(
-                id=18,
-                name="百夫长",
-                hp=random.randint(76, 80),
-                is_elite=False,
-                is_boss=False
-            )
-            enemy2 = Enemy(
-                id=19,
-                name="秘术师",
-                hp=random.randint(48, 52),
-                is_elite=False,
-                is_boss=False
-            )
-            enemies.extend([enemy1, enemy2])
-            
-        elif enemy_type == "Shelled Parasite":
-            enemy = Enemy(
-                id=20,
-                name="硬壳寄生虫",
-                hp=random.randint(68, 72),
-                is_elite=False,
-                is_boss=False
-            )
-            enemies.append(enemy)
-            
-        elif enemy_type == "Darkling":
-            # 随机2-3只暗黑物
-            num_darklings = random.randint(2, 3)
-            for i in range(num_darklings):
-                enemy = Enemy(
-                    id=21 + i,
-                    name="暗黑物",
-                    hp=random.randint(48, 52),
-                    is_elite=False,
-                    is_boss=False
-                )
-                enemies.append(enemy)
-                
-        elif enemy_type == "Orb Walker":
-            enemy = Enemy(
-                id=24,
-                name="球体行者",
-                hp=random.randint(90, 96),
-                is_elite=False,
-                is_boss=False
-            )
-            enemies.append(enemy)
-            
-        elif enemy_type == "Spire Growth":
-            enemy = Enemy(
-                id=25,
-                name="尖塔滋长物",
-                hp=random.randint(170, 175),
-                is_elite=False,
-                is_boss=False
-            )
-            enemies.append(enemy)
-            
-        elif enemy_type == "Transient":
-            enemy = Enemy(
-                id=26,
-                name="瞬身人",
-                hp=999,  # 特殊敌人，几回合后会消失
-                is_elite=False,
-                is_boss=False
-            )
-            enemies.append(enemy)
-            
-        elif enemy_type == "Writhing Mass":
-            enemy = Enemy(
-                id=27,
-                name="蠕动之物",
-                hp=random.randint(160, 165),
-                is_elite=False,
-                is_boss=False
-            )
-            enemies.append(enemy)
-            
-        elif enemy_type == "Maw":
-            enemy = Enemy(
-                id=28,
-                name="巨口",
-                hp=random.randint(300, 305),
-                is_elite=False,
-                is_boss=False
-            )
-            enemies.append(enemy)
-            
-        elif enemy_type == "Jaw Worm Horde":
-            # 3只颚虫
-            for i in range(3):
-                enemy = Enemy(
-                    id=29 + i,
-                    name="颚虫",
-                    hp=random.randint(40, 44),
-                    is_elite=False,
-                    is_boss=False
-                )
-                enemy.strength = 3
-                enemies.append(enemy)
+        pool = 'boss' if is_boss else 'elite' if is_elite else 'normal'
+        enemies = get_registry().spawn(pool, act)
         
-        # 为每个敌人设置意图
+        # 按招式表设置第一回合的意图
         for enemy in enemies:
-            if not enemy.intent:
-                self._set_enemy_intent(enemy)
+            self._set_enemy_intent(enemy)
                 
         return enemies
     
-    def _create_elite_enemy(self, elite_type):
-        """创建精英敌人"""
-        enemies = []
-        
-        if elite_type == "Gremlin Nob":
-            enemy = Enemy(
-                id=32,
-                name="小鬼头目",
-                hp=random.randint(82, 86),
-                is_elite=True,
-                is_boss=False
-            )
-            enemy.strength = 2
-            enemies.append(enemy)
-            
-        elif elite_type == "Lagavulin":
-            enemy = Enemy(
-                id=33,
-                name="拉加弗林",
-                hp=random.randint(109, 112),
-                is_elite=True,
-                is_boss=False
-            )
-            enemies.append(enemy)
-            
-        elif elite_type == "Sentries":
-            # 3个哨卫
-            for i in range(3):
-                enemy = Enemy(
-                    id=34 + i,
-                    name="哨卫",
-                    hp=random.randint(38, 42),
-                    is_elite=True,
-                    is_boss=False
-                )
-                enemies.append(enemy)
-                
-        elif elite_type == "Slavers":
-            # 蓝色、红色和任务奴隶主
-            enemy1 = Enemy(
-                id=37,
-                name="蓝色奴隶主",
-                hp=random.randint(46, 50),
-                is_elite=True,
-                is_boss=False
-            )
-            enemy2 = Enemy(
-                id=38,
-                name="红色奴隶主",
-                hp=random.randint(54, 58),
-                is_elite=True,
-                is_boss=False
-            )
-            enemy3 = Enemy(
-                id=39,
-                name="任务奴隶主",
-                hp=random.randint(48, 52),
-                is_elite=True,
-                is_boss=False
-            )
-            enemies.extend([enemy1, enemy2, enemy3])
-            
-        elif elite_type == "Book of Stabbing":
-            enemy = Enemy(
-                id=40,
-                name="刺击之书",
-                hp=random.randint(160, 170),
-                is_elite=True,
-                is_boss=False
-            )
-            enemies.append(enemy)
-            
-        elif elite_type == "Gremlin Leader":
-            # 小鬼首领和两个随机小鬼
-            leader = Enemy(
-                id=41,
-                name="小鬼首领",
-                hp=random.randint(140, 148),
-                is_elite=True,
-                is_boss=False
-            )
-            enemies.append(leader)
-            
-            gremlin_types = ["疯狂", "盗贼", "胖", "巫师", "护盾"]
-            selected_gremlins = random.sample(gremlin_types, 2)
-            
-            for i, gremlin_type in enumerate(selected_gremlins):
-                hp_range = {
-                    "疯狂": (20, 24),
-                    "盗贼": (10, 14),
-                    "胖": (14, 18),
-                    "巫师": (10, 14),
-                    "护盾": (12, 15)
-                }
-                enemy = Enemy(
-                    id=42 + i,
-                    name=f"{gremlin_type}小鬼",
-                    hp=random.randint(*hp_range[gremlin_type]),
-                    is_elite=True,
-                    is_boss=False
-                )
-                enemies.append(enemy)
-                
-        elif elite_type == "Giant Head":
-            enemy = Enemy(
-                id=44,
-                name="巨型头颅",
-                hp=random.randint(500, 520),
-                is_elite=True,
-                is_boss=False
-            )
-            enemies.append(enemy)
-            
-        elif elite_type == "Nemesis":
-            enemy = Enemy(
-                id=45,
-                name="复仇女神",
-                hp=random.randint(185, 200),
-                is_elite=True,
-                is_boss=False
-            )
-            enemies.append(enemy)
-            
-        elif elite_type == "Reptomancer":
-            # 爬行法师和两个飞刀
-            enemy1 = Enemy(
-                id=46,
-                name="爬行法师",
-                hp=random.randint(180, 190),
-                is_elite=True,
-                is_boss=False
-            )
-            enemies.append(enemy1)
-            
-            for i in range(2):
-                enemy = Enemy(
-                    id=47 + i,
-                    name="飞刀",
-                    hp=random.randint(20, 25),
-                    is_elite=True,
-                    is_boss=False
-                )
-                enemies.append(enemy)
-        
-        # 为每个敌人设置意图
-        for enemy in enemies:
-            if not enemy.intent:
-                self._set_enemy_intent(enemy)
-                
-        return enemies
-    
-    def _create_boss_hexaghost(self):
-        """创建第一章Boss：六火亡魂"""
-        enemy = Enemy(
-            id=49,
-            name="六火亡魂",
-            hp=random.randint(250, 260),
-            is_elite=False,
-            is_boss=True
-        )
-        enemy.intent = "Attack"
-        enemy.intent_value = 6 * 2  # 6次2点伤害
-        
-        return [enemy]
-    
-    def _create_boss_collector(self):
-        """创建第二章Boss：收藏家"""
-        enemy = Enemy(
-            id=50,
-            name="收藏家",
-            hp=random.randint(282, 300),
-            is_elite=False,
-            is_boss=True
-        )
-        enemy.intent = "Attack"
-        enemy.intent_value = 18
-        
-        return [enemy]
-    
-    def _create_boss_time_eater(self):
-        """创建第三章Boss：时间吞噬者"""
-        enemy = Enemy(
-            id=51,
-            name="时间吞噬者",
-            hp=random.randint(456, 480),
-            is_elite=False,
-            is_boss=True
-        )
-        enemy.intent = "Attack"
-        enemy.intent_value = 25
-        
-        return [enemy]
-    
-    def _create_boss_heart(self):
-        """创建最终Boss：腐化之心"""
-        enemy = Enemy(
-            id=52,
-            name="腐化之心",
-            hp=random.randint(750, 800),
-            is_elite=False,
-            is_boss=True
-        )
-        enemy.intent = "Attack"
-        enemy.intent_value = 40
-        
-        return [enemy]
-    
     @classmethod
+    @traced('duckdb.load_game')
+    @db.offloaded
     def load_game(cls, player_name):
         """从数据库加载游戏状态"""
         con = duckdb.connect(DB_PATH)
+        upgrade_saves_table(con)
         
         # 获取存档
         save = con.execute(
             """
-            SELECT id, player_name, character_id, current_hp, max_hp, gold, floor
+            SELECT id, player_name, character_id, current_hp, max_hp, gold, floor, map_seed
             FROM saves 
             WHERE player_name = ?
             ORDER BY updated_at DESC
@@ -1494,11 +1209,12 @@ class GameState:
         game_state.player.max_hp = save[4]
         game_state.player.gold = save[5]
         game_state.floor = save[6]
+        game_state.map_seed = save[7]
         
         # 加载卡组
         cards = con.execute(
             """
-            SELECT c.id, c.name, c.type, c.rarity, c.energy_cost, c.description, c.character_id, pc.upgraded
+            SELECT c.id, c.name, c.card_type, c.rarity, c.energy_cost, c.description, c.character_id, pc.upgraded
             FROM player_cards pc
             JOIN cards c ON pc.card_id = c.id
             WHERE pc.save_id = ?
@@ -1508,17 +1224,7 @@ class GameState:
         
         game_state.player.cards = []
         for card_data in cards:
-            card = Card(
-                id=card_data[0],
-                name=card_data[1],
-                card_type=card_data[2],
-                rarity=card_data[3],
-                energy_cost=card_data[4],
-                description=card_data[5],
-                character_id=card_data[6],
-                upgraded=card_data[7]
-            )
-            game_state.player.cards.append(card)
+            game_state.player.cards.append(Card.from_row(card_data, upgraded=card_data[7]))
         
         # 加载遗物
         relics = con.execute(
@@ -1567,6 +1273,8 @@ class GameState:
         con.close()
         return game_state
     
+    @traced('duckdb.save_game')
+    @db.offloaded
     def save_game(self, player_name):
         """保存游戏状态到数据库"""
         if not self.player:
@@ -1574,6 +1282,9 @@ class GameState:
         
         try:
             con = duckdb.connect(DB_PATH)
+            upgrade_saves_table(con)
+            # 整个存档在一个事务中写入，分析副本（src/replica.py）不会读到只写了一半的存档
+            con.execute("BEGIN TRANSACTION")
             
             # 检查是否已有存档
             existing_save = con.execute(
@@ -1582,19 +1293,15 @@ class GameState:
             ).fetchone()
             
             # 创建新存档，不更新旧存档
-            # 这样可以避免外键约束问题
-            con.execute(
+            # 这样可以避免外键约束问题；新存档的ID直接由 RETURNING 返回
+            save_id = con.execute(
                 """
-                INSERT INTO saves (player_name, character_id, current_hp, max_hp, gold, floor, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+                INSERT INTO saves (player_name, character_id, current_hp, max_hp, gold, floor, map_seed, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+                RETURNING id
                 """,
-                [player_name, self.player.id, self.player.current_hp, self.player.max_hp, self.player.gold, self.floor]
-            )
-            
-            # 获取新创建的存档ID
-            save_id = con.execute(
-                "SELECT id FROM saves WHERE player_name = ? ORDER BY created_at DESC LIMIT 1",
-                [player_name]
+                [player_name, self.player.id, self.player.current_hp, self.player.max_hp, self.player.gold, self.floor,
+                 self.map_seed]
             ).fetchone()[0]
             
             # 保存卡组
@@ -1627,6 +1334,7 @@ class GameState:
                     [save_id, potion.id]
                 )
             
+            con.execute("COMMIT")
             con.close()
             return True
         except Exception as e:
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""整数数组牌堆（用于高频模拟）
+
+Character 上的牌堆是卡牌对象的列表，适合游戏逻辑但不适合大量模拟。
+这里的牌堆只保存卡牌副本在卡牌表中的下标，底层为 array('H')：
+    - 牌堆顶在数组末尾，抽一张牌为 O(1)
+    - 洗牌为原地 Fisher-Yates，使用传入的随机数生成器（对局的 RNG）
+    - 安装了 NumPy 时可以零拷贝地得到 numpy.uint16 视图
+
+PileSet 负责与 Character 之间的转换：from_character() 把对象牌堆转成下标牌堆，
+apply_to() 再写回，原有的 API 不受影响。
+"""
+import random
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 是可选依赖
+    np = None
+
+# array('H') 能表示的最大下标
+MAX_CARDS = 0xFFFF
+
+
+class IndexPile:
+    """卡牌下标牌堆，牌堆顶在末尾"""
+    __slots__ = ('data',)
+
+    def __init__(self, indices=()):
+        self.data = array('H', indices)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __bool__(self):
+        return len(self.data) > 0
+
+    def __iter__(self):
+        """从牌堆顶到牌堆底遍历"""
+        return reversed(self.data)
+
+    def push(self, index):
+        """放到牌堆顶"""
+        self.data.append(index)
+
+    def extend(self, indices):
+        """依次放到牌堆顶（最后一个在最上面）"""
+        self.data.extend(indices)
+
+    def pop(self):
+        """从牌堆顶取一张"""
+        return self.data.pop()
+
+    def draw(self, count):
+        """从牌堆顶取最多 count 张，按抽取顺序返回"""
+        count = min(count, len(self.data))
+        if count <= 0:
+            return array('H')
+        drawn = self.data[-count:]
+        del self.data[-count:]
+        drawn.reverse()
+        return drawn
+
+    def take_all(self):
+        """取出全部下标并清空牌堆（保持数组顺序）"""
+        data = self.data
+        self.data = array('H')
+        return data
+
+    def clear(self):
+        del self.data[:]
+
+    def shuffle(self, rng=random):
+        """原地 Fisher-Yates 洗牌"""
+        data = self.data
+        rand = rng.random
+        for i in range(len(data) - 1, 0, -1):
+            j = int(rand() * (i + 1))
+            data[i], data[j] = data[j], data[i]
+
+    def as_numpy(self):
+        """与底层数组共享内存的 numpy.uint16 视图（需要 NumPy）"""
+        if np is None:
+            raise ImportError("as_numpy() 需要安装 numpy")
+        return np.frombuffer(self.data, dtype=np.uint16)
+
+
+class PileSet:
+    """一名角色的全部牌堆（抽牌堆、手牌、弃牌堆、消耗堆）的下标表示"""
+    __slots__ = ('cards', '_index', 'draw_pile', 'hand', 'discard_pile', 'exhaust_pile')
+
+    def __init__(self, cards=()):
+        # 卡牌表：下标 -> 卡牌副本
+        self.cards = []
+        self._index = {}
+        for card in cards:
+            self.index_of(card)
+        self.draw_pile = IndexPile()
+        self.hand = IndexPile()
+        self.discard_pile = IndexPile()
+        self.exhaust_pile = IndexPile()
+
+    def index_of(self, card):
+        """卡牌副本在卡牌表中的下标，不在表中时追加"""
+        index = self._index.get(id(card))
+        if index is None:
+            index = len(self.cards)
+            if index > MAX_CARDS:
+                raise OverflowError(f"卡牌表超过 {MAX_CARDS + 1} 张")
+            self.cards.append(card)
+            self._index[id(card)] = index
+        return index
+
+    @classmethod
+    def from_character(cls, player):
+        """根据角色当前的对象牌堆构造（两者都以末尾为牌堆顶）"""
+        piles = cls(player.cards)
+        index_of = piles.index_of
+        piles.draw_pile.extend(index_of(card) for card in player.draw_pile)
+        piles.hand.extend(index_of(card) for card in player.hand)
+        piles.discard_pile.extend(index_of(card) for card in player.discard_pile)
+        piles.exhaust_pile.extend(index_of(card) for card in player.exhaust_pile)
+        return piles
+
+    def apply_to(self, player):
+        """把下标牌堆写回角色的对象牌堆"""
+        cards = self.cards
+        player.draw_pile = [cards[i] for i in self.draw_pile.data]
+        player.hand = [cards[i] for i in self.hand.data]
+        player.discard_pile = [cards[i] for i in self.discard_pile.data]
+        player.exhaust_pile = [cards[i] for i in self.exhaust_pile.data]
+
+    def draw_cards(self, count, rng=random):
+        """抽 count 张牌到手牌，抽牌堆空时重洗弃牌堆；返回抽到的下标"""
+        drawn = self.draw_pile.draw(count)
+        while len(drawn) < count and self.discard_pile:
+            self.draw_pile.extend(self.discard_pile.take_all())
+            self.draw_pile.shuffle(rng)
+            drawn.extend(self.draw_pile.draw(count - len(drawn)))
+        self.hand.extend(drawn)
+        return drawn
+
+    def discard_hand(self):
+        """手牌全部进入弃牌堆"""
+        self.discard_pile.extend(self.hand.take_all())
+
+    def exhaust(self, index):
+        """从手牌中消耗一张牌"""
+        self.hand.data.remove(index)
+        self.exhaust_pile.push(index)
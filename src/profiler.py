@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""按需性能剖析
+
+两种模式:
+    cprofile  在每个玩家操作期间启用 cProfile，输出 pstats 文本（或原始 .prof 数据）
+    sample    启动一个真正的操作系统线程，定时采样 eventlet 主线程的调用栈，
+              输出 flamegraph.pl / speedscope 可直接使用的折叠栈（collapsed stack）格式
+
+剖析在 N 秒后或 N 个操作后自动结束。没有剖析在进行时，
+profile_action() 只做一次全局变量判断，不产生额外开销。
+
+注意: 剖析状态保存在进程内。gunicorn 每个 worker 进程各自独立，
+当前部署使用 -w 1，因此一次剖析即覆盖整个服务。
+"""
+import io
+import os
+import sys
+import time
+import marshal
+import pstats
+import cProfile
+from collections import Counter
+
+from src.eventlet_compat import original
+
+_threading = original('threading')
+_time = original('time')
+
+MODES = ('cprofile', 'sample')
+
+# 默认和最长剖析时间（秒），默认采样间隔（秒）
+DEFAULT_SECONDS = 10
+MAX_SECONDS = 120
+DEFAULT_INTERVAL = 0.005
+
+# 当前正在进行的剖析，以及最近一次完成的剖析
+_active = None
+_last = None
+_lock = _threading.Lock()
+
+
+class ProfileCapture:
+    """一次剖析"""
+
+    def __init__(self, mode='cprofile', seconds=None, actions=None, interval=DEFAULT_INTERVAL):
+        if mode not in MODES:
+            raise ValueError(f"未知的剖析模式: {mode}")
+        if seconds is None and actions is None:
+            seconds = DEFAULT_SECONDS
+        if seconds is not None:
+            seconds = min(float(seconds), MAX_SECONDS)
+        self.mode = mode
+        self.seconds = seconds
+        self.actions = actions
+        self.interval = interval
+        self.started_at = time.time()
+        self.deadline = time.monotonic() + seconds if seconds is not None else None
+        self.finished_at = None
+        self.action_count = 0
+        self.sample_count = 0
+        self.profiler = cProfile.Profile() if mode == 'cprofile' else None
+        self.stacks = Counter()
+        self._depth = 0
+        self._stop = _threading.Event()
+        self._thread = None
+
+    @property
+    def finished(self):
+        return self.finished_at is not None
+
+    def expired(self):
+        """是否已达到时间或操作次数上限"""
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return True
+        if self.actions is not None and self.action_count >= self.actions:
+            return True
+        return False
+
+    def start(self):
+        """开始剖析"""
+        if self.mode == 'sample':
+            target = _threading.get_ident()
+            self._thread = _threading.Thread(
+                target=self._sample_loop, args=(target,), name='profiler-sampler', daemon=True
+            )
+            self._thread.start()
+
+    def finish(self):
+        """结束剖析"""
+        if self.finished:
+            return
+        self.finished_at = time.time()
+        self._stop.set()
+        if self._thread is not None and self._thread is not _threading.current_thread():
+            self._thread.join(timeout=1)
+
+    def enter_action(self):
+        """进入一个玩家操作"""
+        if self.profiler is not None:
+            if self._depth == 0:
+                self.profiler.enable()
+            self._depth += 1
+
+    def exit_action(self):
+        """离开一个玩家操作"""
+        if self.profiler is not None:
+            self._depth -= 1
+            if self._depth == 0:
+                self.profiler.disable()
+        self.action_count += 1
+
+    def _sample_loop(self, target):
+        """采样线程：定时记录目标线程的调用栈"""
+        while not self._stop.is_set():
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                break
+            frame = sys._current_frames().get(target)
+            if frame is not None:
+                self.stacks[_collapse(frame)] += 1
+                self.sample_count += 1
+            _time.sleep(self.interval)
+        self._stop.set()
+
+    def status(self):
+        """剖析状态"""
+        return {
+            'mode': self.mode,
+            'seconds': self.seconds,
+            'actions': self.actions,
+            'startedAt': self.started_at,
+            'finishedAt': self.finished_at,
+            'finished': self.finished,
+            'actionCount': self.action_count,
+            'sampleCount': self.sample_count
+        }
+
+    def text(self, sort='cumulative', limit=50):
+        """文本结果：cprofile 模式为 pstats 报表，sample 模式为折叠栈"""
+        if self.mode == 'sample':
+            return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+        out = io.StringIO()
+        try:
+            stats = pstats.Stats(self.profiler, stream=out)
+        except TypeError:
+            # 没有采集到任何数据
+            return "没有采集到数据\n"
+        stats.sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+    def raw(self):
+        """原始 pstats 数据（可保存为 .prof 用 snakeviz 等工具查看）"""
+        if self.profiler is None:
+            return None
+        self.profiler.create_stats()
+        return marshal.dumps(self.profiler.stats)
+
+
+def _collapse(frame):
+    """将调用栈折叠为 a;b;c 格式（根在前）"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    names.reverse()
+    return ';'.join(names)
+
+
+class _NoopAction:
+    """没有剖析时使用的空操作上下文"""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopAction()
+
+
+class _ProfiledAction:
+    """剖析中的一个玩家操作"""
+
+    def __init__(self, capture):
+        self.capture = capture
+
+    def __enter__(self):
+        self.capture.enter_action()
+        return self.capture
+
+    def __exit__(self, exc_type, exc, tb):
+        self.capture.exit_action()
+        if self.capture.expired():
+            stop()
+        return False
+
+
+def profile_action():
+    """包住一个玩家操作；没有剖析在进行时返回空操作对象"""
+    capture = _active
+    if capture is None:
+        return _NOOP
+    if capture.expired():
+        stop()
+        return _NOOP
+    return _ProfiledAction(capture)
+
+
+def start(mode='cprofile', seconds=None, actions=None, interval=DEFAULT_INTERVAL):
+    """开始一次剖析；已有剖析在进行时返回 None"""
+    global _active
+    with _lock:
+        if _active is not None and not _active.expired():
+            return None
+        if _active is not None:
+            _finish_locked()
+        capture = ProfileCapture(mode, seconds=seconds, actions=actions, interval=interval)
+        capture.start()
+        _active = capture
+        return capture
+
+
+def stop():
+    """立即结束当前剖析，返回结束的剖析"""
+    with _lock:
+        return _finish_locked()
+
+
+def _finish_locked():
+    global _active, _last
+    capture = _active
+    if capture is None:
+        return None
+    capture.finish()
+    _active = None
+    _last = capture
+    return capture
+
+
+def current():
+    """当前剖析（如已超时则先结束它），没有时返回最近一次完成的剖析"""
+    capture = _active
+    if capture is not None and capture.expired():
+        stop()
+    return _active or _last
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""游戏数据库的只读分析副本
+
+view_db.py 和统计类查询如果直接打开 data/slay_the_spire.db，会和游戏服务器争抢数据库文件锁。
+snapshot() 在一个读事务中把存档和目录表复制到独立的 DuckDB 文件（先写临时文件，完成后原子替换），
+分析查询只通过 connect() / query() 以只读方式打开副本，不再接触主库。
+
+副本中的 replica_info 表记录快照时间和各表行数。app.py 按 REPLICA_INTERVAL 定期刷新副本。
+
+通过环境变量配置:
+    STS_REPLICA_PATH    副本路径，默认为主库旁的 slay_the_spire.replica.db
+    REPLICA_INTERVAL    app.py 刷新副本的间隔（秒），0 表示不刷新，默认 300
+"""
+import os
+import time
+import logging
+
+import duckdb
+
+from src.models import DB_PATH
+from src.eventlet_compat import original
+
+logger = logging.getLogger(__name__)
+
+REPLICA_PATH = os.environ.get('STS_REPLICA_PATH', os.path.splitext(DB_PATH)[0] + '.replica.db')
+
+# 复制到副本的表（主库中不存在的表跳过）
+REPLICA_TABLES = [
+    'characters', 'cards', 'relics', 'potions', 'enemies', 'events',
+    'saves', 'player_cards', 'player_relics', 'player_potions',
+    'runs', 'run_card_offers', 'character_run_stats', 'card_pick_stats', 'leaderboard_entries'
+]
+
+
+# 定期刷新与手动刷新可能同时在不同的工作线程中执行，同一时间只做一次快照
+_snapshot_lock = original('threading').Lock()
+
+
+def sql_string(value):
+    """SQL 字符串字面量（ATTACH 不支持参数绑定）"""
+    return "'" + value.replace("'", "''") + "'"
+
+
+def snapshot(source=DB_PATH, dest=REPLICA_PATH, tables=None):
+    """把主库中的表复制到副本，返回各表的行数"""
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"数据库不存在: {source}")
+    tables = REPLICA_TABLES if tables is None else tables
+    with _snapshot_lock:
+        return _snapshot(source, dest, tables)
+
+
+def _snapshot(source, dest, tables):
+    tmp_path = dest + '.tmp'
+    for path in (tmp_path, tmp_path + '.wal'):
+        if os.path.exists(path):
+            os.remove(path)
+
+    started = time.perf_counter()
+    con = duckdb.connect(source)
+    counts = {}
+    try:
+        existing = {row[0] for row in con.execute(
+            "SELECT table_name FROM information_schema.tables WHERE table_catalog = current_database()"
+        ).fetchall()}
+        con.execute(f"ATTACH {sql_string(tmp_path)} AS replica")
+        try:
+            # 所有表在同一个事务中读取，副本是主库某一时刻的一致快照
+            con.execute("BEGIN TRANSACTION")
+            try:
+                for table in tables:
+                    if table not in existing:
+                        continue
+                    con.execute(f"CREATE TABLE replica.{table} AS SELECT * FROM main.{table}")
+                    counts[table] = con.execute(f"SELECT COUNT(*) FROM replica.{table}").fetchone()[0]
+                con.execute("CREATE TABLE replica.replica_info (table_name VARCHAR, row_count BIGINT, snapshot_at TIMESTAMP)")
+                con.executemany("INSERT INTO replica.replica_info VALUES (?, ?, CURRENT_TIMESTAMP)", list(counts.items()))
+                con.execute("COMMIT")
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+        finally:
+            # 进程内连接主库的都是同一个数据库实例，副本必须分离，否则下次无法再次 ATTACH
+            # （DuckDB 0.9 不支持 DETACH DATABASE IF EXISTS，且 DETACH 后不加引号的 replica 是语法错误）
+            con.execute('DETACH "replica"')
+    finally:
+        con.close()
+
+    os.replace(tmp_path, dest)
+    logger.info("分析副本已刷新: %s (%s 张表, %.3f 秒)", dest, len(counts), time.perf_counter() - started)
+    return counts
+
+
+def connect(path=REPLICA_PATH):
+    """以只读方式打开副本；副本不存在时抛出 FileNotFoundError"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"分析副本不存在: {path}")
+    return duckdb.connect(path, read_only=True)
+
+
+def query(sql, params=None, path=REPLICA_PATH):
+    """在副本上执行一条查询，返回 (列名, 行)"""
+    con = connect(path)
+    try:
+        cursor = con.execute(sql, params or [])
+        columns = [col[0] for col in cursor.description]
+        return columns, cursor.fetchall()
+    finally:
+        con.close()
+
+
+def info(path=REPLICA_PATH):
+    """副本的快照时间和各表行数；副本不存在时返回 None"""
+    if not os.path.exists(path):
+        return None
+    _, rows = query("SELECT table_name, row_count, snapshot_at FROM replica_info", path=path)
+    return {
+        'path': path,
+        'snapshotAt': rows[0][2].isoformat() if rows else None,
+        'tables': {name: count for name, count, _ in rows}
+    }
+
+
+def run(sleep, interval, refresh=snapshot):
+    """后台任务：每隔 interval 秒刷新一次副本，sleep 为 socketio.sleep"""
+    while True:
+        try:
+            refresh()
+        except Exception as e:
+            logger.error("刷新分析副本失败: %s", e, exc_info=True)
+        sleep(interval)
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""对局历史与统计
+
+每局游戏结束（玩家死亡或击败Boss）时记录一行到 runs 事实表：角色、地图种子、到达楼层、
+死因、最终牌组与遗物、GameState.stats 中累计的统计；卡牌奖励的每次出现和是否被选中记录到
+run_card_offers。结束的对局先进入内存缓冲区，flush() 在一个事务中批量写入。
+
+统计表相当于物化视图，按 runs.id 水位增量刷新（每次只聚合水位之后的新对局）:
+    character_run_stats   每个角色的对局数、胜场、楼层总和、最高楼层
+    card_pick_stats       每个角色每张卡牌作为奖励出现的次数和被选中的次数
+
+统计查询（character_stats / card_pick_rates）读取分析副本（src/replica.py），结果缓存到副本下次刷新为止。
+
+通过环境变量配置（见 app.py）:
+    RUNS_FLUSH_INTERVAL   app.py 批量写入的间隔（秒），默认 5；命令行版对局结束时立即写入
+"""
+import os
+import json
+import logging
+
+import duckdb
+
+from src import db
+from src.models import DB_PATH
+from src.eventlet_compat import original
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = [
+    "CREATE SEQUENCE IF NOT EXISTS runs_id_seq START 1",
+    """
+    CREATE TABLE IF NOT EXISTS runs (
+        id INTEGER PRIMARY KEY DEFAULT nextval('runs_id_seq'),
+        player_name VARCHAR NOT NULL,
+        character_id INTEGER NOT NULL,
+        map_seed BIGINT,
+        floor_reached INTEGER NOT NULL,
+        victory BOOLEAN NOT NULL,
+        cause_of_death VARCHAR, -- 击败玩家的敌人，胜利时为空
+        gold INTEGER NOT NULL,
+        max_hp INTEGER NOT NULL,
+        deck INTEGER[] NOT NULL, -- 最终牌组的卡牌ID
+        upgraded_cards INTEGER NOT NULL,
+        relics INTEGER[] NOT NULL,
+        stats VARCHAR, -- JSON格式的 GameState.stats
+        ended_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS run_card_offers (
+        run_id INTEGER NOT NULL,
+        card_id INTEGER NOT NULL,
+        picked BOOLEAN NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS character_run_stats (
+        character_id INTEGER PRIMARY KEY,
+        runs BIGINT NOT NULL,
+        wins BIGINT NOT NULL,
+        floor_sum BIGINT NOT NULL,
+        max_floor INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS card_pick_stats (
+        character_id INTEGER NOT NULL,
+        card_id INTEGER NOT NULL,
+        offered BIGINT NOT NULL,
+        picked BIGINT NOT NULL,
+        PRIMARY KEY (character_id, card_id)
+    )
+    """,
+    # 统计表已经聚合到的 runs.id
+    "CREATE TABLE IF NOT EXISTS run_stats_watermark (last_run_id INTEGER NOT NULL)"
+]
+
+def create_tables(con):
+    """创建对局历史和统计表（已存在时跳过）"""
+    for statement in SCHEMA:
+        con.execute(statement)
+    if con.execute("SELECT COUNT(*) FROM run_stats_watermark").fetchone()[0] == 0:
+        con.execute("INSERT INTO run_stats_watermark VALUES (0)")
+
+
+def refresh_stats(con):
+    """把水位之后的新对局聚合进统计表，返回新聚合的对局数"""
+    watermark = con.execute("SELECT last_run_id FROM run_stats_watermark").fetchone()[0]
+    latest, count = con.execute("SELECT MAX(id), COUNT(*) FROM runs WHERE id > ?", [watermark]).fetchone()
+    if not count:
+        return 0
+    con.execute(
+        """
+        INSERT INTO character_run_stats
+        SELECT character_id, COUNT(*), COUNT(*) FILTER (WHERE victory), SUM(floor_reached), MAX(floor_reached)
+        FROM runs WHERE id > ? AND id <= ?
+        GROUP BY character_id
+        ON CONFLICT (character_id) DO UPDATE SET
+            runs = runs + EXCLUDED.runs,
+            wins = wins + EXCLUDED.wins,
+            floor_sum = floor_sum + EXCLUDED.floor_sum,
+            max_floor = greatest(max_floor, EXCLUDED.max_floor)
+        """,
+        [watermark, latest]
+    )
+    con.execute(
+        """
+        INSERT INTO card_pick_stats
+        SELECT r.character_id, o.card_id, COUNT(*), COUNT(*) FILTER (WHERE o.picked)
+        FROM run_card_offers o JOIN runs r ON r.id = o.run_id
+        WHERE o.run_id > ? AND o.run_id <= ?
+        GROUP BY r.character_id, o.card_id
+        ON CONFLICT (character_id, card_id) DO UPDATE SET
+            offered = offered + EXCLUDED.offered,
+            picked = picked + EXCLUDED.picked
+        """,
+        [watermark, latest]
+    )
+    con.execute("UPDATE run_stats_watermark SET last_run_id = ?", [latest])
+    return count
+
+
+# --- 写入 ---
+
+_pending = []
+_flush_lock = original('threading').Lock()
+_config = {'buffered': False}
+
+
+def configure(buffered):
+    """buffered 为 True 时对局结束只进入缓冲区，由调用方定期 flush()（app.py）"""
+    _config['buffered'] = buffered
+
+
+def record(game_state, player_name, victory, cause_of_death=None):
+    """记录一局结束的游戏"""
+    player = game_state.player
+    _pending.append({
+        'run': (
+            player_name, player.id, game_state.map_seed, game_state.floor, victory, cause_of_death,
+            player.gold, player.max_hp,
+            [card.id for card in player.cards],
+            sum(1 for card in player.cards if card.upgraded),
+            [relic.id for relic in player.relics],
+            json.dumps(getattr(game_state, 'stats', {}), ensure_ascii=False)
+        ),
+        'offers': list(game_state.card_offers)
+    })
+    if not _config['buffered']:
+        # 写入失败的对局已放回缓冲区，下一局结束时重试；数据库错误不能结束正在进行的游戏
+        try:
+            db.run(flush)
+        except Exception as e:
+            logger.error("写入对局历史失败: %s", e, exc_info=True)
+
+
+def pending():
+    return len(_pending)
+
+
+def flush(path=DB_PATH):
+    """把缓冲区中的对局批量写入数据库并增量刷新统计表，返回写入的对局数"""
+    with _flush_lock:
+        if not _pending:
+            return 0
+        batch = _pending[:]
+        del _pending[:len(batch)]
+        con = duckdb.connect(path)
+        try:
+            con.execute("BEGIN TRANSACTION")
+            create_tables(con)  # 兼容在这些表加入之前创建的数据库
+            # 先取出这一批的 id，卡牌奖励记录按 id 关联到对局
+            run_ids = [row[0] for row in con.execute(
+                "SELECT nextval('runs_id_seq') FROM range(?)", [len(batch)]
+            ).fetchall()]
+            con.executemany(
+                """
+                INSERT INTO runs (id, player_name, character_id, map_seed, floor_reached, victory, cause_of_death,
+                                  gold, max_hp, deck, upgraded_cards, relics, stats)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [(run_id,) + entry['run'] for run_id, entry in zip(run_ids, batch)]
+            )
+            offers = [(run_id, card_id, picked)
+                      for run_id, entry in zip(run_ids, batch) for card_id, picked in entry['offers']]
+            if offers:
+                con.executemany("INSERT INTO run_card_offers VALUES (?, ?, ?)", offers)
+            refresh_stats(con)
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            # 写入失败的对局放回缓冲区，下次重试
+            _pending[:0] = batch
+            raise
+        finally:
+            con.close()
+        logger.info("写入 %s 局对局历史", len(batch))
+        return len(batch)
+
+
+def run(sleep, interval):
+    """后台任务：每隔 interval 秒批量写入一次，sleep 为 socketio.sleep"""
+    while True:
+        sleep(interval)
+        if not _pending:
+            continue
+        try:
+            db.run(flush)
+        except Exception as e:
+            logger.error("写入对局历史失败: %s", e, exc_info=True)
+
+
+# --- 统计查询（读取分析副本） ---
+
+# 缓存键包含客户端传入的角色ID和条数，限制缓存的条目数，超出时丢弃最早缓存的结果
+CACHE_SIZE = 128
+
+_cache = {}
+
+
+def _cached(key, sql, params=()):
+    """在分析副本上执行查询；副本文件没有变化时返回缓存的结果"""
+    from src import replica
+    stamp = os.stat(replica.REPLICA_PATH).st_mtime_ns
+    entry = _cache.get(key)
+    if entry is not None and entry[0] == stamp:
+        return entry[1]
+    columns, rows = replica.query(sql, list(params))
+    result = [dict(zip(columns, row)) for row in rows]
+    _cache.pop(key, None)
+    while len(_cache) >= CACHE_SIZE:
+        del _cache[next(iter(_cache))]
+    _cache[key] = (stamp, result)
+    return result
+
+
+def character_stats():
+    """各角色的对局数、胜率、平均楼层和最高楼层"""
+    return _cached('characters', """
+        SELECT s.character_id AS "characterId", c.name, s.runs, s.wins,
+               round(s.wins / s.runs, 4) AS "winRate",
+               round(s.floor_sum / s.runs, 2) AS "avgFloor",
+               s.max_floor AS "maxFloor"
+        FROM character_run_stats s LEFT JOIN characters c ON c.id = s.character_id
+        ORDER BY s.character_id
+    """)
+
+
+def card_pick_rates(character_id=None, limit=50):
+    """卡牌奖励的出现次数和选取率（按选取率降序）"""
+    where = "" if character_id is None else "WHERE s.character_id = ?"
+    params = () if character_id is None else (character_id,)
+    return _cached(('cards', character_id, limit), f"""
+        SELECT s.character_id AS "characterId", s.card_id AS "cardId", c.name, s.offered, s.picked,
+               round(s.picked / s.offered, 4) AS "pickRate"
+        FROM card_pick_stats s LEFT JOIN cards c ON c.id = s.card_id
+        {where}
+        ORDER BY "pickRate" DESC, s.offered DESC
+        LIMIT {int(limit)}
+    """, params)
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""预计算的加权抽样器
+
+卡牌奖励、遗物和地图节点类型的随机选择都使用 Vose 别名表（alias table），
+建表 O(n)，每次抽样 O(1)：
+    - 卡牌奖励：每个角色一张稀有度别名表 + 各稀有度的卡牌列表，从卡牌目录一次性构建并缓存
+    - 遗物：每局游戏一个 RelicSampler，获得遗物时 O(1) 地从候选池中移除
+    - 节点类型：前几层和之后各一张别名表，模块加载时构建
+
+数据库中的稀有度为中文（普通、稀有等），通过 RARITY_ALIASES 映射到权重表使用的英文名。
+"""
+import random
+
+import duckdb
+
+from src import db
+
+# 稀有度名称映射（数据库中文名 -> 权重表英文名）
+RARITY_ALIASES = {
+    '基础': 'Basic',
+    '初始': 'Starter',
+    '普通': 'Common',
+    '罕见': 'Uncommon',
+    '稀有': 'Rare',
+    'Boss': 'Boss'
+}
+
+# 卡牌奖励的稀有度权重
+CARD_RARITY_WEIGHTS = {
+    'Common': 70,
+    'Uncommon': 25,
+    'Rare': 5
+}
+
+# 遗物的稀有度权重
+RELIC_RARITY_WEIGHTS = {
+    'Common': 60,
+    'Uncommon': 30,
+    'Rare': 9,
+    'Boss': 1
+}
+
+# 随机节点类型及其权重（前 EARLY_FLOORS 层没有精英和休息处）
+NODE_ROLL_TYPES = ["普通战斗", "精英战斗", "休息处", "商店", "宝箱", "未知事件"]
+EARLY_FLOORS = 6
+EARLY_NODE_WEIGHTS = [80, 0, 0, 15, 5, 0]
+LATE_NODE_WEIGHTS = [45, 16, 15, 10, 5, 9]
+
+# 每次卡牌奖励的数量
+CARD_REWARD_COUNT = 3
+
+
+def normalize_rarity(rarity):
+    """把数据库中的稀有度转换为权重表使用的名称"""
+    return RARITY_ALIASES.get(rarity, rarity)
+
+
+class AliasTable:
+    """Vose 别名表：按权重 O(1) 抽样"""
+    __slots__ = ('items', 'prob', 'alias')
+
+    def __init__(self, items, weights):
+        items = list(items)
+        weights = [float(w) for w in weights]
+        if len(items) != len(weights):
+            raise ValueError("items 和 weights 长度不一致")
+        total = sum(weights)
+        if not items or total <= 0:
+            raise ValueError("别名表至少需要一个权重为正的元素")
+
+        n = len(items)
+        scaled = [w * n / total for w in weights]
+        prob = [0.0] * n
+        alias = [0] * n
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] = (scaled[l] + scaled[s]) - 1.0
+            if scaled[l] < 1.0:
+                small.append(l)
+            else:
+                large.append(l)
+
+        # 剩余的元素概率为 1（浮点误差导致的残留同样处理）
+        for i in large + small:
+            prob[i] = 1.0
+
+        self.items = items
+        self.prob = prob
+        self.alias = alias
+
+    def __len__(self):
+        return len(self.items)
+
+    def sample(self, rng=random):
+        """抽取一个元素"""
+        u = rng.random() * len(self.items)
+        i = int(u)
+        if u - i < self.prob[i]:
+            return self.items[i]
+        return self.items[self.alias[i]]
+
+
+def _build_rarity_table(pools, rarity_weights):
+    """为非空的稀有度池建立稀有度别名表，没有可用稀有度时返回 None"""
+    rarities = [r for r in rarity_weights if pools.get(r) and rarity_weights[r] > 0]
+    if not rarities:
+        return None
+    return AliasTable(rarities, [rarity_weights[r] for r in rarities])
+
+
+class CardRewardSampler:
+    """某个角色的卡牌奖励抽样器（只读，可在会话间共享）"""
+
+    def __init__(self, card_defs, rarity_weights=CARD_RARITY_WEIGHTS):
+        self.pools = {}
+        for card_def in card_defs:
+            rarity = normalize_rarity(card_def.rarity)
+            if rarity in rarity_weights:
+                self.pools.setdefault(rarity, []).append(card_def)
+        self.all_cards = [card_def for pool in self.pools.values() for card_def in pool]
+        self.rarity_table = _build_rarity_table(self.pools, rarity_weights)
+
+    def roll(self, count=CARD_REWARD_COUNT, rng=random):
+        """抽取 count 张不重复的卡牌定义：先按权重选一个稀有度，不足时从所有卡牌中补充"""
+        if self.rarity_table is None:
+            return []
+        pool = self.pools[self.rarity_table.sample(rng)]
+        choices = rng.sample(pool, min(count, len(pool)))
+
+        if len(choices) < count:
+            if len(self.all_cards) <= count:
+                return list(self.all_cards)
+            chosen = {card_def.id for card_def in choices}
+            while len(choices) < count:
+                card_def = self.all_cards[int(rng.random() * len(self.all_cards))]
+                if card_def.id not in chosen:
+                    chosen.add(card_def.id)
+                    choices.append(card_def)
+        return choices
+
+
+class RelicSampler:
+    """一局游戏的遗物抽样器，已拥有的遗物会从候选池中移除"""
+
+    def __init__(self, relic_rows, owned_ids=(), rarity_weights=RELIC_RARITY_WEIGHTS):
+        self.rarity_weights = rarity_weights
+        self.pools = {}
+        # 遗物ID -> (稀有度, 在池中的位置)，用于 O(1) 移除
+        self.positions = {}
+        owned = set(owned_ids)
+        for row in relic_rows:
+            rarity = normalize_rarity(row[2])
+            if rarity not in rarity_weights or row[0] in owned:
+                continue
+            pool = self.pools.setdefault(rarity, [])
+            self.positions[row[0]] = (rarity, len(pool))
+            pool.append(row)
+        self.rarity_table = _build_rarity_table(self.pools, rarity_weights)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def mark_owned(self, relic_id):
+        """玩家获得了某个遗物：与池尾交换后移除；池变空时重建稀有度表"""
+        entry = self.positions.pop(relic_id, None)
+        if entry is None:
+            return
+        rarity, index = entry
+        pool = self.pools[rarity]
+        last = pool.pop()
+        if index < len(pool):
+            pool[index] = last
+            self.positions[last[0]] = (rarity, index)
+        if not pool:
+            self.rarity_table = _build_rarity_table(self.pools, self.rarity_weights)
+
+    def roll(self, rng=random):
+        """抽取一个遗物（relics 表的一行），没有可用遗物时返回 None"""
+        if self.rarity_table is None:
+            return None
+        pool = self.pools[self.rarity_table.sample(rng)]
+        return pool[int(rng.random() * len(pool))]
+
+
+# 从卡牌目录构建的缓存：角色ID -> CardRewardSampler / 遗物行列表
+_card_samplers = {}
+_relic_rows = {}
+
+
+def card_reward_sampler(character_id):
+    """获取角色的卡牌奖励抽样器（首次调用时从卡牌目录构建）"""
+    sampler = _card_samplers.get(character_id)
+    if sampler is None:
+        from src.models import CardDef
+        catalog = CardDef.load_catalog()
+        card_defs = [
+            card_def for card_def in catalog.values()
+            if card_def.character_id is None or card_def.character_id == character_id
+        ]
+        card_defs.sort(key=lambda card_def: card_def.id)
+        sampler = _card_samplers[character_id] = CardRewardSampler(card_defs)
+    return sampler
+
+
+def _load_relic_rows(character_id):
+    from src.models import DB_PATH
+    con = duckdb.connect(DB_PATH)
+    rows = con.execute(
+        """
+        SELECT * FROM relics
+        WHERE character_id IS NULL OR character_id = ?
+        ORDER BY id
+        """,
+        [character_id]
+    ).fetchall()
+    con.close()
+    return rows
+
+
+def relic_sampler(character_id, owned_ids=()):
+    """为一局游戏创建遗物抽样器（遗物目录按角色缓存）"""
+    rows = _relic_rows.get(character_id)
+    if rows is None:
+        rows = _relic_rows[character_id] = db.run(_load_relic_rows, character_id)
+    return RelicSampler(rows, owned_ids)
+
+
+# 节点类型别名表，按权重缓存（调整权重时会自动建立新表）
+_node_tables = {}
+
+
+def node_type_table(weights):
+    """获取一组节点类型权重对应的别名表"""
+    key = tuple(weights)
+    table = _node_tables.get(key)
+    if table is None:
+        table = _node_tables[key] = AliasTable(NODE_ROLL_TYPES, weights)
+    return table
+
+
+def roll_node_type(y, rng=random, node_weights=None):
+    """为第 y 层的普通节点随机选择类型（node_weights 为 (前几层权重, 之后的权重)，调参时使用）"""
+    early, late = node_weights or (EARLY_NODE_WEIGHTS, LATE_NODE_WEIGHTS)
+    weights = early if y < EARLY_FLOORS else late
+    return node_type_table(weights).sample(rng)
+
+
+def clear_cache():
+    """清空目录缓存（数据库内容变化后调用）"""
+    _card_samplers.clear()
+    _relic_rows.clear()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""游戏状态序列化的分段缓存
+
+网页版每次操作后都要发送完整状态，但一次操作通常只改变很少的部分（例如只有生命值变化）。
+状态按段缓存：
+    - 卡牌：Card.to_dict() 的结果缓存在卡牌副本上，副本的任何字段被修改时失效（脏标记）
+    - 牌堆（deck / hand / drawPile / discardPile / exhaustPile）：每段缓存上次的字典列表；
+      牌堆中的卡牌依次仍是上次的同一批缓存字典时（顺序、数量一致且都没有被修改），直接复用
+    - 地图：按 SlayTheSpireGame.map_version 缓存（见 game.map_nodes_json）
+
+比较只用 C 层的 map/all 做对象同一性判断，不重建任何字典。
+没有变化的段返回同一个列表对象，后续的编码层可以据此复用编码结果。
+"""
+from operator import attrgetter, is_
+
+_card_dict = attrgetter('_dict')
+
+
+class SectionCache:
+    """一个会话的分段序列化缓存"""
+    __slots__ = ('sections', 'hits', 'misses')
+
+    def __init__(self):
+        self.sections = {}
+        self.hits = 0
+        self.misses = 0
+
+    def cards(self, name, cards):
+        """牌堆 name 的序列化结果（卡牌字典列表），没有变化时返回上次的列表"""
+        fragment = self.sections.get(name)
+        if (fragment is not None and len(fragment) == len(cards)
+                and all(map(is_, map(_card_dict, cards), fragment))):
+            self.hits += 1
+            return fragment
+        self.misses += 1
+        fragment = [card.to_dict() for card in cards]
+        self.sections[name] = fragment
+        return fragment
+
+    def clear(self):
+        self.sections.clear()
+
+    def stats(self):
+        return {'sections': len(self.sections), 'hits': self.hits, 'misses': self.misses}
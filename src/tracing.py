@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""热路径追踪：轻量级 span API
+
+用法:
+    with trace('player_action', action='play_card'):   # 根追踪，在此处决定是否采样
+        with span('card_effect', card='打击'):          # 子 span，未采样时几乎零开销
+            ...
+
+    @traced('catalog_lookup')
+    def load_from_db(...): ...
+
+采样是头部采样（head-based）：是否记录在根追踪开始时一次性决定，
+未被采样的请求内所有 span 都直接返回空操作对象。
+耗时超过阈值的追踪保存在一个固定大小的环形缓冲区中，供 /debug/traces 页面查看。
+"""
+import os
+import time
+import random
+import functools
+import threading
+from collections import deque
+
+# eventlet 下每个绿色线程需要独立的追踪上下文
+try:
+    from eventlet.corolocal import local as _LocalClass
+except ImportError:
+    from threading import local as _LocalClass
+
+# 采样率（0~1），慢追踪阈值（毫秒），环形缓冲区大小
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', '0.1'))
+TRACE_SLOW_MS = float(os.environ.get('TRACE_SLOW_MS', '50'))
+TRACE_BUFFER_SIZE = int(os.environ.get('TRACE_BUFFER_SIZE', '100'))
+
+_local = _LocalClass()
+_lock = threading.Lock()
+_slow_traces = deque(maxlen=TRACE_BUFFER_SIZE)
+_stats = {'started': 0, 'sampled': 0, 'slow': 0}
+
+
+class Span:
+    """一个计时区间"""
+
+    def __init__(self, name, tags=None):
+        self.name = name
+        self.tags = tags or {}
+        self.start = time.perf_counter()
+        self.end = None
+        self.children = []
+        self.parent = None
+
+    @property
+    def duration_ms(self):
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def to_dict(self, trace_start):
+        """将 span 序列化为字典（时间相对于追踪开始）"""
+        return {
+            'name': self.name,
+            'tags': self.tags,
+            'offsetMs': round((self.start - trace_start) * 1000, 3),
+            'durationMs': round(self.duration_ms, 3),
+            'children': [c.to_dict(trace_start) for c in self.children]
+        }
+
+
+class Trace:
+    """一次完整的请求追踪"""
+
+    def __init__(self, name, tags=None):
+        self.trace_id = '%016x' % random.getrandbits(64)
+        self.started_at = time.time()
+        self.root = Span(name, tags)
+        self.current = self.root
+
+    def to_dict(self):
+        """将追踪序列化为字典"""
+        return {
+            'traceId': self.trace_id,
+            'name': self.root.name,
+            'startedAt': self.started_at,
+            'durationMs': round(self.root.duration_ms, 3),
+            'root': self.root.to_dict(self.root.start)
+        }
+
+
+class _NoopSpan:
+    """未采样时使用的空操作 span"""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class _ActiveSpan:
+    """在当前追踪中打开一个子 span"""
+
+    def __init__(self, trace_obj, name, tags):
+        self.trace = trace_obj
+        self.name = name
+        self.tags = tags
+        self.span = None
+
+    def __enter__(self):
+        parent = self.trace.current
+        self.span = Span(self.name, self.tags)
+        self.span.parent = parent
+        parent.children.append(self.span)
+        self.trace.current = self.span
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.span.end = time.perf_counter()
+        if exc_type is not None:
+            self.span.tags['error'] = exc_type.__name__
+        self.trace.current = self.span.parent
+        return False
+
+
+class _RootSpan:
+    """根追踪：进入时决定是否采样，退出时判断是否为慢追踪"""
+
+    def __init__(self, name, tags):
+        self.name = name
+        self.tags = tags
+        self.trace = None
+
+    def __enter__(self):
+        _stats['started'] += 1
+        if random.random() >= TRACE_SAMPLE_RATE:
+            return None
+        _stats['sampled'] += 1
+        self.trace = Trace(self.name, self.tags)
+        _local.trace = self.trace
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.trace is None:
+            return False
+        _local.trace = None
+        root = self.trace.root
+        root.end = time.perf_counter()
+        if exc_type is not None:
+            root.tags['error'] = exc_type.__name__
+        if root.duration_ms >= TRACE_SLOW_MS:
+            with _lock:
+                _stats['slow'] += 1
+                _slow_traces.append(self.trace)
+        return False
+
+
+def current_trace():
+    """获取当前绿色线程中正在记录的追踪（未采样时为None）"""
+    return getattr(_local, 'trace', None)
+
+
+def trace(name, **tags):
+    """开始一个根追踪；若已处于追踪中，则退化为子 span"""
+    active = getattr(_local, 'trace', None)
+    if active is not None:
+        return _ActiveSpan(active, name, tags)
+    return _RootSpan(name, tags)
+
+
+def span(name, **tags):
+    """在当前追踪中打开一个子 span；没有采样中的追踪时返回空操作对象"""
+    active = getattr(_local, 'trace', None)
+    if active is None:
+        return _NOOP
+    return _ActiveSpan(active, name, tags)
+
+
+def traced(name=None):
+    """装饰器：把函数调用包在一个 span 中"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            active = getattr(_local, 'trace', None)
+            if active is None:
+                return func(*args, **kwargs)
+            with _ActiveSpan(active, span_name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def configure(sample_rate=None, slow_ms=None, buffer_size=None):
+    """运行时调整采样参数"""
+    global TRACE_SAMPLE_RATE, TRACE_SLOW_MS, _slow_traces
+    if sample_rate is not None:
+        TRACE_SAMPLE_RATE = max(0.0, min(1.0, float(sample_rate)))
+    if slow_ms is not None:
+        TRACE_SLOW_MS = float(slow_ms)
+    if buffer_size is not None:
+        with _lock:
+            _slow_traces = deque(_slow_traces, maxlen=int(buffer_size))
+
+
+def get_slow_traces(limit=None):
+    """获取最近的慢追踪（最新的在前）"""
+    with _lock:
+        traces = list(_slow_traces)
+    traces.reverse()
+    if limit is not None:
+        traces = traces[:limit]
+    return [t.to_dict() for t in traces]
+
+
+def get_stats():
+    """获取追踪统计信息"""
+    return {
+        'sampleRate': TRACE_SAMPLE_RATE,
+        'slowMs': TRACE_SLOW_MS,
+        'bufferSize': _slow_traces.maxlen,
+        'buffered': len(_slow_traces),
+        'started': _stats['started'],
+        'sampled': _stats['sampled'],
+        'slow': _stats['slow']
+    }
+
+
+def clear():
+    """清空慢追踪缓冲区"""
+    with _lock:
+        _slow_traces.clear()
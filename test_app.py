@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Web 服务器冒烟测试：按 README 的方式（python app.py）启动服务器，通过 HTTP 访问"""
+import os
+import sys
+import json
+import time
+import socket
+import tempfile
+import subprocess
+import urllib.error
+import urllib.request
+
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+ADMIN_TOKEN = 'smoke-test-token'
+STARTUP_TIMEOUT = 30
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def request(base_url, method, path, body=None, headers=None):
+    """发送请求，返回 (状态码, JSON)"""
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(base_url + path, data=data, method=method, headers=dict(headers or {}))
+    if data is not None:
+        req.add_header('Content-Type', 'application/json')
+    try:
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            payload = resp.read()
+            return resp.status, json.loads(payload) if payload else None
+    except urllib.error.HTTPError as e:
+        payload = e.read()
+        return e.code, json.loads(payload) if payload else None
+
+
+@pytest.fixture(scope='module')
+def server():
+    """在临时数据库上启动 python app.py，返回服务器地址"""
+    from src.db_init import init_database
+    tmp_dir = tempfile.mkdtemp(prefix='sts-smoke-')
+    db_path = os.path.join(tmp_dir, 'smoke.db')
+    init_database(db_path)
+
+    port = _free_port()
+    env = dict(os.environ,
+               STS_DB_PATH=db_path,
+               ADMIN_TOKEN=ADMIN_TOKEN,
+               REPLICA_INTERVAL='0',
+               DB_TIMEOUT='5',
+               API_MAX_SESSIONS='2',
+               API_SESSION_TTL='2')
+    log = open(os.path.join(tmp_dir, 'server.log'), 'w')
+    proc = subprocess.Popen([sys.executable, 'app.py', '--port', str(port)],
+                            cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + STARTUP_TIMEOUT
+    try:
+        while True:
+            try:
+                if request(base_url, 'GET', '/api/test')[0] == 200:
+                    break
+            except OSError:
+                pass
+            if proc.poll() is not None or time.time() > deadline:
+                pytest.fail(f"服务器没有启动，日志见 {log.name}")
+            time.sleep(0.2)
+        yield base_url
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+        log.close()
+
+
+def test_create_run(server):
+    """创建游戏会经过 DB_OFFLOAD 的线程池（加载角色、保存存档），不能超时"""
+    started = time.time()
+    status, body = request(server, 'POST', '/api/runs', {'playerName': 'smoke', 'characterId': 1})
+    assert status == 201, body
+    assert body['state']['player']['name']
+    assert time.time() - started < 5
+    assert request(server, 'DELETE', f"/api/runs/{body['runId']}")[0] == 200
+
+
+def test_debug_traces_requires_admin(server):
+    """慢追踪包含各会话的操作细节，只有管理员可以查看"""
+    assert request(server, 'GET', '/debug/traces?format=json')[0] == 403
+    assert request(server, 'GET', '/debug/traces?format=json&token=wrong')[0] == 403
+    status, body = request(server, 'GET', '/debug/traces?format=json', headers={'X-Admin-Token': ADMIN_TOKEN})
+    assert status == 200
+    assert 'traces' in body
+
+
+def test_failed_action_bumps_state_version(server):
+    """失败的操作也可能已经改变了状态，?since= 不能返回 304"""
+    status, body = request(server, 'POST', '/api/runs', {'playerName': 'smoke', 'characterId': 1})
+    assert status == 201
+    run_id, version = body['runId'], body['state']['stateVersion']
+    status, body = request(server, 'POST', f'/api/runs/{run_id}/actions', {'actions': [{'action': 'end_turn'}]})
+    assert status == 200 and not body['results'][0]['ok']
+    assert request(server, 'GET', f'/api/runs/{run_id}/state?since={version}')[0] == 200
+    assert request(server, 'POST', f'/api/runs/{run_id}/actions', {'actions': [{'action': 'no_such_action'}]})[0] == 200
+    assert request(server, 'GET', f"/api/runs/{run_id}/state?since={body['state']['stateVersion']}")[0] == 304
+    # 尚未实现的界面操作直接拒绝，不交给游戏
+    status, rejected = request(server, 'POST', f'/api/runs/{run_id}/actions', {'actions': [{'action': 'shop_purchase'}]})
+    assert status == 200 and '暂不支持' in rejected['results'][0]['error']
+    assert request(server, 'GET', f"/api/runs/{run_id}/state?since={body['state']['stateVersion']}")[0] == 304
+    request(server, 'DELETE', f'/api/runs/{run_id}')
+
+
+def test_session_limit_and_expiry(server):
+    """会话数达到 API_MAX_SESSIONS 时返回 503；超过 API_SESSION_TTL 没有访问的会话被回收"""
+    run_ids = []
+    for _ in range(2):
+        status, body = request(server, 'POST', '/api/runs', {'playerName': 'smoke', 'characterId': 1})
+        assert status == 201
+        run_ids.append(body['runId'])
+    assert request(server, 'POST', '/api/runs', {'playerName': 'smoke', 'characterId': 1})[0] == 503
+
+    time.sleep(2.5)
+    assert request(server, 'GET', f'/api/runs/{run_ids[0]}/state')[0] == 404
+    status, body = request(server, 'POST', '/api/runs', {'playerName': 'smoke', 'characterId': 1})
+    assert status == 201
+    request(server, 'DELETE', f"/api/runs/{body['runId']}")
+
+
+def test_replica_stats(server):
+    """刷新分析副本后，统计接口读取副本返回结果"""
+    assert request(server, 'GET', '/api/stats/characters')[0] == 503
+    status, body = request(server, 'POST', '/debug/replica', headers={'X-Admin-Token': ADMIN_TOKEN})
+    assert status == 200, body
+    assert body['tables']['characters'] > 0
+    status, body = request(server, 'GET', '/api/stats/characters')
+    assert status == 200, body
+    assert isinstance(body['characters'], list)
+    # 再次刷新：上一次快照后副本已分离，可以再次 ATTACH
+    assert request(server, 'POST', '/debug/replica', headers={'X-Admin-Token': ADMIN_TOKEN})[0] == 200
+
+
+def test_choose_path_keeps_map_version(server):
+    """移动不改变地图版本：客户端已有地图时不重发节点，已访问的节点单独给出"""
+    status, body = request(server, 'POST', '/api/runs', {'playerName': 'smoke', 'characterId': 1})
+    assert status == 201
+    run_id, state = body['runId'], body['state']
+    version = state['map']['version']
+    assert state['map']['nodes'] and state['map']['visited'] == [[0, 0]]
+    row, col = state['map']['available'][0]
+    status, body = request(server, 'POST', f'/api/runs/{run_id}/actions?map_version={version}',
+                           {'actions': [{'action': 'choose_path', 'payload': {'row': row, 'col': col}}]})
+    assert status == 200 and body['results'][0]['ok'], body
+    assert body['state']['map']['version'] == version
+    assert 'nodes' not in body['state']['map']
+    assert [row, col] in body['state']['map']['visited']
+    request(server, 'DELETE', f'/api/runs/{run_id}')
@@ -40,15 +40,7 @@ def test_card(card_name, character_id=1):
         return
     
     # 创建卡牌
-    card = Card(
-        id=card_data[0],
-        name=card_data[1],
-        card_type=card_data[2],
-        rarity=card_data[3],
-        energy_cost=card_data[4],
-        description=card_data[5],
-        character_id=card_data[6]
-    )
+    card = Card.from_row(card_data)
     
     # 测试卡牌效果
     print(f"卡牌信息: {card}")
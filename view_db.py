@@ -1,16 +1,22 @@
 #!/usr/bin/env python3
-import duckdb
+"""查看游戏数据库
+
+只读取分析副本（src/replica.py），不打开游戏服务器正在使用的主库。
+副本由服务器定期刷新；服务器没有运行时可以用 --refresh 先从主库生成一次副本。
+"""
 import os
-from src.db_init import DB_PATH
+import argparse
+from src import replica
 
-def view_database():
+def view_database(path=replica.REPLICA_PATH):
     """查看游戏数据库的表和内容"""
-    if not os.path.exists(DB_PATH):
-        print(f"错误：数据库文件 {DB_PATH} 不存在")
+    if not os.path.exists(path):
+        print(f"错误：分析副本 {path} 不存在（可以用 --refresh 从主库生成）")
         return
     
-    print(f"连接到数据库: {DB_PATH}")
-    conn = duckdb.connect(DB_PATH, read_only=True)
+    info = replica.info(path)
+    print(f"连接到分析副本: {path}（快照时间 {info['snapshotAt']}）")
+    conn = replica.connect(path)
     
     # 获取所有表名
     tables = conn.execute("SHOW TABLES").fetchall()
@@ -80,4 +86,11 @@ def view_database():
     print("数据库连接已关闭")
 
 if __name__ == "__main__":
-    view_database() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='查看游戏数据库（分析副本）')
+    parser.add_argument('--refresh', action='store_true', help='先从主库生成副本（服务器运行时不需要）')
+    parser.add_argument('--replica', default=replica.REPLICA_PATH, help='副本路径')
+    args = parser.parse_args()
+    if args.refresh:
+        counts = replica.snapshot(dest=args.replica)
+        print(f"已生成分析副本: {args.replica}（{sum(counts.values())} 行）")
+    view_database(args.replica)